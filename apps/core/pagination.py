@@ -0,0 +1,168 @@
+"""
+Keyset Pagination
+=================
+Cursor pagination over a unique, indexed ordering such as
+``(-created_at, -id)``.
+
+Offset pagination makes the database walk and discard every row before the
+page, so deep pages of a large history get slower and slower. A keyset
+cursor instead encodes the ordering values of the last row served, and the
+next page is the rows strictly after it:
+
+    WHERE (created_at, id) < (:created_at, :id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :page_size + 1
+
+With a composite index matching the ordering every page is one index range
+scan, whatever its depth. Cursors are opaque to clients; pages are linked by
+``next`` and ``previous`` URLs:
+
+    {"next": "...?cursor=eyJ2Ij...", "previous": null, "results": [...]}
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination for ``ListAPIView``s.
+
+    ``ordering`` must be unique per row (end with the primary key), use one
+    direction for every field and be backed by an index; views may override
+    it with an ``ordering`` attribute of their own.
+    """
+
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.model = queryset.model
+        descending = self.ordering[0].startswith('-')
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['r']
+        if cursor is not None:
+            # Rows after the cursor in the requested direction
+            queryset = queryset.filter(self._after(cursor['v'], descending != reverse))
+        ordering = self.ordering if not reverse else [self._flip(field) for field in self.ordering]
+
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = cursor is not None and (has_more if reverse else True)
+        self.first = rows[0] if rows else None
+        self.last = rows[-1] if rows else None
+        if not rows and cursor is not None:
+            # Nothing past the cursor: link back to where it points
+            self.has_next = reverse
+            self.has_previous = not reverse
+            self.first = self.last = cursor['v']
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        values = position if isinstance(position, list) else [
+            self._serialize(getattr(position, field)) for field in self.fields
+        ]
+        token = base64.urlsafe_b64encode(json.dumps({'v': values, 'r': reverse}).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values = cursor['v']
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError(token)
+            return {'v': values, 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, values, descending):
+        """Rows strictly past ``values`` in lexicographic ``(field, ...)`` order"""
+        lookup = 'lt' if descending else 'gt'
+        # The leading bound on its own is what an index range scan can use;
+        # the lexicographic condition only filters the rows tied with it
+        condition = Q(**{f'{self.fields[0]}__{lookup}e': self._deserialize(self.fields[0], values[0])})
+        past = Q()
+        for index, field in enumerate(self.fields):
+            step = Q(**{f'{field}__{lookup}': self._deserialize(field, values[index])})
+            for previous in range(index):
+                step &= Q(**{self.fields[previous]: self._deserialize(self.fields[previous], values[previous])})
+            past |= step
+        return condition & past
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (int, str)) or value is None:
+            return value
+        return str(value)
+
+    def _deserialize(self, field, value):
+        try:
+            return self.model._meta.get_field(field).to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
@@ -210,7 +210,7 @@ class FiatWithdrawalCreateView(APIView):
         
         # Check balance
         from apps.wallets.models import Balance
-        balance = Balance.objects.filter(
+        balance = Balance.objects.select_for_update().filter(
             user=request.user,
             currency__symbol=source_currency
         ).first()
@@ -228,6 +228,7 @@ class FiatWithdrawalCreateView(APIView):
         # Lock balance
         balance.available -= source_amount
         balance.locked += source_amount
+        balance.version += 1
         balance.save()
         
         # Create withdrawal
@@ -470,13 +471,14 @@ class AdminProcessFiatWithdrawalView(APIView):
             withdrawal.save()
             
             # Deduct from locked balance
-            balance = Balance.objects.filter(
+            balance = Balance.objects.select_for_update().filter(
                 user=withdrawal.user,
                 currency__symbol=withdrawal.source_currency
             ).first()
             
             if balance:
                 balance.locked -= withdrawal.source_amount
+                balance.version += 1
                 balance.save()
                 
                 BalanceTransaction.objects.create(
@@ -496,7 +498,7 @@ class AdminProcessFiatWithdrawalView(APIView):
             withdrawal.save()
             
             # Return locked balance
-            balance = Balance.objects.filter(
+            balance = Balance.objects.select_for_update().filter(
                 user=withdrawal.user,
                 currency__symbol=withdrawal.source_currency
             ).first()
@@ -504,6 +506,7 @@ class AdminProcessFiatWithdrawalView(APIView):
             if balance:
                 balance.locked -= withdrawal.source_amount
                 balance.available += withdrawal.source_amount
+                balance.version += 1
                 balance.save()
         
         return Response(FiatWithdrawalSerializer(withdrawal).data)
@@ -545,7 +548,7 @@ class AdminProcessCryptoWithdrawalView(APIView):
             withdrawal.save()
             
             # Return locked balance
-            balance = Balance.objects.filter(
+            balance = Balance.objects.select_for_update().filter(
                 user=withdrawal.user,
                 currency__symbol=withdrawal.currency
             ).first()
@@ -553,6 +556,7 @@ class AdminProcessCryptoWithdrawalView(APIView):
             if balance:
                 balance.locked -= withdrawal.amount
                 balance.available += withdrawal.amount
+                balance.version += 1
                 balance.save()
             
             return Response(CryptoWithdrawalSerializer(withdrawal).data)
@@ -1,4 +1,9 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger('apps.trading')
 
 
 class TradingConfig(AppConfig):
@@ -7,4 +12,8 @@ class TradingConfig(AppConfig):
     verbose_name = 'Trading Engine'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from apps.trading.services.market_data import msgpack
+
+        if msgpack is None and settings.MARKET_DATA_CONFIG['MSGPACK_FRAMES']:
+            logger.warning("MSGPACK_FRAMES is on but msgpack is not installed; "
+                           "?format=msgpack connections will receive JSON frames")
@@ -2,27 +2,135 @@
 Trading WebSocket Consumers
 ===========================
 Real-time data streaming for order book, trades, and user updates.
+
+Broadcast frames arrive from the channel layer already encoded (see
+``apps.trading.services.market_data``) and are forwarded untouched, so a
+frame costs one encode however many sockets it goes to. Connections opened
+with ``?format=msgpack`` receive binary msgpack frames instead of JSON.
+Connect-time snapshots come from the process-wide ``SnapshotCache``.
+
+Broadcast frames go through a bounded per-connection ``OutboundQueue``
+drained by a writer task, so a slow client only ever costs its own queue.
 """
 
+import asyncio
 import json
 import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from asgiref.sync import sync_to_async
 
+from apps.trading.services.outbound import SNAPSHOT, OutboundQueue, StreamMetrics
+from apps.trading.services.snapshots import SnapshotCache
+
 logger = logging.getLogger('apps.trading')
 
 
-class OrderBookConsumer(AsyncJsonWebsocketConsumer):
+class BroadcastConsumer(AsyncJsonWebsocketConsumer):
+    """Base consumer that forwards pre-encoded broadcast frames"""
+
+    outbound = None
+    _writer = None
+    _evicted = False
+
+    def query_param(self, name, default=''):
+        return parse_qs(self.scope.get('query_string', b'').decode()).get(name, [default])[0]
+
+    @property
+    def binary(self):
+        if not hasattr(self, '_binary'):
+            from apps.trading.services.market_data import msgpack
+            self._binary = msgpack is not None and self.query_param('format') == 'msgpack'
+        return self._binary
+
+    async def send_json(self, content, close=False):
+        """Frames built for this connection only (snapshots, pongs) use its encoding"""
+        if self.binary:
+            from apps.trading.services.market_data import msgpack
+            await self.send(bytes_data=msgpack.packb(content, default=str), close=close)
+        else:
+            await super().send_json(content, close=close)
+
+    async def forward(self, event, frame_type):
+        """Queue a broadcast frame, as encoded at publish time, for this socket"""
+        if self._evicted:
+            return
+        if self.binary and 'bytes' in event:
+            frame = {'bytes_data': event['bytes']}
+        elif 'text' in event:
+            frame = {'text_data': event['text']}
+        elif self.binary:
+            from apps.trading.services.market_data import msgpack
+            frame = {'bytes_data': msgpack.packb({'type': frame_type, 'data': event['data']}, default=str)}
+        else:
+            frame = {'text_data': await self.encode_json({'type': frame_type, 'data': event['data']})}
+
+        if self.outbound is None:
+            self.outbound = OutboundQueue()
+            self._writer = asyncio.ensure_future(self._write())
+
+        if event['type'] == 'orderbook_update':
+            self.outbound.put_depth(event.get('stream'), event.get('symbol'), frame)
+        elif not self.outbound.put(frame):
+            await self.evict()
+
+    async def _write(self):
+        while True:
+            kind, stream, payload = await self.outbound.get()
+            if kind == SNAPSHOT:
+                StreamMetrics.snapshots_substituted += 1
+                await self.resnapshot(stream, payload)
+            else:
+                await self.send(**payload)
+                StreamMetrics.frames_sent += 1
+
+    async def resnapshot(self, stream, symbol):
+        """Send a snapshot of ``stream`` in place of depth frames dropped for it"""
+
+    async def evict(self):
+        """Disconnect a client whose queue hit the hard limit, telling it to resync"""
+        self._evicted = True
+        self._writer.cancel()
+        self.outbound.clear()
+        StreamMetrics.slow_consumer_disconnects += 1
+        logger.warning(f"Disconnecting slow WebSocket consumer {self.channel_name}")
+        await self.send_json({
+            'type': 'error',
+            'code': 'slow_consumer',
+            'message': 'Too many undelivered messages; reconnect and resync from a snapshot',
+        })
+        await self.close(code=4008)
+
+    async def websocket_disconnect(self, message):
+        if self._writer is not None:
+            self._writer.cancel()
+        await super().websocket_disconnect(message)
+
+
+class OrderBookConsumer(BroadcastConsumer):
     """
     WebSocket consumer for real-time order book updates.
 
     Connect: ws://localhost:8000/ws/orderbook/ETH_USDT/
+             ws://localhost:8000/ws/orderbook/ETH_USDT/?interval=1000&format=msgpack
+
+    The snapshot sent on connect carries the book ``sequence``; every
+    ``orderbook_update`` is a conflated delta with ``sequence``/``prev_sequence``.
+    On a gap, send ``{"type": "resync"}`` to get a fresh snapshot.
     """
 
     async def connect(self):
+        from apps.trading.services.market_data import MarketDataPublisher
+
         self.symbol = self.scope['url_route']['kwargs']['symbol'].upper()
-        self.room_group_name = f'orderbook_{self.symbol}'
+        interval = self.query_param('interval')
+        self.room_group_name = MarketDataPublisher.depth_group(
+            self.symbol, int(interval) if interval.isdigit() else None
+        )
 
         # Join room group
         await self.channel_layer.group_add(
@@ -30,16 +138,16 @@ class OrderBookConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name
         )
 
+        SnapshotCache.watch('book', self.symbol)
+
         await self.accept()
 
         # Send initial order book
-        order_book = await self.get_order_book()
-        await self.send_json({
-            'type': 'orderbook_snapshot',
-            'data': order_book
-        })
+        await self.send_snapshot()
 
     async def disconnect(self, close_code):
+        SnapshotCache.unwatch('book', self.symbol)
+
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -52,27 +160,26 @@ class OrderBookConsumer(AsyncJsonWebsocketConsumer):
 
         if message_type == 'ping':
             await self.send_json({'type': 'pong'})
+        elif message_type == 'resync':
+            await self.send_snapshot()
 
-    async def orderbook_update(self, event):
-        """Send order book update to WebSocket."""
+    async def resnapshot(self, stream, symbol):
+        await self.send_snapshot()
+
+    async def send_snapshot(self):
+        order_book = await SnapshotCache.get('book', self.symbol)
         await self.send_json({
-            'type': 'orderbook_update',
-            'data': event['data']
+            'type': 'orderbook_snapshot',
+            'data': order_book
         })
 
-    @database_sync_to_async
-    def get_order_book(self):
-        from apps.trading.models import TradingPair
-        from apps.trading.services.order_book import OrderBookService
-
-        try:
-            trading_pair = TradingPair.objects.get(symbol=self.symbol, is_active=True)
-            return OrderBookService.get_order_book(trading_pair)
-        except TradingPair.DoesNotExist:
-            return {'error': 'Trading pair not found'}
+    async def orderbook_update(self, event):
+        """Send order book delta to WebSocket."""
+        SnapshotCache.observe('book', self.symbol, event.get('sequence'))
+        await self.forward(event, 'orderbook_update')
 
 
-class TradeConsumer(AsyncJsonWebsocketConsumer):
+class TradeConsumer(BroadcastConsumer):
     """
     WebSocket consumer for real-time trade updates.
 
@@ -88,16 +195,20 @@ class TradeConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name
         )
 
+        SnapshotCache.watch('trades', self.symbol)
+
         await self.accept()
 
         # Send recent trades
-        trades = await self.get_recent_trades()
+        trades = await SnapshotCache.get('trades', self.symbol)
         await self.send_json({
             'type': 'trades_snapshot',
             'data': trades
         })
 
     async def disconnect(self, close_code):
+        SnapshotCache.unwatch('trades', self.symbol)
+
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -111,32 +222,15 @@ class TradeConsumer(AsyncJsonWebsocketConsumer):
 
     async def trade_update(self, event):
         """Send new trade to WebSocket."""
-        await self.send_json({
-            'type': 'new_trade',
-            'data': event['data']
-        })
+        await self.forward(event, 'new_trade')
 
-    @database_sync_to_async
-    def get_recent_trades(self):
-        from apps.trading.models import Trade
+    async def trades_update(self, event):
+        """Send the trades of one conflation window to WebSocket."""
+        SnapshotCache.observe('trades', self.symbol)
+        await self.forward(event, 'trades')
 
-        trades = Trade.objects.filter(
-            trading_pair__symbol=self.symbol
-        ).order_by('-created_at')[:50]
 
-        return [
-            {
-                'id': str(t.id),
-                'price': str(t.price),
-                'quantity': str(t.quantity),
-                'side': 'buy' if t.buyer_is_maker else 'sell',
-                'timestamp': t.created_at.isoformat()
-            }
-            for t in trades
-        ]
-
-
-class UserConsumer(AsyncJsonWebsocketConsumer):
+class UserConsumer(BroadcastConsumer):
     """
     WebSocket consumer for user-specific updates.
 
@@ -146,6 +240,9 @@ class UserConsumer(AsyncJsonWebsocketConsumer):
     - Order updates (created, filled, cancelled)
     - Balance updates
     - Trade notifications
+
+    Events of one matching cycle or ledger transaction arrive together as a
+    single ``user_events`` frame.
     """
 
     async def connect(self):
@@ -183,23 +280,189 @@ class UserConsumer(AsyncJsonWebsocketConsumer):
         if message_type == 'ping':
             await self.send_json({'type': 'pong'})
 
+    async def user_events(self, event):
+        """Send a batch of order, trade and balance events to user."""
+        await self.forward(event, 'user_events')
+
     async def order_update(self, event):
         """Send order update to user."""
-        await self.send_json({
-            'type': 'order_update',
-            'data': event['data']
-        })
+        await self.forward(event, 'order_update')
 
     async def balance_update(self, event):
         """Send balance update to user."""
-        await self.send_json({
-            'type': 'balance_update',
-            'data': event['data']
-        })
+        await self.forward(event, 'balance_update')
 
     async def trade_notification(self, event):
         """Send trade notification to user."""
+        await self.forward(event, 'trade_notification')
+
+
+class StreamConsumer(BroadcastConsumer):
+    """
+    Multiplexed market data: many streams over one connection.
+
+    Connect: ws://localhost:8000/ws/stream/?format=msgpack
+
+    Send:
+    - {"type": "subscribe", "id": 1,
+       "streams": ["book:ETH_USDT", "book:BTC_USDT:1000", "trades:ETH_USDT",
+                   "ticker:ETH_USDT", "candles:ETH_USDT:1m"]}
+    - {"type": "unsubscribe", "id": 2, "streams": ["trades:ETH_USDT"]}
+    - {"type": "resync", "streams": ["book:ETH_USDT"]}
+
+    Every frame carries the ``stream`` it belongs to. A new subscription is
+    answered with ``subscribed`` and then the stream's snapshot (book, trades
+    and ticker streams); group memberships are added and removed
+    concurrently for the whole batch.
+    """
+
+    SNAPSHOT_TYPES = {
+        'book': 'orderbook_snapshot',
+        'trades': 'trades_snapshot',
+        'ticker': 'ticker_snapshot',
+    }
+
+    async def connect(self):
+        # stream name -> channel-layer group
+        self.streams = {}
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self._leave(list(self.streams))
+        self.streams = {}
+
+    async def receive_json(self, content):
+        message_type = content.get('type')
+
+        if message_type == 'ping':
+            await self.send_json({'type': 'pong'})
+            return
+        if message_type not in ('subscribe', 'unsubscribe', 'resync'):
+            await self.send_error(content.get('id'), f"Unknown message type: {message_type}")
+            return
+
+        streams = content.get('streams')
+        if not isinstance(streams, list) or not all(isinstance(stream, str) for stream in streams):
+            await self.send_error(content.get('id'), "'streams' must be a list of stream names")
+            return
+
+        if message_type == 'subscribe':
+            await self.subscribe(streams, content.get('id'))
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe(streams, content.get('id'))
+        else:
+            await self.send_snapshots([stream for stream in streams if stream in self.streams])
+
+    async def subscribe(self, streams, request_id=None):
+        from apps.trading.services.market_data import Streams
+
+        requested, invalid = {}, []
+        for stream in streams:
+            try:
+                name = Streams.name(*Streams.parse(stream))
+            except ValueError as e:
+                invalid.append({'stream': stream, 'error': str(e)})
+                continue
+            if name not in self.streams:
+                requested[name] = Streams.parse(name)[1]
+
+        active = await database_sync_to_async(self._active_symbols)(set(requested.values()))
+        for name, symbol in list(requested.items()):
+            if symbol not in active:
+                invalid.append({'stream': name, 'error': 'Trading pair not found'})
+                del requested[name]
+
+        limit = settings.MARKET_DATA_CONFIG['MAX_STREAMS_PER_CONNECTION']
+        if len(self.streams) + len(requested) > limit:
+            await self.send_error(request_id, f"At most {limit} streams per connection")
+            return
+
+        groups = {name: Streams.group(name) for name in requested}
+        self.streams.update(groups)
+        await self._join(list(groups))
+
+        await self.send_json({
+            'type': 'subscribed',
+            'id': request_id,
+            'streams': list(groups),
+            'errors': invalid,
+        })
+        await self.send_snapshots(list(groups))
+
+    async def unsubscribe(self, streams, request_id=None):
+        from apps.trading.services.market_data import Streams
+
+        removed = {}
+        for stream in streams:
+            try:
+                name = Streams.name(*Streams.parse(stream))
+            except ValueError:
+                continue
+            if name in self.streams:
+                removed[name] = self.streams[name]
+
+        await self._leave(list(removed))
         await self.send_json({
-            'type': 'trade_notification',
-            'data': event['data']
-        })
\ No newline at end of file
+            'type': 'unsubscribed',
+            'id': request_id,
+            'streams': list(removed),
+        })
+
+    async def send_snapshots(self, streams):
+        from apps.trading.services.market_data import Streams
+
+        for stream in streams:
+            kind, symbol, _ = Streams.parse(stream)
+            if kind not in self.SNAPSHOT_TYPES:
+                continue
+            data = await SnapshotCache.get(kind, symbol)
+            await self.send_json({'type': self.SNAPSHOT_TYPES[kind], 'stream': stream, 'data': data})
+
+    async def resnapshot(self, stream, symbol):
+        if stream in self.streams:
+            await self.send_snapshots([stream])
+
+    async def send_error(self, request_id, message):
+        await self.send_json({'type': 'error', 'id': request_id, 'message': message})
+
+    async def _join(self, streams):
+        from apps.trading.services.market_data import Streams
+
+        await asyncio.gather(*(
+            self.channel_layer.group_add(self.streams[stream], self.channel_name) for stream in streams
+        ))
+        for stream in streams:
+            SnapshotCache.watch(*Streams.parse(stream)[:2])
+
+    async def _leave(self, streams):
+        from apps.trading.services.market_data import Streams
+
+        groups = [self.streams.pop(stream) for stream in streams]
+        for stream in streams:
+            SnapshotCache.unwatch(*Streams.parse(stream)[:2])
+        await asyncio.gather(*(self.channel_layer.group_discard(group, self.channel_name) for group in groups))
+
+    @staticmethod
+    def _active_symbols(symbols):
+        from apps.trading.models import TradingPair
+
+        if not symbols:
+            return set()
+        return set(TradingPair.objects.filter(
+            symbol__in=symbols, is_active=True
+        ).values_list('symbol', flat=True))
+
+    async def orderbook_update(self, event):
+        SnapshotCache.observe('book', event.get('symbol'), event.get('sequence'))
+        await self.forward(event, 'orderbook_update')
+
+    async def trades_update(self, event):
+        SnapshotCache.observe('trades', event.get('symbol'))
+        await self.forward(event, 'trades')
+
+    async def ticker_update(self, event):
+        SnapshotCache.observe('ticker', event.get('symbol'))
+        await self.forward(event, 'ticker')
+
+    async def candle_update(self, event):
+        await self.forward(event, 'candle')
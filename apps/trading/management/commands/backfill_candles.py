@@ -0,0 +1,49 @@
+"""
+Management command to rebuild candles from historical trades.
+
+Usage:
+    python manage.py backfill_candles
+    python manage.py backfill_candles --symbol ETH_USDT --start 2024-01-01 --end 2024-01-31
+"""
+
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.trading.models import Trade, TradingPair
+from apps.trading.services.candles import CandleService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild OHLCV candles from trades, one UTC day at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbol', help='Only this trading pair (default: all pairs)')
+        parser.add_argument('--start', type=date.fromisoformat, help='First UTC day (default: day of the first trade)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last UTC day, inclusive (default: today)')
+
+    def handle(self, *args, **options):
+        pairs = TradingPair.objects.all()
+        if options['symbol']:
+            pairs = pairs.filter(symbol=options['symbol'].upper())
+            if not pairs.exists():
+                raise CommandError(f"Trading pair {options['symbol']} not found")
+
+        total = 0
+        for pair in pairs:
+            first = Trade.objects.filter(trading_pair=pair).aggregate(first=Min('created_at'))['first']
+            if first is None:
+                continue
+            day = options['start'] or first.astimezone(dt_timezone.utc).date()
+            last = options['end'] or timezone.now().date()
+
+            count = 0
+            while day <= last:
+                count += CandleService.backfill_day(pair, day)
+                day += timedelta(days=1)
+            total += count
+            self.stdout.write(f"{pair.symbol}: {count} candles")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} candles"))
@@ -0,0 +1,44 @@
+"""
+Management command to reserve funds for orders resting since before
+settlement locked them on acceptance.
+
+Each open or partially filled limit order without an ``order_lock`` ledger
+entry has its remaining reserve locked; orders whose owner no longer has
+the funds are cancelled. Run once after deploying reservation, before
+matching resumes; running it again finds nothing to do.
+
+Usage:
+    python manage.py fund_resting_orders
+    python manage.py fund_resting_orders --symbol ETH_USDT
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.trading.models import TradingPair
+from apps.trading.services.matching_engine import MatchingEngine
+
+
+class Command(BaseCommand):
+    help = 'Lock funds for resting orders that hold none, cancelling those that cannot be funded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbol', help='Only this trading pair (default: all pairs)')
+
+    def handle(self, *args, **options):
+        pairs = TradingPair.objects.all()
+        if options['symbol']:
+            pairs = pairs.filter(symbol=options['symbol'].upper())
+            if not pairs.exists():
+                raise CommandError(f"Trading pair {options['symbol']} not found")
+
+        total_funded = total_cancelled = 0
+        for pair in pairs:
+            funded, cancelled = MatchingEngine.fund_resting_orders(pair)
+            total_funded += len(funded)
+            total_cancelled += len(cancelled)
+            if funded or cancelled:
+                self.stdout.write(f"{pair.symbol}: {len(funded)} funded, {len(cancelled)} cancelled")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Funded {total_funded} resting orders, cancelled {total_cancelled}"
+        ))
@@ -0,0 +1,69 @@
+"""
+Management command to rebuild order books from the matching journal.
+
+Usage:
+    python manage.py replay_journal
+    python manage.py replay_journal --verify
+    python manage.py replay_journal --snapshot
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.trading.models import TradingPair
+from apps.trading.services.journal import JournalReplayer, MatchingJournal
+from apps.trading.services.matching_engine import MatchingEngine
+
+
+class Command(BaseCommand):
+    help = 'Replay the matching journal and optionally verify it against the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory', default=settings.MATCHING_ENGINE_CONFIG['JOURNAL_DIR'],
+            help='Journal directory (defaults to MATCHING_ENGINE_JOURNAL_DIR)'
+        )
+        parser.add_argument('--verify', action='store_true', help='Compare rebuilt books with resting orders in the database')
+        parser.add_argument('--snapshot', action='store_true', help='Write a fresh snapshot so the next start-up replays less')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not directory:
+            raise CommandError('No journal directory configured')
+
+        replayer = JournalReplayer(directory)
+        books = replayer.rebuild()
+        self.stdout.write(f"Rebuilt {len(books)} books up to journal seq {replayer.last_seq}")
+
+        if options['verify']:
+            mismatches = 0
+            pairs = TradingPair.objects.in_bulk(list(books))
+            for pair_id, book in books.items():
+                pair = pairs.get(pair_id)
+                if pair is None:
+                    continue
+                expected = {
+                    o.pk: o.remaining_quantity for o in MatchingEngine._resting_orders(pair)
+                }
+                actual = {
+                    order_id: o.remaining_quantity for order_id, o in book.orders.items()
+                }
+                if expected != actual:
+                    mismatches += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"{pair.symbol}: {len(actual)} orders in journal, {len(expected)} in database"
+                    ))
+                if book.sequence != pair.book_sequence:
+                    self.stdout.write(
+                        f"{pair.symbol}: journal at book sequence {book.sequence}, database at {pair.book_sequence}"
+                    )
+
+            if mismatches:
+                raise CommandError(f"{mismatches} books differ from the database")
+            self.stdout.write(self.style.SUCCESS('All rebuilt books match the database'))
+
+        if options['snapshot']:
+            journal = MatchingJournal(directory, next_seq=replayer.last_seq + 1)
+            path = journal.snapshot(books.values())
+            journal.close()
+            self.stdout.write(self.style.SUCCESS(f"Snapshot written to {path}"))
@@ -0,0 +1,39 @@
+"""
+Management command to run a matching engine shard.
+
+Usage:
+    python manage.py run_matching_engine --shard 0 --shards 2
+"""
+
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.trading.services.sequencer import MatchingWorker
+
+
+class Command(BaseCommand):
+    help = 'Run the single-writer matching engine for one shard of trading pairs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', type=int, default=0, help='Shard index owned by this process')
+        parser.add_argument(
+            '--shards', type=int, default=settings.MATCHING_ENGINE_CONFIG['SHARDS'],
+            help='Total number of engine shards'
+        )
+
+    def handle(self, *args, **options):
+        worker = MatchingWorker(shard=options['shard'], shards=options['shards'])
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping matching engine...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Matching engine shard {options['shard']}/{options['shards']} started"
+        ))
+        worker.run()
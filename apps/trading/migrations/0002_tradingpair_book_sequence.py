@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradingpair',
+            name='book_sequence',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
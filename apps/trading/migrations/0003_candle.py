@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0002_tradingpair_book_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Candle',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('interval', models.CharField(choices=[('1m', '1 Minute'), ('5m', '5 Minutes'), ('15m', '15 Minutes'), ('1h', '1 Hour'), ('4h', '4 Hours'), ('1d', '1 Day')], max_length=3)),
+                ('open_time', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('volume', models.DecimalField(decimal_places=8, max_digits=30)),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('trading_pair', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='trading.tradingpair')),
+            ],
+            options={
+                'db_table': 'candles',
+                'unique_together': {('trading_pair', 'interval', 'open_time')},
+            },
+        ),
+    ]
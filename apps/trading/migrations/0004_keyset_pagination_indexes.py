@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0003_candle'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trades_trading_ab734c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trades_buyer_i_2aead8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trades_seller__4dbf86_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='orders_user_id_6efca2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['-created_at', '-id'], name='trades_created_4fdf29_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['trading_pair', '-created_at', '-id'], name='trades_trading_eef79a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['buyer', '-created_at', '-id'], name='trades_buyer_i_004c63_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['seller', '-created_at', '-id'], name='trades_seller__94669f_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:25
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def queue_by_creation(apps, schema_editor):
+    """Existing orders keep the priority they had: their creation time"""
+    Order = apps.get_model('trading', 'Order')
+    Order.objects.update(queued_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='queued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(queue_by_creation, migrations.RunPython.noop),
+    ]
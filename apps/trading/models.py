@@ -35,6 +35,9 @@ class TradingPair(BaseModel):
     low_24h = models.DecimalField(max_digits=20, decimal_places=8, default=Decimal('0'))
     volume_24h = models.DecimalField(max_digits=30, decimal_places=8, default=Decimal('0'))
     
+    # Bumped on every matching cycle; lets resident order books detect staleness
+    book_sequence = models.BigIntegerField(default=0)
+    
     class Meta:
         db_table = 'trading_pairs'
         ordering = ['symbol']
@@ -42,6 +45,22 @@ class TradingPair(BaseModel):
     def __str__(self):
         return self.symbol
 
+    def order_errors(self, quantity, price=None):
+        """Field errors of an order for ``quantity`` at ``price`` (None for market) under the pair's limits"""
+        errors = {}
+        if quantity < self.min_quantity or quantity > self.max_quantity:
+            errors['quantity'] = f'Quantity must be between {self.min_quantity} and {self.max_quantity}'
+        elif self.quantity_step and quantity % self.quantity_step:
+            errors['quantity'] = f'Quantity must be a multiple of {self.quantity_step}'
+        if price is not None:
+            if price < self.min_price or price > self.max_price:
+                errors['price'] = f'Price must be between {self.min_price} and {self.max_price}'
+            elif self.price_step and price % self.price_step:
+                errors['price'] = f'Price must be a multiple of {self.price_step}'
+            elif quantity * price < self.min_notional:
+                errors['non_field_errors'] = f'Order value must be at least {self.min_notional} {self.quote_currency}'
+        return errors
+
 
 class Order(BaseModel):
     """Trading order"""
@@ -104,11 +123,17 @@ class Order(BaseModel):
     
     client_order_id = models.CharField(max_length=50, blank=True)
     
+    # When the order last joined the back of its price level: on creation,
+    # when a stop triggers, and when an amend requeues it. Resting orders
+    # keep their time priority in (queued_at, id) order.
+    queued_at = models.DateTimeField(default=timezone.now)
+    
     class Meta:
         db_table = 'orders'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', '-created_at', '-id']),
             models.Index(fields=['trading_pair', 'status', 'side']),
             models.Index(fields=['status', 'order_type']),
         ]
@@ -131,7 +156,12 @@ class Order(BaseModel):
         ]
     
     def should_trigger(self, current_price):
-        """Check if stop order should trigger"""
+        """
+        Check if stop order should trigger
+
+        Moves trailing-stop watermarks in memory only; the matching engine
+        persists them on checkpoint or trigger.
+        """
         if not self.is_stop_order or self.status != self.Status.PENDING:
             return False
         
@@ -153,24 +183,22 @@ class Order(BaseModel):
             if self.side == self.Side.SELL:
                 if self.highest_price_seen is None or current_price > self.highest_price_seen:
                     self.highest_price_seen = current_price
-                    self.save(update_fields=['highest_price_seen'])
                 trigger_price = self.highest_price_seen * (1 - self.trailing_stop_percent / 100)
                 return current_price <= trigger_price
             else:
                 if self.lowest_price_seen is None or current_price < self.lowest_price_seen:
                     self.lowest_price_seen = current_price
-                    self.save(update_fields=['lowest_price_seen'])
                 trigger_price = self.lowest_price_seen * (1 + self.trailing_stop_percent / 100)
                 return current_price >= trigger_price
         
         return False
     
-    def trigger(self):
+    def trigger(self, save=True):
         """Trigger a stop order"""
         if not self.is_stop_order:
             return
         
-        self.triggered_at = timezone.now()
+        self.triggered_at = self.queued_at = timezone.now()
         
         if self.order_type in [self.OrderType.STOP_LOSS, self.OrderType.TAKE_PROFIT, self.OrderType.TRAILING_STOP]:
             self.order_type = self.OrderType.MARKET
@@ -179,7 +207,8 @@ class Order(BaseModel):
             self.order_type = self.OrderType.LIMIT
             self.status = self.Status.OPEN
         
-        self.save()
+        if save:
+            self.save()
 
 
 class Trade(BaseModel):
@@ -206,9 +235,11 @@ class Trade(BaseModel):
         db_table = 'trades'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['trading_pair', '-created_at']),
-            models.Index(fields=['buyer', '-created_at']),
-            models.Index(fields=['seller', '-created_at']),
+            # (created_at, id) keys the keyset pagination of trade history
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['trading_pair', '-created_at', '-id']),
+            models.Index(fields=['buyer', '-created_at', '-id']),
+            models.Index(fields=['seller', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -217,3 +248,38 @@ class Trade(BaseModel):
     @property
     def total(self):
         return self.price * self.quantity
+
+
+class Candle(models.Model):
+    """
+    OHLCV candle of one trading pair and interval, written by the matching
+    engine as trades happen (see ``CandleService``)
+    """
+
+    class Interval(models.TextChoices):
+        MINUTE_1 = '1m', '1 Minute'
+        MINUTE_5 = '5m', '5 Minutes'
+        MINUTE_15 = '15m', '15 Minutes'
+        HOUR_1 = '1h', '1 Hour'
+        HOUR_4 = '4h', '4 Hours'
+        DAY_1 = '1d', '1 Day'
+
+    id = models.BigAutoField(primary_key=True)
+    trading_pair = models.ForeignKey(TradingPair, on_delete=models.CASCADE, related_name='candles')
+    interval = models.CharField(max_length=3, choices=Interval.choices)
+    open_time = models.DateTimeField()
+
+    open = models.DecimalField(max_digits=20, decimal_places=8)
+    high = models.DecimalField(max_digits=20, decimal_places=8)
+    low = models.DecimalField(max_digits=20, decimal_places=8)
+    close = models.DecimalField(max_digits=20, decimal_places=8)
+    volume = models.DecimalField(max_digits=30, decimal_places=8)
+    trade_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'candles'
+        # Also the index behind kline range queries
+        unique_together = ['trading_pair', 'interval', 'open_time']
+
+    def __str__(self):
+        return f"{self.trading_pair.symbol} {self.interval} {self.open_time:%Y-%m-%d %H:%M}"
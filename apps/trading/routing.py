@@ -10,4 +10,5 @@ websocket_urlpatterns = [
     re_path(r'ws/orderbook/(?P<symbol>\w+)/$', consumers.OrderBookConsumer.as_asgi()),
     re_path(r'ws/trades/(?P<symbol>\w+)/$', consumers.TradeConsumer.as_asgi()),
     re_path(r'ws/user/$', consumers.UserConsumer.as_asgi()),
+    re_path(r'ws/stream/$', consumers.StreamConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -1,6 +1,9 @@
 """
 Trading serializers
 """
+from decimal import Decimal
+
+from django.conf import settings
 from rest_framework import serializers
 from .models import TradingPair, Order, Trade
 
@@ -57,6 +60,8 @@ class OrderCreateSerializer(serializers.Serializer):
             data['trading_pair'] = TradingPair.objects.get(symbol=data['symbol'].upper(), is_active=True)
         except TradingPair.DoesNotExist:
             raise serializers.ValidationError({'symbol': 'Trading pair not found or inactive'})
+        if data['order_type'] == Order.OrderType.LIMIT and data.get('price') is None:
+            raise serializers.ValidationError({'price': 'Limit orders need a price'})
         return data
 
 
@@ -105,6 +110,63 @@ class UserTradeSerializer(serializers.ModelSerializer):
         return None
 
 
+class BatchOrderItemSerializer(serializers.Serializer):
+    """One order of a batch; the symbol is given once for the whole batch"""
+    side = serializers.ChoiceField(choices=Order.Side.choices)
+    order_type = serializers.ChoiceField(
+        choices=[Order.OrderType.LIMIT, Order.OrderType.MARKET], default=Order.OrderType.LIMIT
+    )
+    quantity = serializers.DecimalField(max_digits=20, decimal_places=8, min_value=Decimal('0.00000001'))
+    price = serializers.DecimalField(
+        max_digits=20, decimal_places=8, required=False, allow_null=True, min_value=Decimal('0.00000001')
+    )
+    time_in_force = serializers.ChoiceField(choices=Order.TimeInForce.choices, default=Order.TimeInForce.GTC)
+    client_order_id = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data['order_type'] == Order.OrderType.LIMIT and data.get('price') is None:
+            raise serializers.ValidationError({'price': 'Limit orders need a price'})
+        return data
+
+
+class OrderBatchSerializer(serializers.Serializer):
+    symbol = serializers.CharField(max_length=20)
+    orders = BatchOrderItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_orders(self, orders):
+        limit = settings.MATCHING_ENGINE_CONFIG['MAX_BATCH_ORDERS']
+        if len(orders) > limit:
+            raise serializers.ValidationError(f"At most {limit} orders per batch")
+        return orders
+
+    def validate(self, data):
+        try:
+            data['trading_pair'] = TradingPair.objects.get(symbol=data['symbol'].upper(), is_active=True)
+        except TradingPair.DoesNotExist:
+            raise serializers.ValidationError({'symbol': 'Trading pair not found or inactive'})
+
+        errors = [data['trading_pair'].order_errors(item['quantity'], item.get('price')) for item in data['orders']]
+        if any(errors):
+            raise serializers.ValidationError({'orders': errors})
+        return data
+
+
+class OrderAmendSerializer(serializers.Serializer):
+    """New limit price and/or total quantity of a resting order"""
+    price = serializers.DecimalField(
+        max_digits=20, decimal_places=8, required=False, allow_null=True, min_value=Decimal('0.00000001')
+    )
+    quantity = serializers.DecimalField(
+        max_digits=20, decimal_places=8, required=False, allow_null=True, min_value=Decimal('0.00000001')
+    )
+
+    def validate(self, data):
+        if data.get('price') is None and data.get('quantity') is None:
+            raise serializers.ValidationError('Give a new price, quantity or both')
+        return data
+
+
 class OrderBookEntrySerializer(serializers.Serializer):
     price = serializers.DecimalField(max_digits=20, decimal_places=8)
     quantity = serializers.DecimalField(max_digits=20, decimal_places=8)
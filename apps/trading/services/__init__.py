@@ -1,5 +1,6 @@
 from .matching_engine import MatchingEngine
 from .order_book import OrderBookService
+from .sequencer import MatchingClient, MatchingUnavailable
 from .stop_order_service import StopOrderService
 
-__all__ = ['MatchingEngine', 'OrderBookService', 'StopOrderService']
+__all__ = ['MatchingEngine', 'MatchingClient', 'MatchingUnavailable', 'OrderBookService', 'StopOrderService']
@@ -0,0 +1,210 @@
+"""
+Candles
+=======
+OHLCV candles per trading pair for every interval in ``CANDLE_INTERVALS``.
+
+The matching engine folds each cycle's trades into the candles they fall in
+inside the cycle's transaction, under the pair row lock: one read of the
+open candles, then at most one bulk insert and one bulk update. Candles are
+therefore exact as soon as their trades commit, and charts are served from
+the ``candles`` table without touching ``trades``. Candles open on UTC
+boundaries of their interval (daily candles at midnight UTC).
+
+Backfill
+--------
+``backfill_day`` rebuilds one UTC day of a pair's candles from its trades.
+The day's trades are loaded into numpy arrays of fixed-point integers
+(8 decimal places, the precision of ``Trade.price``), 1m candles are reduced
+from them with ``ufunc.reduceat`` over the minute boundaries, and each
+larger interval is rolled up from the 1m candles the same way. Volumes are
+summed as Python integers so they cannot overflow. The pair row is locked
+while a day is rebuilt, so backfilling a day that is still trading is safe.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from apps.trading.models import Candle, Trade, TradingPair
+from apps.trading.services.market_data import CANDLE_INTERVALS
+
+logger = logging.getLogger('apps.trading')
+
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+# Fixed-point scale used by the backfill
+SCALE = 8
+
+OHLCV_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'trade_count']
+
+
+def _epoch(at):
+    return int(at.timestamp())
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(int(seconds), tz=dt_timezone.utc)
+
+
+def _fixed(value):
+    return int(value.scaleb(SCALE))
+
+
+def _decimal(value):
+    return Decimal(int(value)).scaleb(-SCALE)
+
+
+def _reduce(times, opens, highs, lows, closes, volumes, counts, seconds):
+    """
+    Merge consecutive rows (sorted by time) that fall in the same
+    ``seconds``-long bucket: first open, max high, min low, last close,
+    summed volume and count.
+    """
+    buckets = times // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return (
+        buckets[starts],
+        opens[starts],
+        np.maximum.reduceat(highs, starts),
+        np.minimum.reduceat(lows, starts),
+        closes[ends],
+        np.add.reduceat(volumes, starts),
+        np.add.reduceat(counts, starts),
+    )
+
+
+class CandleService:
+    """Candle aggregation and kline queries"""
+
+    @staticmethod
+    def open_time(at, interval):
+        """Start of the ``interval`` candle that ``at`` falls in"""
+        seconds = INTERVAL_SECONDS[interval]
+        return _datetime(_epoch(at) // seconds * seconds)
+
+    @classmethod
+    def record(cls, trading_pair, trades):
+        """
+        Fold ``trades`` (persisted, in execution order) into the pair's
+        candles. Must run under the pair row lock. Returns the candles
+        written.
+        """
+        if not trades:
+            return []
+
+        keys = [
+            [(interval, cls.open_time(trade.created_at, interval)) for interval in CANDLE_INTERVALS]
+            for trade in trades
+        ]
+        open_times = {open_time for trade_keys in keys for _, open_time in trade_keys}
+        existing = {
+            (candle.interval, candle.open_time): candle
+            for candle in Candle.objects.filter(trading_pair=trading_pair, open_time__in=open_times)
+        }
+
+        created, updated = {}, {}
+        for trade, trade_keys in zip(trades, keys):
+            for key in trade_keys:
+                candle = existing.get(key)
+                if candle is not None:
+                    updated[key] = candle
+                else:
+                    candle = created.get(key)
+                if candle is None:
+                    candle = created[key] = Candle(
+                        trading_pair=trading_pair, interval=key[0], open_time=key[1],
+                        open=trade.price, high=trade.price, low=trade.price,
+                        close=trade.price, volume=Decimal('0'), trade_count=0,
+                    )
+                if trade.price > candle.high:
+                    candle.high = trade.price
+                if trade.price < candle.low:
+                    candle.low = trade.price
+                candle.close = trade.price
+                candle.volume += trade.quantity
+                candle.trade_count += 1
+
+        if created:
+            Candle.objects.bulk_create(list(created.values()))
+        if updated:
+            Candle.objects.bulk_update(list(updated.values()), OHLCV_FIELDS)
+        return list(updated.values()) + list(created.values())
+
+    @staticmethod
+    def to_dict(candle):
+        return {
+            'open_time': candle.open_time.isoformat(),
+            'open': str(candle.open),
+            'high': str(candle.high),
+            'low': str(candle.low),
+            'close': str(candle.close),
+            'volume': str(candle.volume),
+            'trade_count': candle.trade_count,
+        }
+
+    @classmethod
+    def klines(cls, trading_pair, interval, start=None, end=None, limit=500):
+        """
+        Up to ``limit`` candles opening in [start, end], oldest first.
+        Without ``start`` the latest ``limit`` candles up to ``end``.
+        """
+        queryset = Candle.objects.filter(trading_pair=trading_pair, interval=interval)
+        if end is not None:
+            queryset = queryset.filter(open_time__lte=end)
+        if start is not None:
+            candles = list(queryset.filter(open_time__gte=start).order_by('open_time')[:limit])
+        else:
+            candles = list(queryset.order_by('-open_time')[:limit])[::-1]
+        return [cls.to_dict(candle) for candle in candles]
+
+    @classmethod
+    def backfill_day(cls, trading_pair, day):
+        """Rebuild every candle of ``trading_pair`` opening on UTC date ``day``; returns the count"""
+        start = datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
+        end = start + timedelta(days=1)
+
+        with transaction.atomic():
+            TradingPair.objects.select_for_update().get(pk=trading_pair.pk)
+
+            rows = list(Trade.objects.filter(
+                trading_pair=trading_pair, created_at__gte=start, created_at__lt=end
+            ).order_by('created_at', 'id').values_list('created_at', 'price', 'quantity'))
+
+            Candle.objects.filter(
+                trading_pair=trading_pair, open_time__gte=start, open_time__lt=end
+            ).delete()
+            if not rows:
+                return 0
+
+            times = np.array([_epoch(created_at) for created_at, _, _ in rows], dtype=np.int64)
+            prices = np.array([_fixed(price) for _, price, _ in rows], dtype=np.int64)
+            volumes = np.array([_fixed(quantity) for _, _, quantity in rows], dtype=object)
+            counts = np.ones(len(rows), dtype=np.int64)
+
+            minutes = _reduce(times, prices, prices, prices, prices, volumes, counts, INTERVAL_SECONDS['1m'])
+            candles = []
+            for interval in CANDLE_INTERVALS:
+                columns = minutes if interval == '1m' else _reduce(*minutes, INTERVAL_SECONDS[interval])
+                candles.extend(
+                    Candle(
+                        trading_pair=trading_pair, interval=interval, open_time=_datetime(open_time),
+                        open=_decimal(o), high=_decimal(h), low=_decimal(l), close=_decimal(c),
+                        volume=_decimal(v), trade_count=int(n),
+                    )
+                    for open_time, o, h, l, c, v, n in zip(*columns)
+                )
+            Candle.objects.bulk_create(candles, batch_size=1000)
+
+        logger.info(f"Backfilled {len(candles)} candles for {trading_pair.symbol} on {day}")
+        return len(candles)
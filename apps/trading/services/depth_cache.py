@@ -0,0 +1,81 @@
+"""
+Depth Cache
+===========
+Aggregated L2 depth (price -> remaining quantity) per trading pair.
+
+The matching engine's resident books keep per-level totals up to date on
+every insert, fill and cancel. After each committed cycle the engine
+publishes the top levels of the book here, tagged with the pair's
+``book_sequence``, so web workers serve depth and spread in O(depth)
+without querying the orders table.
+
+The snapshot is stored in the default Django cache (Redis in production) so
+every worker reads the same one. When the cache is a ``DummyCache`` a
+process-local dict stands in, which is enough for the inline engine mode.
+"""
+
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+
+KEY = 'orderbook:depth:{pair_id}'
+
+# Order price and quantity columns are stored with 8 decimal places; levels
+# are rendered the same way the database aggregates would render them
+PLACES = Decimal('0.00000001')
+
+
+class DepthCache:
+    """Publish and read L2 depth snapshots per trading pair"""
+
+    _local = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _shared():
+        return not isinstance(caches['default'], DummyCache)
+
+    @staticmethod
+    def levels():
+        return settings.MATCHING_ENGINE_CONFIG['DEPTH_CACHE_LEVELS']
+
+    @staticmethod
+    def format_levels(levels):
+        formatted = []
+        for price, quantity in levels:
+            price, quantity = price.quantize(PLACES), quantity.quantize(PLACES)
+            formatted.append({'price': str(price), 'quantity': str(quantity), 'total': str(price * quantity)})
+        return formatted
+
+    @classmethod
+    def snapshot(cls, book, sequence):
+        """Top levels of a resident book; call while holding the book lock"""
+        depth = book.depth(cls.levels())
+        return {
+            'sequence': sequence,
+            'bids': cls.format_levels(depth['bids']),
+            'asks': cls.format_levels(depth['asks']),
+        }
+
+    @classmethod
+    def publish(cls, trading_pair_id, snapshot):
+        key = KEY.format(pair_id=trading_pair_id)
+        if cls._shared():
+            cache.set(key, snapshot, timeout=None)
+            return
+        with cls._lock:
+            current = cls._local.get(key)
+            if current is None or current['sequence'] <= snapshot['sequence']:
+                cls._local[key] = snapshot
+
+    @classmethod
+    def get(cls, trading_pair):
+        """Snapshot for ``trading_pair`` if it is as new as the pair row, else None"""
+        key = KEY.format(pair_id=trading_pair.pk)
+        snapshot = cache.get(key) if cls._shared() else cls._local.get(key)
+        if snapshot is None or snapshot['sequence'] < trading_pair.book_sequence:
+            return None
+        return snapshot
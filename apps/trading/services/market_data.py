@@ -0,0 +1,390 @@
+"""
+Market Data Publisher
+=====================
+Pushes order book changes and trades to the WebSocket channel groups.
+
+After every matching cycle that changed a book the engine publishes an L2
+delta: only the price levels the cycle touched, each with its new total
+quantity (0 when the level emptied out). Deltas are numbered with the
+pair's ``book_sequence``:
+
+    {
+        "symbol": "ETH_USDT",
+        "sequence": 1042,
+        "prev_sequence": 1041,
+        "bids": [{"price": ..., "quantity": ..., "total": ...}],
+        "asks": [...],
+        "timestamp": ...
+    }
+
+Conflation
+----------
+A busy pair produces far more events than subscribers need, so events are
+merged per group over a window and sent as one frame per window. Each depth
+interval in ``MARKET_DATA_CONFIG['DEPTH_INTERVALS_MS']`` is its own group:
+the first is ``orderbook_{symbol}``, the others ``orderbook_{symbol}_{ms}ms``.
+Within a window later level quantities replace earlier ones and the frame
+spans ``prev_sequence`` of the first delta to ``sequence`` of the last. A
+window only ever holds consecutive deltas: in inline mode several processes
+publish the same pair, and a delta that does not continue the window (one
+published elsewhere came in between) closes it early and opens the next.
+Trades are batched the same way on ``trades_{symbol}``, and the 24h ticker
+is sent on ``ticker_{symbol}`` at most once per ``TICKER_INTERVAL_MS`` (the
+latest figures win). Candles changed by a cycle go to
+``candles_{symbol}_{interval}`` per ``CANDLE_INTERVAL_MS``, the latest state
+of each candle winning. An interval of 0 sends every event as it happens.
+
+A client applies a frame only if its ``prev_sequence`` is the sequence it
+last applied, and ignores frames whose ``sequence`` it already has. Any
+other frame means a gap, or frames from different processes arriving out
+of order, and the client must resync from a snapshot (``{"type":
+"resync"}`` on the socket, or the REST order book), which carries the
+``sequence`` it reflects.
+
+Encoding
+--------
+Every frame is encoded once, when it is published, not once per
+subscriber: the channel layer message carries the finished WebSocket frame
+as JSON ``text`` and, when ``MSGPACK_FRAMES`` is on, as msgpack ``bytes``.
+Consumers forward whichever their connection asked for as-is.
+
+Streams
+-------
+Each group is also addressable by a stream name, which is included in every
+frame so a multiplexed socket can tell its subscriptions apart:
+
+    book:ETH_USDT           orderbook_ETH_USDT (default depth interval)
+    book:ETH_USDT:1000      orderbook_ETH_USDT_1000ms
+    trades:ETH_USDT         trades_ETH_USDT
+    ticker:ETH_USDT         ticker_ETH_USDT
+    candles:ETH_USDT:1m     candles_ETH_USDT_1m
+"""
+
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+
+try:
+    import msgpack
+except ImportError:  # in requirements; frames fall back to JSON without it
+    msgpack = None
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from apps.trading.services.depth_cache import DepthCache
+
+logger = logging.getLogger('apps.trading')
+
+
+def _config():
+    return settings.MARKET_DATA_CONFIG
+
+
+# Channel layer event type -> ``type`` of the frame clients receive
+FRAME_TYPES = {
+    'orderbook_update': 'orderbook_update',
+    'trades_update': 'trades',
+    'ticker_update': 'ticker',
+    'candle_update': 'candle',
+}
+
+CANDLE_INTERVALS = ('1m', '5m', '15m', '1h', '4h', '1d')
+
+
+class Streams:
+    """Public market data stream names and the channel-layer groups behind them"""
+
+    KINDS = ('book', 'trades', 'ticker', 'candles')
+
+    @staticmethod
+    def depth_intervals(symbol):
+        """Configured depth intervals (ms) for a symbol, default channel first"""
+        return _config()['SYMBOL_DEPTH_INTERVALS_MS'].get(symbol, _config()['DEPTH_INTERVALS_MS'])
+
+    @classmethod
+    def book(cls, symbol, interval=None):
+        """Depth stream name; the default or an unknown interval gives the default stream"""
+        intervals = cls.depth_intervals(symbol)
+        if interval is None or interval == intervals[0] or interval not in intervals:
+            return f'book:{symbol}'
+        return f'book:{symbol}:{interval}'
+
+    @classmethod
+    def parse(cls, stream):
+        """
+        ``(kind, symbol, param)`` for a stream name, normalized.
+
+        Raises ``ValueError`` for a malformed name; the symbol is not checked.
+        """
+        kind, _, rest = stream.partition(':')
+        symbol, _, param = rest.partition(':')
+        symbol = symbol.upper()
+        if kind not in cls.KINDS or not symbol or not symbol.replace('_', '').isalnum():
+            raise ValueError(f"Unknown stream: {stream}")
+        if kind == 'book':
+            if param:
+                intervals = cls.depth_intervals(symbol)
+                if not param.isdigit() or int(param) not in intervals:
+                    raise ValueError(f"Unsupported depth interval: {param}")
+                param = '' if int(param) == intervals[0] else str(int(param))
+            return kind, symbol, param
+        if kind == 'candles':
+            if param not in CANDLE_INTERVALS:
+                raise ValueError(f"Unsupported candle interval: {param or '(none)'}")
+            return kind, symbol, param
+        if param:
+            raise ValueError(f"Unknown stream: {stream}")
+        return kind, symbol, ''
+
+    @classmethod
+    def name(cls, kind, symbol, param=''):
+        return f'{kind}:{symbol}:{param}' if param else f'{kind}:{symbol}'
+
+    @classmethod
+    def group(cls, stream):
+        kind, symbol, param = cls.parse(stream)
+        if kind == 'book':
+            return f'orderbook_{symbol}_{param}ms' if param else f'orderbook_{symbol}'
+        if kind == 'candles':
+            return f'candles_{symbol}_{param}'
+        return f'{kind}_{symbol}'
+
+
+def encode_frame(frame_type, data, stream=None):
+    """WebSocket frame for ``data``, encoded once as JSON text and optionally msgpack"""
+    content = {'type': frame_type, 'data': data}
+    if stream is not None:
+        content['stream'] = stream
+    encoded = {'text': json.dumps(content, separators=(',', ':'))}
+    if msgpack is not None and _config()['MSGPACK_FRAMES']:
+        encoded['bytes'] = msgpack.packb(content)
+    return encoded
+
+
+def _group_send(stream, event_type, data):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    group = Streams.group(stream)
+    try:
+        message = encode_frame(FRAME_TYPES[event_type], data, stream)
+        # Routing metadata for consumers, which never decode the frame
+        message.update(type=event_type, stream=stream, symbol=data.get('symbol'), sequence=data.get('sequence'))
+        async_to_sync(channel_layer.group_send)(group, message)
+    except Exception:
+        # Subscribers detect the gap from the sequence numbers and resync
+        logger.exception(f"Failed to publish {event_type} to {group}")
+
+
+class Conflator:
+    """
+    Merge events per stream over a window and send one frame per window.
+
+    The first event for a stream opens its window; a background thread sends
+    the merged frame when the window closes.
+    """
+
+    def __init__(self, send=_group_send):
+        self._send = send
+        # stream -> [due, event_type, accumulator, merge]
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, stream, event_type, data, interval, merge):
+        """
+        Queue ``data`` for ``stream``; ``merge(accumulator, data)`` folds it in
+        (with ``accumulator=None`` for the first event of a window) and
+        ``merge(accumulator, None)`` renders the frame. A merge that returns
+        None cannot fold ``data`` into the window, which is sent at once and
+        replaced by a new window starting with ``data``.
+        """
+        ready = []
+        with self._cond:
+            pending = self._pending.get(stream)
+            if pending is not None:
+                merged = merge(pending[2], data)
+                if merged is not None:
+                    pending[2] = merged
+                    return
+                del self._pending[stream]
+                ready.append((pending[0], stream, event_type, merge(pending[2], None)))
+            self._pending[stream] = [time.monotonic() + interval, event_type, merge(None, data), merge]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='market-data-conflator', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        self._send_all(ready)
+
+    def flush(self, force=False):
+        """Send every frame whose window has closed (all of them if ``force``)"""
+        with self._cond:
+            ready = self._take(force)
+        self._send_all(ready)
+
+    def _take(self, force):
+        now = time.monotonic()
+        ready = []
+        for stream, (due, event_type, accumulator, merge) in list(self._pending.items()):
+            if force or due <= now:
+                del self._pending[stream]
+                ready.append((due, stream, event_type, merge(accumulator, None)))
+        ready.sort(key=lambda item: item[0])
+        return ready
+
+    def _send_all(self, ready):
+        for _, stream, event_type, frame in ready:
+            self._send(stream, event_type, frame)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                delay = min(pending[0] for pending in self._pending.values()) - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                ready = self._take(force=False)
+            self._send_all(ready)
+
+
+def merge_depth(accumulator, delta):
+    """
+    Fold an L2 delta into a window; later level quantities win. Returns None
+    for a delta that does not follow the window's last sequence.
+    """
+    if delta is None:
+        frame = dict(accumulator)
+        for side, descending in (('bids', True), ('asks', False)):
+            frame[side] = sorted(
+                accumulator[side].values(), key=lambda level: Decimal(level['price']), reverse=descending
+            )
+        return frame
+    if accumulator is None:
+        accumulator = {'symbol': delta['symbol'], 'prev_sequence': delta['prev_sequence'], 'bids': {}, 'asks': {}}
+    elif delta['prev_sequence'] != accumulator['sequence']:
+        return None
+    accumulator['sequence'] = delta['sequence']
+    accumulator['timestamp'] = delta['timestamp']
+    for side in ('bids', 'asks'):
+        for level in delta[side]:
+            accumulator[side][level['price']] = level
+    return accumulator
+
+
+def merge_trades(accumulator, batch):
+    """Concatenate trade batches in execution order"""
+    if batch is None:
+        return accumulator
+    if accumulator is None:
+        return {'symbol': batch['symbol'], 'trades': list(batch['trades'])}
+    accumulator['trades'].extend(batch['trades'])
+    return accumulator
+
+
+def merge_latest(accumulator, data):
+    """Keep only the latest event of a window"""
+    return accumulator if data is None else data
+
+
+def merge_candles(accumulator, update):
+    """Keep the latest state of each candle in a window, oldest candle first"""
+    if update is None:
+        frame = dict(accumulator)
+        frame['candles'] = sorted(accumulator['candles'].values(), key=lambda candle: candle['open_time'])
+        return frame
+    if accumulator is None:
+        accumulator = {'symbol': update['symbol'], 'interval': update['interval'], 'candles': {}}
+    for candle in update['candles']:
+        accumulator['candles'][candle['open_time']] = candle
+    return accumulator
+
+
+class MarketDataPublisher:
+    """Broadcast market data events to WebSocket groups"""
+
+    conflator = Conflator()
+
+    @staticmethod
+    def depth_group(symbol, interval=None):
+        """Group for a symbol's depth channel; unknown intervals get the default one"""
+        return Streams.group(Streams.book(symbol, interval))
+
+    @staticmethod
+    def book_delta(symbol, sequence, prev_sequence, changes):
+        """Delta message for the levels in ``changes`` (see ``MemoryOrderBook.changes``)"""
+        return {
+            'symbol': symbol,
+            'sequence': sequence,
+            'prev_sequence': prev_sequence,
+            'bids': DepthCache.format_levels(changes['bids']),
+            'asks': DepthCache.format_levels(changes['asks']),
+            'timestamp': timezone.now().isoformat(),
+        }
+
+    @staticmethod
+    def trade_batch(symbol, trades):
+        """Public trade messages, side being the taker's side"""
+        return {
+            'symbol': symbol,
+            'trades': [
+                {
+                    'id': str(trade.pk),
+                    'price': str(trade.price),
+                    'quantity': str(trade.quantity),
+                    'side': 'sell' if trade.is_buyer_maker else 'buy',
+                    'timestamp': trade.created_at.isoformat(),
+                }
+                for trade in trades
+            ],
+        }
+
+    @staticmethod
+    def ticker(pair):
+        """Ticker message from a ``TradingPair``'s last price and 24h figures"""
+        return {
+            'symbol': pair.symbol,
+            'last_price': str(pair.last_price),
+            'price_change_24h': str(pair.price_change_24h),
+            'high_24h': str(pair.high_24h),
+            'low_24h': str(pair.low_24h),
+            'volume_24h': str(pair.volume_24h),
+        }
+
+    @classmethod
+    def publish_book_delta(cls, delta):
+        symbol = delta['symbol']
+        for interval in Streams.depth_intervals(symbol):
+            cls._publish(Streams.book(symbol, interval), 'orderbook_update', delta, interval, merge_depth)
+
+    @classmethod
+    def publish_trades(cls, batch):
+        interval = _config()['TRADE_INTERVAL_MS']
+        cls._publish(Streams.name('trades', batch['symbol']), 'trades_update', batch, interval, merge_trades)
+
+    @classmethod
+    def publish_ticker(cls, ticker):
+        interval = _config()['TICKER_INTERVAL_MS']
+        cls._publish(Streams.name('ticker', ticker['symbol']), 'ticker_update', ticker, interval, merge_latest)
+
+    @classmethod
+    def publish_candles(cls, symbol, candles):
+        """Publish candles (``CandleService.to_dict`` form) keyed by interval"""
+        interval = _config()['CANDLE_INTERVAL_MS']
+        for candle_interval, updates in candles.items():
+            update = {'symbol': symbol, 'interval': candle_interval, 'candles': updates}
+            stream = Streams.name('candles', symbol, candle_interval)
+            cls._publish(stream, 'candle_update', update, interval, merge_candles)
+
+    @classmethod
+    def _publish(cls, stream, event_type, data, interval, merge):
+        if interval <= 0:
+            _group_send(stream, event_type, merge(merge(None, data), None))
+        else:
+            cls.conflator.add(stream, event_type, data, interval / 1000, merge)
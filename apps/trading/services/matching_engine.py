@@ -1,24 +1,116 @@
 """
 Order Matching Engine
 """
+import time
+from contextlib import contextmanager
 from decimal import Decimal
+from functools import partial
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from apps.trading.models import Order, Trade, TradingPair
+from apps.trading.services.candles import CandleService
+from apps.trading.services.depth_cache import DepthCache
+from apps.trading.services.journal import MatchingJournal, RecordType, order_to_record
+from apps.trading.services.market_data import MarketDataPublisher
+from apps.trading.services.memory_book import OrderBookRegistry
+from apps.trading.services.settlement import InsufficientBalance, Settlement
+from apps.trading.services.ticker import RollingTicker, TickerRegistry
+from apps.trading.services.user_events import UserEventBatch
+from apps.wallets.models import LedgerEntry
+
+
+class OrderRejected(ValueError):
+    """A command was refused before anything in the book was touched."""
+
+class MatchingCycle:
+    """
+    One matching cycle: the locked pair, its book, the events to journal and
+    the fills still to be persisted.
+
+    Trades and order changes are collected while matching and written by
+    ``flush`` with one bulk insert and one bulk update per cycle, followed
+    by the cycle's ``Settlement``.
+    """
+
+    ORDER_FIELDS = [
+        'quantity', 'price', 'filled_quantity', 'status', 'order_type', 'triggered_at',
+        'highest_price_seen', 'lowest_price_seen', 'queued_at', 'updated_at',
+    ]
+
+    def __init__(self, pair, book):
+        self.pair = pair
+        self.book = book
+        self.records = []
+        self.trades = []
+        self.dirty_orders = {}
+        # Orders created or changed this cycle, reported to their owners
+        self.touched_orders = {}
+        self.settlement = Settlement(pair)
+        # Prices the trigger index has yet to be checked against
+        self.prices = []
+
+    def record(self, record_type, **payload):
+        self.records.append((record_type, payload))
+        return payload
+
+    def add_trade(self, trade, fill_record):
+        self.trades.append((trade, fill_record))
+        self.prices.append(trade.price)
+
+    @property
+    def changed(self):
+        """Whether the cycle did anything beyond (re)loading the book"""
+        return bool(self.dirty_orders) or any(t != RecordType.BOOK for t, _ in self.records)
+
+    def mark_dirty(self, order, notify=True):
+        order.updated_at = timezone.now()
+        self.dirty_orders[order.pk] = order
+        if notify:
+            self.touched_orders[order.pk] = order
+
+    def user_events(self):
+        """Owners' view of the cycle: fills, final order states and balances"""
+        events = UserEventBatch()
+        for trade, _ in self.trades:
+            events.trade(trade, self.pair.symbol)
+        for order in self.touched_orders.values():
+            events.order(order, self.pair.symbol)
+        if self.settlement.balances:
+            symbols = {currency.pk: currency.symbol for currency in self.settlement.currencies}
+            for balance in self.settlement.balances:
+                events.balance(balance, symbols[balance.currency_id])
+        return events
+
+    def flush(self):
+        """Persist this cycle's trades and order updates"""
+        if self.trades:
+            Trade.objects.bulk_create([trade for trade, _ in self.trades])
+            for trade, fill_record in self.trades:
+                fill_record['trade'] = trade.pk
+        if self.dirty_orders:
+            Order.objects.bulk_update(list(self.dirty_orders.values()), self.ORDER_FIELDS)
+        self.settlement.flush()
 
 
 class MatchingEngine:
-    """Simple order matching engine"""
-    
+    """Order matching engine backed by a resident per-pair order book"""
+
+    @staticmethod
+    def _config():
+        return settings.MATCHING_ENGINE_CONFIG
+
     @classmethod
-    def create_order(cls, user, trading_pair, order_type, side, quantity, 
+    def create_order(cls, user, trading_pair, order_type, side, quantity,
                      price=None, time_in_force='gtc', client_order_id=None):
         """Create and attempt to match an order"""
-        
-        with transaction.atomic():
+        if order_type == Order.OrderType.LIMIT and price is None:
+            raise ValueError("Limit orders need a price")
+
+        with cls._book_cycle(trading_pair) as cycle:
             order = Order.objects.create(
                 user=user,
-                trading_pair=trading_pair,
+                trading_pair=cycle.pair,
                 order_type=order_type,
                 side=side,
                 quantity=quantity,
@@ -27,58 +119,424 @@ class MatchingEngine:
                 client_order_id=client_order_id or '',
                 status=Order.Status.OPEN
             )
-            
+
             trades = []
             if order_type == Order.OrderType.MARKET or order_type == Order.OrderType.LIMIT:
-                trades = cls.match_order(order)
-            
+                trades = cls._match(order, cycle)
+
             return order, trades
-    
+
+    @classmethod
+    def create_orders(cls, user, trading_pair, orders, atomic=False):
+        """
+        Place several market or limit orders of one user on one pair in a
+        single cycle: one pair lock and one settlement pass over the user's
+        balances.
+
+        ``orders`` are dicts of ``create_order`` keyword arguments, matched
+        in the given order. Returns ``(order, trades, error)`` per order.
+        Each order's funds are checked against the book and balances left by
+        the orders before it, and only an order that passes is saved; one
+        rejected for insufficient funds stays unsaved and carries the error.
+        With ``atomic`` the first rejection raises ``ValueError`` and nothing
+        in the batch is placed.
+        """
+        for index, spec in enumerate(orders):
+            if spec['order_type'] == Order.OrderType.LIMIT and spec.get('price') is None:
+                raise ValueError(f"Order {index}: Limit orders need a price")
+
+        with cls._book_cycle(trading_pair) as cycle:
+            results = []
+            for index, spec in enumerate(orders):
+                order = Order(
+                    user=user,
+                    trading_pair=cycle.pair,
+                    order_type=spec['order_type'],
+                    side=spec['side'],
+                    quantity=spec['quantity'],
+                    price=spec.get('price'),
+                    time_in_force=spec.get('time_in_force', Order.TimeInForce.GTC),
+                    client_order_id=spec.get('client_order_id') or '',
+                    status=Order.Status.OPEN
+                )
+                try:
+                    cycle.settlement.check(order, cycle.book)
+                except InsufficientBalance as e:
+                    if atomic:
+                        # Not InsufficientBalance: earlier orders may already
+                        # have changed the book, which must be reloaded
+                        raise ValueError(f"Order {index}: {e}") from e
+                    results.append((order, [], str(e)))
+                    continue
+                order.save()
+                results.append((order, cls._match(order, cycle), None))
+            return results
+
     @classmethod
     def match_order(cls, order):
         """Attempt to match an order against the order book"""
-        trades = []
-        
-        if order.side == Order.Side.BUY:
-            # Match against sell orders (asks)
-            opposite_orders = Order.objects.filter(
-                trading_pair=order.trading_pair,
-                side=Order.Side.SELL,
-                status__in=[Order.Status.OPEN, Order.Status.PARTIALLY_FILLED]
-            ).order_by('price', 'created_at')
-            
-            if order.order_type == Order.OrderType.LIMIT:
-                opposite_orders = opposite_orders.filter(price__lte=order.price)
+        with cls._book_cycle(order.trading_pair) as cycle:
+            return cls._match_funded(order, cycle)
+
+    @classmethod
+    def create_stop_order(cls, user, trading_pair, order_type, side, quantity, price=None,
+                          stop_price=None, take_profit_price=None, trailing_stop_percent=None,
+                          reference_price=None):
+        """Create a pending stop, take-profit or trailing stop order and index it"""
+        with cls._book_cycle(trading_pair) as cycle:
+            is_trailing = order_type == Order.OrderType.TRAILING_STOP
+            order = Order.objects.create(
+                user=user,
+                trading_pair=cycle.pair,
+                order_type=order_type,
+                side=side,
+                status=Order.Status.PENDING,
+                quantity=quantity,
+                price=price,
+                stop_price=stop_price,
+                take_profit_price=take_profit_price,
+                trailing_stop_percent=trailing_stop_percent,
+                highest_price_seen=reference_price if is_trailing and side == Order.Side.SELL else None,
+                lowest_price_seen=reference_price if is_trailing and side == Order.Side.BUY else None,
+            )
+            cls._add_stop(order, cycle)
+            return order
+
+    @classmethod
+    def create_oco_order(cls, user, trading_pair, side, quantity, limit_price, stop_price,
+                         stop_limit_price=None):
+        """Create an OCO pair: a resting limit leg and a pending stop leg"""
+        with cls._book_cycle(trading_pair) as cycle:
+            limit_order = Order.objects.create(
+                user=user,
+                trading_pair=cycle.pair,
+                order_type=Order.OrderType.LIMIT,
+                side=side,
+                status=Order.Status.OPEN,
+                quantity=quantity,
+                price=limit_price,
+            )
+            stop_order = Order.objects.create(
+                user=user,
+                trading_pair=cycle.pair,
+                order_type=Order.OrderType.STOP_LIMIT if stop_limit_price else Order.OrderType.STOP_LOSS,
+                side=side,
+                status=Order.Status.PENDING,
+                quantity=quantity,
+                price=stop_limit_price,
+                stop_price=stop_price,
+                parent_order=limit_order,
+            )
+            limit_order.parent_order = stop_order
+            limit_order.save(update_fields=['parent_order'])
+
+            cls._match(limit_order, cycle)
+            if limit_order.filled_quantity > 0:
+                # The limit leg executed on arrival, so the stop leg is void
+                stop_order.status = Order.Status.CANCELLED
+                cycle.mark_dirty(stop_order)
+            else:
+                cls._add_stop(stop_order, cycle)
+            return limit_order, stop_order
+
+    @classmethod
+    def sweep_stops(cls, trading_pair):
+        """
+        Fallback sweep: index pending stops the engine has not seen (e.g.
+        created directly in the database) and fire any crossed by the last
+        price. Returns the orders triggered.
+        """
+        with cls._book_cycle(trading_pair) as cycle:
+            triggers = cycle.book.triggers
+            for order in cls._pending_stops(cycle.pair).exclude(pk__in=list(triggers.orders)):
+                cls._add_stop(order, cycle)
+            if cycle.pair.last_price > 0:
+                cycle.prices.append(cycle.pair.last_price)
+            return cls._fire_triggers(cycle)
+
+    @classmethod
+    @contextmanager
+    def _book_cycle(cls, trading_pair):
+        """
+        Run one matching cycle for a trading pair.
+
+        Locks the pair row (serialising matching per pair), yields a
+        ``MatchingCycle`` with the pair and its resident book - reloading the
+        book if another process has advanced ``book_sequence`` since it was
+        last used - and persists the new sequence and last price on exit.
+        Journal records are appended only once the transaction commits.
+        Commands refused with ``InsufficientBalance`` or ``OrderRejected``
+        leave the book untouched and current; any other error marks it stale.
+        """
+        with transaction.atomic():
+            pair = TradingPair.objects.select_for_update().get(pk=trading_pair.pk)
+            book = OrderBookRegistry.get(pair.pk)
+
+            with book.lock:
+                cycle = MatchingCycle(pair, book)
+                if book.sequence != pair.book_sequence:
+                    book.load(cls._resting_orders(pair), pair.book_sequence, cls._pending_stops(pair))
+                    cycle.record(
+                        RecordType.BOOK,
+                        orders=[order_to_record(o) for o in book.orders.values()],
+                        stops=[order_to_record(o) for o in book.triggers.orders.values()],
+                    )
+
+                token = book.begin_cycle()
+                try:
+                    yield cycle
+                except (InsufficientBalance, OrderRejected):
+                    # Rejected before the book was touched, so it is still current
+                    book.commit_cycle(token, pair.book_sequence)
+                    raise
+
+                cls._fire_triggers(cycle)
+                cycle.flush()
+                trades = [trade for trade, _ in cycle.trades]
+                # Before the ticker, which rebuilds from the 1m candles
+                written = CandleService.record(pair, trades)
+                if cycle.changed:
+                    update_fields = ['last_price', 'book_sequence']
+                    ticker = TickerRegistry.get(pair.pk)
+                    ticker_current = ticker.begin(pair.book_sequence)
+                    if cycle.trades:
+                        cls._roll_ticker(cycle, ticker, ticker_current)
+                        update_fields += RollingTicker.FIELDS
+                    pair.book_sequence += 1
+                    pair.save(update_fields=update_fields)
+                    if ticker_current or cycle.trades:
+                        transaction.on_commit(partial(ticker.commit, pair.book_sequence))
+                    delta = MarketDataPublisher.book_delta(
+                        pair.symbol, pair.book_sequence, pair.book_sequence - 1, book.changes()
+                    )
+                    transaction.on_commit(partial(MarketDataPublisher.publish_book_delta, delta))
+                if cycle.trades:
+                    batch = MarketDataPublisher.trade_batch(pair.symbol, trades)
+                    transaction.on_commit(partial(MarketDataPublisher.publish_trades, batch))
+                    candles = {}
+                    for candle in written:
+                        candles.setdefault(candle.interval, []).append(CandleService.to_dict(candle))
+                    transaction.on_commit(partial(MarketDataPublisher.publish_candles, pair.symbol, candles))
+                    transaction.on_commit(partial(MarketDataPublisher.publish_ticker, MarketDataPublisher.ticker(pair)))
+                cycle.user_events().publish_on_commit()
+                transaction.on_commit(partial(book.commit_cycle, token, pair.book_sequence))
+
+                if cycle.records:
+                    snapshot = DepthCache.snapshot(book, pair.book_sequence)
+                    transaction.on_commit(partial(DepthCache.publish, pair.pk, snapshot))
+
+                journal = MatchingJournal.active()
+                if journal is not None and cycle.records:
+                    transaction.on_commit(partial(journal.append_cycle, pair.pk, pair.book_sequence, cycle.records))
+
+    @classmethod
+    def _roll_ticker(cls, cycle, ticker, current):
+        """Fold the cycle's trades into the pair's 24h ticker and copy its figures onto the pair"""
+        if current:
+            for trade, _ in cycle.trades:
+                ticker.add(trade.price, trade.quantity, trade.created_at)
         else:
-            # Match against buy orders (bids)
-            opposite_orders = Order.objects.filter(
-                trading_pair=order.trading_pair,
-                side=Order.Side.BUY,
-                status__in=[Order.Status.OPEN, Order.Status.PARTIALLY_FILLED]
-            ).order_by('-price', 'created_at')
-            
-            if order.order_type == Order.OrderType.LIMIT:
-                opposite_orders = opposite_orders.filter(price__gte=order.price)
-        
-        for opposite_order in opposite_orders:
-            if order.remaining_quantity <= 0:
+            # The rebuild sees this cycle's trades too: their candles are written already
+            ticker.reload()
+        ticker.apply_to(cycle.pair)
+
+    @classmethod
+    def refresh_ticker(cls, trading_pair):
+        """
+        Expire the pair's 24h ticker up to now and save the figures if they
+        moved. Trading pairs are refreshed by every cycle that trades; this
+        catches up pairs that have gone quiet.
+        """
+        with transaction.atomic():
+            pair = TradingPair.objects.select_for_update().get(pk=trading_pair.pk)
+            ticker = TickerRegistry.get(pair.pk)
+            if not ticker.begin(pair.book_sequence):
+                ticker.reload()
+            ticker.commit(pair.book_sequence)
+            if ticker.apply_to(pair):
+                pair.save(update_fields=RollingTicker.FIELDS + ['updated_at'])
+                transaction.on_commit(partial(MarketDataPublisher.publish_ticker, MarketDataPublisher.ticker(pair)))
+            return pair
+
+    @classmethod
+    def _resting_orders(cls, trading_pair):
+        """Open limit orders for a pair in queue (time priority) order"""
+        return Order.objects.filter(
+            trading_pair=trading_pair,
+            order_type=Order.OrderType.LIMIT,
+            status__in=[Order.Status.OPEN, Order.Status.PARTIALLY_FILLED],
+            price__isnull=False
+        ).order_by('queued_at', 'id')
+
+    @classmethod
+    def _pending_stops(cls, trading_pair):
+        """Untriggered stop orders for a pair, oldest first"""
+        return Order.objects.filter(
+            trading_pair=trading_pair,
+            status=Order.Status.PENDING,
+            order_type__in=[
+                Order.OrderType.STOP_LOSS,
+                Order.OrderType.STOP_LIMIT,
+                Order.OrderType.TAKE_PROFIT,
+                Order.OrderType.TAKE_PROFIT_LIMIT,
+                Order.OrderType.TRAILING_STOP,
+            ]
+        ).order_by('created_at', 'id')
+
+    @classmethod
+    def _add_stop(cls, order, cycle):
+        """Index a pending stop; it fires at once if the last price already crosses it"""
+        cycle.book.triggers.add(order)
+        cycle.record(RecordType.STOP, **order_to_record(order))
+        cycle.touched_orders[order.pk] = order
+        if cycle.pair.last_price > 0:
+            cycle.prices.append(cycle.pair.last_price)
+
+    @classmethod
+    def _fire_triggers(cls, cycle):
+        """
+        Trigger and match every stop crossed by this cycle's prices.
+
+        Matching a triggered stop produces new trades and so new prices,
+        which are checked in turn until nothing else fires.
+        """
+        triggers = cycle.book.triggers
+        triggered = []
+        while cycle.prices:
+            prices, cycle.prices = cycle.prices, []
+            if not triggers:
+                continue
+
+            low, high = min(prices), max(prices)
+            fired = triggers.crossed(low, high)
+            if triggers.trailing:
+                fired += triggers.update_trailing(low, high, prices[-1])
+
+            for order in fired:
+                cls._trigger(order, cycle)
+            triggered += fired
+
+        trailing = triggers.trailing
+        if trailing and time.monotonic() - trailing.checkpointed_at >= cls._config()['TRAILING_CHECKPOINT_SECONDS']:
+            cls._checkpoint_trailing(cycle)
+        return triggered
+
+    @classmethod
+    def _checkpoint_trailing(cls, cycle):
+        """Persist trailing-stop watermarks that moved since the last checkpoint"""
+        for order in cycle.book.triggers.trailing.sync():
+            cycle.mark_dirty(order, notify=False)
+            cycle.record(RecordType.STOP, **order_to_record(order))
+
+    @classmethod
+    def _trigger(cls, order, cycle):
+        """Turn a fired stop into a market or limit order and match it"""
+        order.trigger(save=False)
+        cycle.mark_dirty(order)
+        cycle.record(RecordType.TRIGGER, id=order.pk)
+        cls._cancel_sibling(order, cycle)
+        cls._match_funded(order, cycle)
+
+    @classmethod
+    def _cancel_sibling(cls, order, cycle):
+        """Cancel the other leg of an OCO pair once one leg executes"""
+        sibling_id = order.parent_order_id
+        if sibling_id is None:
+            return
+        book = cycle.book
+        sibling = book.triggers.remove(sibling_id)
+        if sibling is None:
+            sibling = book.remove(sibling_id)
+            if sibling is None:
+                return
+            cycle.settlement.release(sibling)
+        sibling.status = Order.Status.CANCELLED
+        cycle.mark_dirty(sibling)
+        cycle.record(RecordType.CANCEL, id=sibling.pk, reason='oco')
+
+    @classmethod
+    def _match_funded(cls, order, cycle):
+        """Match an order whose funds are reserved only now, dropping it if they are missing"""
+        try:
+            return cls._match(order, cycle)
+        except InsufficientBalance:
+            order.status = Order.Status.CANCELLED
+            cycle.mark_dirty(order)
+            cycle.record(RecordType.CANCEL, id=order.pk, reason='insufficient_balance')
+            return []
+
+    @classmethod
+    def _match(cls, order, cycle):
+        """Match an order against the resident book, then rest or expire the remainder"""
+        book = cycle.book
+        if order.pk in book:
+            return []
+
+        cycle.settlement.reserve(order, book)
+        cycle.record(RecordType.NEW_ORDER, **order_to_record(order))
+        cycle.touched_orders[order.pk] = order
+        return cls._execute(order, cycle)
+
+    @classmethod
+    def _execute(cls, order, cycle):
+        """Match a reserved and journaled order, then rest or expire the remainder"""
+        book = cycle.book
+        trades = []
+        opposite = book.opposite(order.side)
+        limit_price = order.price if order.order_type == Order.OrderType.LIMIT else None
+
+        if (order.time_in_force == Order.TimeInForce.FOK
+                and opposite.available(limit_price, order.remaining_quantity) < order.remaining_quantity):
+            cls._expire(order, cycle)
+            cycle.settlement.finish(order, resting=False)
+            return trades
+
+        while order.remaining_quantity > 0:
+            level = opposite.best()
+            if level is None or not opposite.crosses(level.price, limit_price):
                 break
-            
-            trade = cls._execute_trade(order, opposite_order)
-            if trade:
-                trades.append(trade)
-        
+
+            maker = level.front()
+            trade = cls._execute_trade(order, maker, cycle)
+            book.fill(opposite, level, trade.quantity)
+            fill_record = cycle.record(
+                RecordType.FILL, taker=order.pk, taker_side=order.side, maker=maker.pk,
+                price=trade.price, quantity=trade.quantity, trade=None
+            )
+            cycle.add_trade(trade, fill_record)
+            cycle.settlement.trade(trade, order)
+            cls._cancel_sibling(maker, cycle)
+            trades.append(trade)
+
+        if trades:
+            cls._cancel_sibling(order, cycle)
+
+        resting = False
+        if order.remaining_quantity > 0:
+            if limit_price is not None and order.time_in_force == Order.TimeInForce.GTC:
+                book.add(order)
+                cycle.record(RecordType.REST, id=order.pk)
+                resting = True
+            else:
+                cls._expire(order, cycle)
+        cycle.settlement.finish(order, resting)
+
         return trades
-    
+
+    @classmethod
+    def _expire(cls, order, cycle):
+        """Expire the unfilled remainder of a market, IOC or FOK order"""
+        order.status = Order.Status.EXPIRED
+        cycle.mark_dirty(order)
+        cycle.record(RecordType.CANCEL, id=order.pk, reason='expired')
+
     @classmethod
-    def _execute_trade(cls, taker_order, maker_order):
-        """Execute a trade between two orders"""
+    def _execute_trade(cls, taker_order, maker_order, cycle):
+        """Execute a trade between two orders; persisted when the cycle flushes"""
+        trading_pair = cycle.pair
         trade_quantity = min(taker_order.remaining_quantity, maker_order.remaining_quantity)
         trade_price = maker_order.price  # Maker's price
-        
-        if trade_quantity <= 0:
-            return None
-        
+
         # Determine buyer and seller
         if taker_order.side == Order.Side.BUY:
             buyer_order = taker_order
@@ -86,26 +544,25 @@ class MatchingEngine:
         else:
             buyer_order = maker_order
             seller_order = taker_order
-        
+
         # Calculate fees
-        fee_rate = taker_order.trading_pair.taker_fee
+        fee_rate = trading_pair.taker_fee
         buyer_fee = trade_quantity * fee_rate
         seller_fee = (trade_quantity * trade_price) * fee_rate
-        
-        # Create trade
-        trade = Trade.objects.create(
-            trading_pair=taker_order.trading_pair,
+
+        trade = Trade(
+            trading_pair=trading_pair,
             buyer_order=buyer_order,
             seller_order=seller_order,
-            buyer=buyer_order.user,
-            seller=seller_order.user,
+            buyer_id=buyer_order.user_id,
+            seller_id=seller_order.user_id,
             price=trade_price,
             quantity=trade_quantity,
             buyer_fee=buyer_fee,
             seller_fee=seller_fee,
-            is_buyer_maker=(buyer_order == maker_order)
+            is_buyer_maker=(buyer_order is maker_order)
         )
-        
+
         # Update orders
         for order in [taker_order, maker_order]:
             order.filled_quantity += trade_quantity
@@ -113,20 +570,136 @@ class MatchingEngine:
                 order.status = Order.Status.FILLED
             else:
                 order.status = Order.Status.PARTIALLY_FILLED
-            order.save()
-        
-        # Update trading pair last price
-        taker_order.trading_pair.last_price = trade_price
-        taker_order.trading_pair.save(update_fields=['last_price'])
-        
+            cycle.mark_dirty(order)
+
+        # Persisted once per cycle by _book_cycle
+        trading_pair.last_price = trade_price
+
         return trade
-    
+
     @classmethod
     def cancel_order(cls, order):
         """Cancel an order"""
-        if order.status not in [Order.Status.OPEN, Order.Status.PARTIALLY_FILLED, Order.Status.PENDING]:
-            raise ValueError(f"Cannot cancel order with status {order.status}")
-        
-        order.status = Order.Status.CANCELLED
-        order.save()
-        return order
+        with cls._book_cycle(order.trading_pair) as cycle:
+            book = cycle.book
+            resting = book.orders.get(order.pk)
+            stop = book.triggers.orders.get(order.pk) if resting is None else None
+            if resting is not None:
+                order = resting
+            elif stop is not None:
+                order = stop
+            else:
+                order.refresh_from_db()
+
+            if order.status not in [Order.Status.OPEN, Order.Status.PARTIALLY_FILLED, Order.Status.PENDING]:
+                raise OrderRejected(f"Cannot cancel order with status {order.status}")
+
+            if resting is not None:
+                book.remove(order.pk)
+                cycle.settlement.release(order)
+            elif stop is not None:
+                book.triggers.remove(order.pk)
+            order.status = Order.Status.CANCELLED
+            cycle.mark_dirty(order)
+            cycle.record(RecordType.CANCEL, id=order.pk, reason='cancelled')
+            return order
+
+    @classmethod
+    def replace_order(cls, order, price=None, quantity=None):
+        """
+        Amend the price and/or total quantity of a resting limit order in one
+        cycle; returns ``(order, trades)``.
+
+        The new price and quantity must meet the pair's limits. Lowering only
+        the quantity keeps the order's place in the queue. Any other change
+        takes it out of the book and matches it again at the back of the
+        queue, with a new ``queued_at`` so a reloaded book agrees. Either way
+        only the difference in reserve is locked or unlocked.
+        """
+        with cls._book_cycle(order.trading_pair) as cycle:
+            book = cycle.book
+            resting = book.orders.get(order.pk)
+            if resting is None:
+                raise OrderRejected("Only open limit orders resting on the book can be amended")
+            order = resting
+
+            price = order.price if price is None else price
+            quantity = order.quantity if quantity is None else quantity
+            if quantity <= order.filled_quantity:
+                raise OrderRejected(f"Quantity must exceed the filled quantity {order.filled_quantity}")
+            if price == order.price and quantity == order.quantity:
+                return order, []
+            errors = cycle.pair.order_errors(quantity, price)
+            if errors:
+                raise OrderRejected(' '.join(errors.values()))
+
+            reserve = cycle.settlement.amend(order, price, quantity)
+            cycle.mark_dirty(order)
+
+            if price == order.price and quantity < order.quantity:
+                book.resize(order.pk, quantity)
+                cycle.record(RecordType.AMEND, id=order.pk, quantity=quantity)
+                return order, []
+
+            book.remove(order.pk)
+            cycle.record(RecordType.CANCEL, id=order.pk, reason='replaced')
+            order.price = price
+            order.quantity = quantity
+            order.queued_at = timezone.now()
+            cycle.settlement.reserved[order.pk] = reserve
+            cycle.record(RecordType.NEW_ORDER, **order_to_record(order))
+            return order, cls._execute(order, cycle)
+
+    @classmethod
+    def fund_resting_orders(cls, trading_pair):
+        """
+        Lock the reserve of every resting order on a pair that holds none -
+        orders placed before funds were reserved on acceptance - oldest
+        first, and cancel those whose owner no longer has the funds.
+        Returns ``(funded, cancelled)`` orders.
+        """
+        with cls._book_cycle(trading_pair) as cycle:
+            book = cycle.book
+            orders = sorted(book.orders.values(), key=lambda o: (o.created_at, o.pk))
+            locked = set(LedgerEntry.objects.filter(
+                entry_type='order_lock', reference_type='order',
+                reference_id__in=[str(order.pk) for order in orders]
+            ).values_list('reference_id', flat=True))
+
+            funded, cancelled = [], []
+            for order in orders:
+                if str(order.pk) in locked:
+                    continue
+                if cycle.settlement.fund(order):
+                    funded.append(order)
+                    continue
+                book.remove(order.pk)
+                order.status = Order.Status.CANCELLED
+                cycle.mark_dirty(order)
+                cycle.record(RecordType.CANCEL, id=order.pk, reason='unfunded')
+                cancelled.append(order)
+            return funded, cancelled
+
+    @classmethod
+    def cancel_all(cls, user, trading_pair, side=None):
+        """Cancel all of a user's resting and pending stop orders on a pair in one cycle"""
+        with cls._book_cycle(trading_pair) as cycle:
+            book = cycle.book
+
+            def owned(order):
+                return order.user_id == user.pk and (side is None or order.side == side)
+
+            cancelled = []
+            for order in [o for o in book.orders.values() if owned(o)]:
+                book.remove(order.pk)
+                cycle.settlement.release(order)
+                cancelled.append(order)
+            for order in [o for o in book.triggers.orders.values() if owned(o)]:
+                book.triggers.remove(order.pk)
+                cancelled.append(order)
+
+            for order in cancelled:
+                order.status = Order.Status.CANCELLED
+                cycle.mark_dirty(order)
+                cycle.record(RecordType.CANCEL, id=order.pk, reason='cancelled')
+            return cancelled
@@ -0,0 +1,559 @@
+"""
+In-Memory Order Book
+====================
+Resident price-level order book per trading pair.
+
+Each side keeps a dict of price -> PriceLevel (a FIFO queue of resting
+orders, indexed by order id so a cancel does not scan the level) plus a
+heap of prices, so the best level is read in O(1) and a new level is
+inserted in O(log n). Levels that empty out are dropped from the heap
+lazily the next time the best price is read. Depth, market-buy cost and
+fill-or-kill checks walk the levels in price order off the heap and stop
+as soon as they have what they need, instead of sorting the whole side.
+
+Pending stop orders live next to the book in a ``TriggerIndex``: two heaps
+keyed by trigger price (stops that fire when the price falls to their
+trigger, and stops that fire when it rises to it) plus ``TrailingStops``,
+whose triggers move with the price and are tracked as numpy arrays.
+
+The book holds ``Order`` instances and is only mutated by ``MatchingEngine``
+while it holds the trading pair row lock. ``sequence`` mirrors
+``TradingPair.book_sequence``; a mismatch means another process changed the
+pair and the book must be reloaded from the database.
+
+During a cycle the book remembers which price levels it touched, so the
+engine can publish the changed levels (an L2 delta) instead of the whole
+book.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import numpy as np
+
+from apps.trading.models import Order
+
+
+class PriceLevel:
+    """All resting orders at one price, in time priority, indexed by order id."""
+
+    __slots__ = ('price', 'orders', 'quantity')
+
+    def __init__(self, price):
+        self.price = price
+        self.orders = OrderedDict()
+        self.quantity = Decimal('0')
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __iter__(self):
+        return iter(self.orders.values())
+
+    def front(self):
+        """The order first in the queue, or None if the level is empty."""
+        for order in self.orders.values():
+            return order
+        return None
+
+
+class BookSide:
+    """One side (bids or asks) of an order book."""
+
+    def __init__(self, is_bid):
+        self.is_bid = is_bid
+        self.levels = {}
+        self._heap = []
+        self._heap_prices = set()
+
+    def _key(self, price):
+        return -price if self.is_bid else price
+
+    def _price(self, key):
+        return -key if self.is_bid else key
+
+    def add(self, order):
+        level = self.levels.get(order.price)
+        if level is None:
+            level = PriceLevel(order.price)
+            self.levels[order.price] = level
+            if order.price not in self._heap_prices:
+                self._heap_prices.add(order.price)
+                heapq.heappush(self._heap, self._key(order.price))
+                self._compact()
+        level.orders[order.pk] = order
+        level.quantity += order.remaining_quantity
+        return level
+
+    def _compact(self):
+        # Levels emptied away from the best price would otherwise stay in the heap
+        if len(self._heap) > 2 * len(self.levels) + 64:
+            self._heap = [self._key(price) for price in self.levels]
+            heapq.heapify(self._heap)
+            self._heap_prices = set(self.levels)
+
+    def remove(self, order):
+        level = self.levels.get(order.price)
+        if level is None or level.orders.pop(order.pk, None) is None:
+            return
+        level.quantity -= order.remaining_quantity
+        if not level.orders:
+            del self.levels[order.price]
+
+    def best(self):
+        """Best price level, or None if this side is empty."""
+        while self._heap:
+            price = self._price(self._heap[0])
+            level = self.levels.get(price)
+            if level is not None:
+                return level
+            heapq.heappop(self._heap)
+            self._heap_prices.discard(price)
+        return None
+
+    def reduce(self, level, quantity):
+        """Account for ``quantity`` filled against the front order of ``level``."""
+        level.quantity -= quantity
+        if level.front().remaining_quantity <= 0:
+            level.orders.popitem(last=False)
+        if not level.orders:
+            del self.levels[level.price]
+
+    def crosses(self, price, limit_price):
+        """Whether a taker with ``limit_price`` may trade at ``price`` on this side."""
+        if limit_price is None:
+            return True
+        return price >= limit_price if self.is_bid else price <= limit_price
+
+    def iter_levels(self):
+        """
+        Levels from best to worst price, read lazily off the heap: taking the
+        first k levels costs O(k log k) whatever the size of the side. The
+        side must not change while the levels are being walked.
+        """
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            key, i = heapq.heappop(frontier)
+            level = self.levels.get(self._price(key))
+            if level is not None:
+                yield level
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def top(self, limit):
+        """The ``limit`` best levels, best first."""
+        return list(itertools.islice(self.iter_levels(), limit))
+
+    def available(self, limit_price=None, quantity=None):
+        """
+        Total quantity a taker with ``limit_price`` could fill against,
+        counted no further than ``quantity`` if given.
+        """
+        total = Decimal('0')
+        for level in self.iter_levels():
+            if not self.crosses(level.price, limit_price):
+                break
+            total += level.quantity
+            if quantity is not None and total >= quantity:
+                break
+        return total
+
+    def cost(self, quantity):
+        """Quote amount needed to take ``quantity`` from this side, best levels first."""
+        total = Decimal('0')
+        for level in self.iter_levels():
+            if quantity <= 0:
+                break
+            take = min(quantity, level.quantity)
+            total += take * level.price
+            quantity -= take
+        return total
+
+
+class TrailingStops:
+    """
+    Trailing stops of one pair as parallel arrays.
+
+    Watermarks (highest price seen for sells, lowest for buys) are kept as
+    int64 multiples of 1e-8, so moving them on a price tick is one exact
+    ``maximum``/``minimum`` over the array. Triggers are screened in float64
+    and every candidate is confirmed with Decimal arithmetic, so rounding
+    can neither fire nor miss a stop.
+
+    The ``Order`` fields are only brought up to date by ``sync`` - on
+    checkpoint and when a stop fires - instead of on every new extreme.
+    """
+
+    SCALE = 10 ** 8
+    NO_LOW = np.iinfo(np.int64).max
+    # Relative slack for the float screen; candidates are confirmed exactly
+    SCREEN_TOLERANCE = 1e-9
+
+    def __init__(self, capacity=16):
+        self.orders = []
+        self.positions = {}
+        self.checkpointed_at = time.monotonic()
+        self._is_sell = np.zeros(capacity, dtype=bool)
+        self._factor = np.zeros(capacity, dtype=np.float64)
+        self._watermark = np.zeros(capacity, dtype=np.int64)
+        self._dirty = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.positions
+
+    @classmethod
+    def _to_int(cls, price):
+        return int(price * cls.SCALE)
+
+    def _grow(self):
+        capacity = len(self._watermark) * 2
+        for name in ('_is_sell', '_factor', '_watermark', '_dirty'):
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def add(self, order):
+        if order.pk in self.positions:
+            return
+        i = len(self.orders)
+        if i == len(self._watermark):
+            self._grow()
+
+        is_sell = order.side == Order.Side.SELL
+        percent = order.trailing_stop_percent / 100
+        watermark = order.highest_price_seen if is_sell else order.lowest_price_seen
+
+        self.orders.append(order)
+        self.positions[order.pk] = i
+        self._is_sell[i] = is_sell
+        self._factor[i] = float(1 - percent if is_sell else 1 + percent)
+        if watermark is not None:
+            self._watermark[i] = self._to_int(watermark)
+        else:
+            self._watermark[i] = 0 if is_sell else self.NO_LOW
+        self._dirty[i] = False
+
+    def remove(self, order_id):
+        """Remove a trailing stop by id and return it, or None if not tracked."""
+        i = self.positions.pop(order_id, None)
+        if i is None:
+            return None
+        order = self.orders[i]
+        self._write_watermark(i)
+
+        # Move the last entry into the hole
+        last = len(self.orders) - 1
+        if i != last:
+            moved = self.orders[last]
+            self.orders[i] = moved
+            self.positions[moved.pk] = i
+            for array in (self._is_sell, self._factor, self._watermark, self._dirty):
+                array[i] = array[last]
+        self.orders.pop()
+        return order
+
+    def _write_watermark(self, i):
+        order = self.orders[i]
+        value = int(self._watermark[i])
+        if order.side == Order.Side.SELL:
+            order.highest_price_seen = Decimal(value) / self.SCALE if value else None
+        else:
+            order.lowest_price_seen = Decimal(value) / self.SCALE if value != self.NO_LOW else None
+
+    def update(self, low, high, last):
+        """
+        Move the watermarks to this tick's ``low``/``high`` and remove and
+        return the stops that ``last`` reaches.
+        """
+        n = len(self.orders)
+        if not n:
+            return []
+
+        watermark = self._watermark[:n]
+        is_sell = self._is_sell[:n]
+        moved = np.where(
+            is_sell,
+            np.maximum(watermark, self._to_int(high)),
+            np.minimum(watermark, self._to_int(low))
+        )
+        self._dirty[:n] |= moved != watermark
+        watermark[:] = moved
+
+        trigger = moved.astype(np.float64) / self.SCALE * self._factor[:n]
+        last_float = float(last)
+        screened = np.where(
+            is_sell,
+            last_float <= trigger * (1 + self.SCREEN_TOLERANCE),
+            last_float >= trigger * (1 - self.SCREEN_TOLERANCE)
+        )
+
+        fired = []
+        for i in np.flatnonzero(screened):
+            order = self.orders[i]
+            self._write_watermark(i)
+            percent = order.trailing_stop_percent / 100
+            if order.side == Order.Side.SELL:
+                hit = last <= order.highest_price_seen * (1 - percent)
+            else:
+                hit = order.lowest_price_seen is not None and last >= order.lowest_price_seen * (1 + percent)
+            if hit:
+                fired.append(order)
+
+        for order in fired:
+            self.remove(order.pk)
+        return fired
+
+    def sync(self, clear=True):
+        """Copy moved watermarks onto their orders and return those orders."""
+        n = len(self.orders)
+        changed = np.flatnonzero(self._dirty[:n])
+        for i in changed:
+            self._write_watermark(i)
+        if clear:
+            self._dirty[:n] = False
+            self.checkpointed_at = time.monotonic()
+        return [self.orders[i] for i in changed]
+
+
+class TriggerIndex:
+    """Pending stop orders of one pair, ordered by the price that fires them."""
+
+    def __init__(self):
+        self.orders = {}
+        self.trailing = TrailingStops()
+        # (key, arrival, order id); stale entries are skipped when popped
+        self._falling = []
+        self._rising = []
+        self._arrival = itertools.count()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    @staticmethod
+    def trigger_for(order):
+        """``(fires_when_falling, trigger_price)`` for a non-trailing stop"""
+        if order.order_type in (Order.OrderType.STOP_LOSS, Order.OrderType.STOP_LIMIT):
+            return order.side == Order.Side.SELL, order.stop_price
+        return order.side == Order.Side.BUY, order.take_profit_price
+
+    def add(self, order):
+        if order.pk in self.orders:
+            return
+        self.orders[order.pk] = order
+        if order.order_type == Order.OrderType.TRAILING_STOP:
+            self.trailing.add(order)
+            return
+
+        falling, price = self.trigger_for(order)
+        if falling:
+            heapq.heappush(self._falling, (-price, next(self._arrival), order.pk))
+        else:
+            heapq.heappush(self._rising, (price, next(self._arrival), order.pk))
+        self._compact()
+
+    def remove(self, order_id):
+        """Remove a pending stop by id and return it, or None if not indexed."""
+        self.trailing.remove(order_id)
+        return self.orders.pop(order_id, None)
+
+    def _compact(self):
+        # Cancelled stops far from the price would otherwise never be popped
+        live = len(self.orders) - len(self.trailing)
+        if len(self._falling) + len(self._rising) > 2 * live + 64:
+            self._falling = [e for e in self._falling if e[2] in self.orders]
+            self._rising = [e for e in self._rising if e[2] in self.orders]
+            heapq.heapify(self._falling)
+            heapq.heapify(self._rising)
+
+    def _pop_while(self, heap, crossed):
+        fired = []
+        while heap and crossed(heap[0][0]):
+            order = self.orders.pop(heapq.heappop(heap)[2], None)
+            if order is not None:
+                fired.append(order)
+        return fired
+
+    def crossed(self, low, high):
+        """
+        Pop the stops crossed by trades between ``low`` and ``high``.
+
+        Only the heap tops are inspected, so the cost is proportional to the
+        number of stops fired, not the number pending.
+        """
+        fired = self._pop_while(self._falling, lambda key: low <= -key)
+        fired += self._pop_while(self._rising, lambda key: high >= key)
+        return fired
+
+    def update_trailing(self, low, high, last):
+        """Move trailing-stop watermarks and pop the trailing stops ``last`` reaches."""
+        fired = self.trailing.update(low, high, last)
+        for order in fired:
+            self.orders.pop(order.pk, None)
+        return fired
+
+
+class MemoryOrderBook:
+    """Resting limit orders for a single trading pair."""
+
+    def __init__(self, trading_pair_id):
+        self.trading_pair_id = trading_pair_id
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.orders = {}
+        self.triggers = TriggerIndex()
+        self.sequence = None
+        self.lock = threading.RLock()
+        self._cycle = None
+        # Prices touched since the cycle began, per side
+        self._touched = {Order.Side.BUY: set(), Order.Side.SELL: set()}
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def side(self, side):
+        return self.bids if side == Order.Side.BUY else self.asks
+
+    def opposite(self, side):
+        return self.asks if side == Order.Side.BUY else self.bids
+
+    def load(self, orders, sequence, stops=()):
+        """Replace the book contents with ``orders`` (oldest first) and pending ``stops``."""
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.orders = {}
+        self.triggers = TriggerIndex()
+        for order in orders:
+            self.add(order)
+        for order in stops:
+            self.triggers.add(order)
+        self.sequence = sequence
+
+    def add(self, order):
+        self.orders[order.pk] = order
+        self._touched[order.side].add(order.price)
+        return self.side(order.side).add(order)
+
+    def remove(self, order_id):
+        """Remove a resting order by id and return it, or None if not resting."""
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            self._touched[order.side].add(order.price)
+            self.side(order.side).remove(order)
+        return order
+
+    def resize(self, order_id, quantity):
+        """
+        Lower the quantity of a resting order in place, keeping its queue
+        position. Returns the order, or None if it is not resting.
+        """
+        order = self.orders.get(order_id)
+        if order is not None:
+            level = self.side(order.side).levels[order.price]
+            level.quantity -= order.quantity - quantity
+            order.quantity = quantity
+            self._touched[order.side].add(order.price)
+        return order
+
+    def fill(self, book_side, level, quantity):
+        """Apply a fill of ``quantity`` already booked on the front order of ``level``."""
+        maker = level.front()
+        self._touched[maker.side].add(level.price)
+        book_side.reduce(level, quantity)
+        if maker.remaining_quantity <= 0:
+            self.orders.pop(maker.pk, None)
+
+    def best_bid(self):
+        level = self.bids.best()
+        return level.price if level else None
+
+    def best_ask(self):
+        level = self.asks.best()
+        return level.price if level else None
+
+    def depth(self, limit=50):
+        """Aggregated (price, quantity) levels per side, best first."""
+        def levels(book_side):
+            return [(level.price, level.quantity) for level in book_side.top(limit)]
+
+        return {'bids': levels(self.bids), 'asks': levels(self.asks)}
+
+    def changes(self):
+        """
+        Levels touched since the cycle began as (price, quantity) per side.
+
+        A level that emptied out is reported with quantity 0.
+        """
+        def levels(book_side, prices):
+            return [
+                (price, book_side.levels[price].quantity if price in book_side.levels else Decimal('0'))
+                for price in sorted(prices, reverse=book_side.is_bid)
+            ]
+
+        return {
+            'bids': levels(self.bids, self._touched[Order.Side.BUY]),
+            'asks': levels(self.asks, self._touched[Order.Side.SELL]),
+        }
+
+    def begin_cycle(self):
+        """
+        Mark the book as being mutated by an uncommitted transaction.
+
+        Until ``commit_cycle`` runs for the returned token the book is
+        considered stale, so a rollback forces a reload from the database.
+        """
+        token = object()
+        self._cycle = token
+        self.sequence = None
+        for prices in self._touched.values():
+            prices.clear()
+        return token
+
+    def commit_cycle(self, token, sequence):
+        if self._cycle is token:
+            self._cycle = None
+            self.sequence = sequence
+
+
+class OrderBookRegistry:
+    """Process-wide registry of resident order books, keyed by trading pair id."""
+
+    _books = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, trading_pair_id):
+        book = cls._books.get(trading_pair_id)
+        if book is None:
+            with cls._lock:
+                book = cls._books.setdefault(trading_pair_id, MemoryOrderBook(trading_pair_id))
+        return book
+
+    @classmethod
+    def install(cls, books):
+        """Adopt pre-built books, e.g. rebuilt from the matching journal"""
+        with cls._lock:
+            cls._books.update(books)
+
+    @classmethod
+    def all(cls):
+        return list(cls._books.values())
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._books.clear()
@@ -5,6 +5,7 @@ from decimal import Decimal
 from django.db.models import Sum
 from django.utils import timezone
 from apps.trading.models import Order, TradingPair
+from apps.trading.services.depth_cache import DepthCache
 
 
 class OrderBookService:
@@ -12,7 +13,30 @@ class OrderBookService:
     
     @classmethod
     def get_order_book(cls, trading_pair, depth=50):
-        """Get order book for a trading pair"""
+        """
+        Get order book for a trading pair.
+
+        ``sequence`` is the book sequence the snapshot reflects; WebSocket
+        deltas with a higher sequence apply on top of it.
+        """
+        
+        # Served from the engine's published depth when it is current
+        cached = DepthCache.get(trading_pair)
+        if cached is not None:
+            return {
+                'symbol': trading_pair.symbol,
+                'sequence': cached['sequence'],
+                'bids': cached['bids'][:depth],
+                'asks': cached['asks'][:depth],
+                'last_price': str(trading_pair.last_price) if trading_pair.last_price else None,
+                'timestamp': timezone.now().isoformat()
+            }
+        
+        # Read before the levels: the snapshot is at least this new, and
+        # replaying deltas it already contains is harmless
+        sequence = TradingPair.objects.filter(pk=trading_pair.pk).values_list(
+            'book_sequence', flat=True
+        ).first()
         
         # Get bids (buy orders) - highest price first
         bids = Order.objects.filter(
@@ -46,6 +70,7 @@ class OrderBookService:
         
         return {
             'symbol': trading_pair.symbol,
+            'sequence': sequence,
             'bids': [format_level(b) for b in bids],
             'asks': [format_level(a) for a in asks],
             'last_price': str(trading_pair.last_price) if trading_pair.last_price else None,
@@ -55,6 +80,12 @@ class OrderBookService:
     @classmethod
     def get_spread(cls, trading_pair):
         """Get best bid, ask and spread"""
+        cached = DepthCache.get(trading_pair)
+        if cached is not None:
+            best_bid = Decimal(cached['bids'][0]['price']) if cached['bids'] else None
+            best_ask = Decimal(cached['asks'][0]['price']) if cached['asks'] else None
+            return cls._spread(best_bid, best_ask)
+        
         best_bid = Order.objects.filter(
             trading_pair=trading_pair,
             side=Order.Side.BUY,
@@ -69,6 +100,10 @@ class OrderBookService:
             order_type=Order.OrderType.LIMIT
         ).order_by('price').values_list('price', flat=True).first()
         
+        return cls._spread(best_bid, best_ask)
+    
+    @staticmethod
+    def _spread(best_bid, best_ask):
         spread = None
         if best_bid and best_ask:
             spread = str(best_ask - best_bid)
@@ -0,0 +1,113 @@
+"""
+Outbound Queues
+===============
+Bounded per-connection buffer between the channel layer and a WebSocket.
+
+Consumer handlers only queue frames and return, so a slow socket never
+holds up the channel layer reading for the worker; a writer task per
+connection drains the queue onto the socket. The bound decides what a
+client that cannot keep up loses:
+
+    depth frames    past ``OUTBOUND_QUEUE_SIZE`` the stream's queued deltas
+                    are dropped and replaced by one marker; the writer sends
+                    a fresh snapshot in their place (latest state wins)
+    other frames    past ``OUTBOUND_QUEUE_HARD_LIMIT`` the client is sent a
+                    ``slow_consumer`` error telling it to resync, and is
+                    disconnected
+
+``StreamMetrics`` keeps process-wide counters and the live queue depths.
+"""
+
+import asyncio
+import weakref
+from collections import deque
+
+from django.conf import settings
+
+FRAME = 'frame'
+DEPTH = 'depth'
+SNAPSHOT = 'snapshot'
+
+
+class StreamMetrics:
+    """Process-wide WebSocket fan-out counters"""
+
+    frames_sent = 0
+    depth_frames_dropped = 0
+    snapshots_substituted = 0
+    slow_consumer_disconnects = 0
+
+    _queues = weakref.WeakSet()
+
+    @classmethod
+    def register(cls, queue):
+        cls._queues.add(queue)
+
+    @classmethod
+    def snapshot(cls):
+        depths = [len(queue) for queue in list(cls._queues)]
+        return {
+            'connections': len(depths),
+            'queued_frames': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            'frames_sent': cls.frames_sent,
+            'depth_frames_dropped': cls.depth_frames_dropped,
+            'snapshots_substituted': cls.snapshots_substituted,
+            'slow_consumer_disconnects': cls.slow_consumer_disconnects,
+        }
+
+
+class OutboundQueue:
+    """Frames waiting to be written to one WebSocket"""
+
+    def __init__(self, size=None, hard_limit=None):
+        config = settings.MARKET_DATA_CONFIG
+        self.size = size or config['OUTBOUND_QUEUE_SIZE']
+        self.hard_limit = hard_limit or config['OUTBOUND_QUEUE_HARD_LIMIT']
+        # (kind, stream, payload)
+        self.items = deque()
+        self._ready = asyncio.Event()
+        StreamMetrics.register(self)
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, frame):
+        """Queue a frame; False if the hard limit is reached and the client must go"""
+        if len(self.items) >= self.hard_limit:
+            return False
+        self._append(FRAME, None, frame)
+        return True
+
+    def put_depth(self, stream, symbol, frame):
+        """Queue a depth delta, collapsing the stream to a snapshot when full"""
+        if len(self.items) < self.size:
+            self._append(DEPTH, stream, frame)
+            return
+
+        kept = deque()
+        dropped = 1
+        marked = False
+        for item in self.items:
+            if item[1] == stream and item[0] == DEPTH:
+                dropped += 1
+                continue
+            marked = marked or (item[1] == stream and item[0] == SNAPSHOT)
+            kept.append(item)
+        self.items = kept
+        StreamMetrics.depth_frames_dropped += dropped
+        if not marked:
+            self._append(SNAPSHOT, stream, symbol)
+
+    def _append(self, kind, stream, payload):
+        self.items.append((kind, stream, payload))
+        self._ready.set()
+
+    async def get(self):
+        while not self.items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self.items.popleft()
+
+    def clear(self):
+        self.items.clear()
@@ -0,0 +1,487 @@
+"""
+Matching Sequencer
+==================
+Routes matching commands to a single writer per trading pair.
+
+In ``inline`` mode (the default, used in development) commands run in the
+calling process. In ``sequencer`` mode every symbol has its own Redis list
+that is consumed by exactly one ``run_matching_engine`` process; symbols are
+sharded across processes by a stable hash, so each book has a single writer
+and throughput scales with the number of engine processes.
+
+Web workers push a command onto the symbol's queue and block on a private
+reply list until the engine answers. Every command carries the time its
+caller stops waiting, and the engine keeps ``EXECUTION_MARGIN`` seconds
+before then for the journal fsync and the reply: it drops a command it
+cannot start in time, rolls back one that finishes too late, and replies
+early to the commands already executed in a batch before any of them gets
+that close to its deadline. So a caller that gave up (and may retry) never
+has its command committed behind its back. Engine and web hosts are
+assumed to keep their clocks in sync.
+"""
+
+import json
+import logging
+import time
+import uuid
+import zlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+
+from apps.accounts.models import User
+from apps.trading.models import Order, Trade, TradingPair
+from apps.trading.services.depth_cache import DepthCache
+from apps.trading.services.journal import JournalReplayer, MatchingJournal
+from apps.trading.services.matching_engine import MatchingEngine
+from apps.trading.services.memory_book import OrderBookRegistry
+
+logger = logging.getLogger('apps.trading')
+
+QUEUE_KEY = 'matching:in:{symbol}'
+REPLY_KEY = 'matching:reply:{request_id}'
+
+
+class MatchingUnavailable(Exception):
+    """The matching engine did not answer within the reply timeout."""
+
+
+def shard_for(symbol, shards):
+    """Stable shard index for a trading pair symbol."""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def _config():
+    return settings.MATCHING_ENGINE_CONFIG
+
+
+def _redis():
+    import redis
+    return redis.Redis.from_url(_config()['REDIS_URL'])
+
+
+class MatchingCommands:
+    """Commands understood by the engine, keyed by name."""
+
+    @staticmethod
+    def create_order(user_id, trading_pair_id, order_type, side, quantity, price=None,
+                     time_in_force='gtc', client_order_id=None):
+        order, trades = MatchingEngine.create_order(
+            user=User.objects.get(pk=user_id),
+            trading_pair=TradingPair.objects.get(pk=trading_pair_id),
+            order_type=order_type,
+            side=side,
+            quantity=Decimal(quantity),
+            price=Decimal(price) if price is not None else None,
+            time_in_force=time_in_force,
+            client_order_id=client_order_id
+        )
+        return {'order_id': order.pk, 'trade_ids': [t.pk for t in trades]}
+
+    @staticmethod
+    def create_orders(user_id, trading_pair_id, orders, atomic=False):
+        results = MatchingEngine.create_orders(
+            user=User.objects.get(pk=user_id),
+            trading_pair=TradingPair.objects.get(pk=trading_pair_id),
+            orders=[
+                dict(
+                    spec,
+                    quantity=Decimal(spec['quantity']),
+                    price=Decimal(spec['price']) if spec.get('price') is not None else None,
+                )
+                for spec in orders
+            ],
+            atomic=atomic
+        )
+        return {'results': [
+            {'error': error, 'client_order_id': order.client_order_id} if error is not None
+            else {'order_id': order.pk, 'trade_ids': [t.pk for t in trades]}
+            for order, trades, error in results
+        ]}
+
+    @staticmethod
+    def cancel_order(order_id):
+        order = MatchingEngine.cancel_order(Order.objects.get(pk=order_id))
+        return {'order_id': order.pk}
+
+    @staticmethod
+    def replace_order(order_id, price=None, quantity=None):
+        order, trades = MatchingEngine.replace_order(
+            Order.objects.get(pk=order_id),
+            price=Decimal(price) if price is not None else None,
+            quantity=Decimal(quantity) if quantity is not None else None
+        )
+        return {'order_id': order.pk, 'trade_ids': [t.pk for t in trades]}
+
+    @staticmethod
+    def cancel_all(user_id, trading_pair_id, side=None):
+        orders = MatchingEngine.cancel_all(
+            user=User.objects.get(pk=user_id),
+            trading_pair=TradingPair.objects.get(pk=trading_pair_id),
+            side=side
+        )
+        return {'order_ids': [o.pk for o in orders]}
+
+    @staticmethod
+    def match_order(order_id):
+        trades = MatchingEngine.match_order(Order.objects.get(pk=order_id))
+        return {'order_id': order_id, 'trade_ids': [t.pk for t in trades]}
+
+    @staticmethod
+    def create_stop_order(user_id, trading_pair_id, order_type, side, quantity, **prices):
+        order = MatchingEngine.create_stop_order(
+            user=User.objects.get(pk=user_id),
+            trading_pair=TradingPair.objects.get(pk=trading_pair_id),
+            order_type=order_type,
+            side=side,
+            quantity=Decimal(quantity),
+            **{name: Decimal(value) if value is not None else None for name, value in prices.items()}
+        )
+        return {'order_id': order.pk}
+
+    @staticmethod
+    def create_oco_order(user_id, trading_pair_id, side, quantity, limit_price, stop_price,
+                         stop_limit_price=None):
+        limit_order, stop_order = MatchingEngine.create_oco_order(
+            user=User.objects.get(pk=user_id),
+            trading_pair=TradingPair.objects.get(pk=trading_pair_id),
+            side=side,
+            quantity=Decimal(quantity),
+            limit_price=Decimal(limit_price),
+            stop_price=Decimal(stop_price),
+            stop_limit_price=Decimal(stop_limit_price) if stop_limit_price is not None else None
+        )
+        return {'limit_order_id': limit_order.pk, 'stop_order_id': stop_order.pk}
+
+    @staticmethod
+    def sweep_stops(trading_pair_id):
+        triggered = MatchingEngine.sweep_stops(TradingPair.objects.get(pk=trading_pair_id))
+        return {'order_ids': [o.pk for o in triggered]}
+
+    @staticmethod
+    def refresh_ticker(trading_pair_id):
+        MatchingEngine.refresh_ticker(TradingPair.objects.get(pk=trading_pair_id))
+        return {'trading_pair_id': trading_pair_id}
+
+    @classmethod
+    def execute(cls, command, payload):
+        handler = getattr(cls, command, None)
+        if handler is None or command.startswith('_') or command == 'execute':
+            raise ValueError(f"Unknown matching command: {command}")
+        return handler(**payload)
+
+
+class MatchingClient:
+    """Submit commands to the single writer for a symbol and wait for the result."""
+
+    @classmethod
+    def submit(cls, symbol, command, **payload):
+        if _config()['MODE'] != 'sequencer':
+            return MatchingCommands.execute(command, payload)
+
+        request_id = uuid.uuid4().hex
+        reply_key = REPLY_KEY.format(request_id=request_id)
+        timeout = _config()['REPLY_TIMEOUT']
+        message = json.dumps({
+            'id': request_id,
+            'command': command,
+            'payload': payload,
+            'reply_to': reply_key,
+            'deadline': time.time() + timeout,
+        }, cls=DjangoJSONEncoder)
+
+        client = _redis()
+        client.rpush(QUEUE_KEY.format(symbol=symbol), message)
+        reply = client.blpop(reply_key, timeout=timeout)
+        if reply is None:
+            raise MatchingUnavailable(f"No reply from matching engine for {symbol}")
+
+        result = json.loads(reply[1])
+        if 'error' in result:
+            raise ValueError(result['error'])
+        return result['result']
+
+    @classmethod
+    def create_order(cls, user, trading_pair, order_type, side, quantity,
+                     price=None, time_in_force='gtc', client_order_id=None):
+        """Same contract as ``MatchingEngine.create_order``: returns ``(order, trades)``"""
+        result = cls.submit(
+            trading_pair.symbol, 'create_order',
+            user_id=str(user.pk),
+            trading_pair_id=trading_pair.pk,
+            order_type=order_type,
+            side=side,
+            quantity=str(quantity),
+            price=str(price) if price is not None else None,
+            time_in_force=time_in_force,
+            client_order_id=client_order_id,
+        )
+        order = Order.objects.select_related('trading_pair').get(pk=result['order_id'])
+        trades = list(Trade.objects.filter(pk__in=result['trade_ids']).order_by('id'))
+        return order, trades
+
+    @classmethod
+    def create_orders(cls, user, trading_pair, orders, atomic=False):
+        """
+        Same contract as ``MatchingEngine.create_orders``: ``(order, trades, error)``
+        per order, where a rejected order is an unsaved ``Order``
+        """
+        result = cls.submit(
+            trading_pair.symbol, 'create_orders',
+            user_id=str(user.pk),
+            trading_pair_id=trading_pair.pk,
+            orders=[
+                dict(
+                    spec,
+                    quantity=str(spec['quantity']),
+                    price=str(spec['price']) if spec.get('price') is not None else None,
+                )
+                for spec in orders
+            ],
+            atomic=atomic,
+        )
+        placed = [item for item in result['results'] if 'error' not in item]
+        orders_by_id = Order.objects.select_related('trading_pair').in_bulk([item['order_id'] for item in placed])
+        trades_by_id = Trade.objects.in_bulk([pk for item in placed for pk in item['trade_ids']])
+
+        results = []
+        for spec, item in zip(orders, result['results']):
+            if 'error' in item:
+                order = Order(user=user, trading_pair=trading_pair, client_order_id=item['client_order_id'], **{
+                    field: spec.get(field) for field in ('order_type', 'side', 'quantity', 'price', 'time_in_force')
+                })
+                results.append((order, [], item['error']))
+            else:
+                trades = [trades_by_id[pk] for pk in item['trade_ids']]
+                results.append((orders_by_id[item['order_id']], trades, None))
+        return results
+
+    @classmethod
+    def cancel_order(cls, order):
+        result = cls.submit(order.trading_pair.symbol, 'cancel_order', order_id=order.pk)
+        return Order.objects.select_related('trading_pair').get(pk=result['order_id'])
+
+    @classmethod
+    def replace_order(cls, order, price=None, quantity=None):
+        """Same contract as ``MatchingEngine.replace_order``"""
+        result = cls.submit(
+            order.trading_pair.symbol, 'replace_order',
+            order_id=order.pk,
+            price=str(price) if price is not None else None,
+            quantity=str(quantity) if quantity is not None else None,
+        )
+        order = Order.objects.select_related('trading_pair').get(pk=result['order_id'])
+        trades = list(Trade.objects.filter(pk__in=result['trade_ids']).order_by('id'))
+        return order, trades
+
+    @classmethod
+    def cancel_all(cls, user, trading_pair, side=None):
+        """Cancel every open and pending order of ``user`` on the pair; returns them"""
+        result = cls.submit(trading_pair.symbol, 'cancel_all', user_id=str(user.pk),
+                            trading_pair_id=trading_pair.pk, side=side)
+        return list(Order.objects.select_related('trading_pair').filter(pk__in=result['order_ids']))
+
+    @classmethod
+    def match_order(cls, order):
+        result = cls.submit(order.trading_pair.symbol, 'match_order', order_id=order.pk)
+        return list(Trade.objects.filter(pk__in=result['trade_ids']).order_by('id'))
+
+    @classmethod
+    def create_stop_order(cls, user, trading_pair, order_type, side, quantity, **prices):
+        """Same contract as ``MatchingEngine.create_stop_order``"""
+        result = cls.submit(
+            trading_pair.symbol, 'create_stop_order',
+            user_id=str(user.pk),
+            trading_pair_id=trading_pair.pk,
+            order_type=order_type,
+            side=side,
+            quantity=str(quantity),
+            **{name: str(value) if value is not None else None for name, value in prices.items()}
+        )
+        return Order.objects.select_related('trading_pair').get(pk=result['order_id'])
+
+    @classmethod
+    def create_oco_order(cls, user, trading_pair, side, quantity, limit_price, stop_price,
+                         stop_limit_price=None):
+        result = cls.submit(
+            trading_pair.symbol, 'create_oco_order',
+            user_id=str(user.pk),
+            trading_pair_id=trading_pair.pk,
+            side=side,
+            quantity=str(quantity),
+            limit_price=str(limit_price),
+            stop_price=str(stop_price),
+            stop_limit_price=str(stop_limit_price) if stop_limit_price is not None else None,
+        )
+        orders = Order.objects.select_related('trading_pair').in_bulk(
+            [result['limit_order_id'], result['stop_order_id']]
+        )
+        return orders[result['limit_order_id']], orders[result['stop_order_id']]
+
+    @classmethod
+    def sweep_stops(cls, trading_pair):
+        result = cls.submit(trading_pair.symbol, 'sweep_stops', trading_pair_id=trading_pair.pk)
+        return result['order_ids']
+
+    @classmethod
+    def refresh_ticker(cls, trading_pair):
+        """Bring the pair's 24h figures up to date in the process that owns its ticker"""
+        cls.submit(trading_pair.symbol, 'refresh_ticker', trading_pair_id=trading_pair.pk)
+
+
+class MatchingWorker:
+    """
+    Single-writer consumer for the symbols assigned to one shard.
+
+    Run one worker per shard (``manage.py run_matching_engine --shard N``);
+    every symbol hashes to exactly one shard. When a journal directory is
+    configured the worker rebuilds its books from the journal on start-up,
+    and drains up to ``BATCH_SIZE`` commands per journal fsync before
+    replying (group commit), replying earlier when a waiting caller nears
+    its deadline.
+    """
+
+    SYMBOL_REFRESH_SECONDS = 30
+    POLL_TIMEOUT = 1
+
+    def __init__(self, shard=0, shards=1):
+        if not 0 <= shard < shards:
+            raise ValueError(f"Shard {shard} out of range for {shards} shards")
+        self.shard = shard
+        self.shards = shards
+        self.batch_size = _config()['BATCH_SIZE']
+        self.redis = _redis()
+        self.queue_keys = []
+        self.journal = None
+        self._symbols_loaded_at = 0
+        self._running = False
+
+        if _config()['JOURNAL_DIR']:
+            self.journal = self.recover(_config()['JOURNAL_DIR'])
+
+    def recover(self, directory):
+        """Rebuild books from the journal and open it for appending"""
+        replayer = JournalReplayer(directory)
+        books = replayer.rebuild()
+        OrderBookRegistry.install(books)
+        logger.info(f"Recovered {len(books)} books from journal up to seq {replayer.last_seq}")
+
+        pairs = TradingPair.objects.in_bulk(list(books))
+        for pair_id, book in books.items():
+            pair = pairs.get(pair_id)
+            if pair is not None and book.sequence == pair.book_sequence:
+                DepthCache.publish(pair_id, DepthCache.snapshot(book, book.sequence))
+
+        journal = MatchingJournal(directory, next_seq=replayer.last_seq + 1)
+        MatchingJournal.activate(journal)
+        return journal
+
+    def refresh_symbols(self):
+        # Inactive pairs too: their orders can still be cancelled
+        symbols = TradingPair.objects.values_list('symbol', flat=True)
+        self.queue_keys = [
+            QUEUE_KEY.format(symbol=symbol)
+            for symbol in symbols
+            if shard_for(symbol, self.shards) == self.shard
+        ]
+        self._symbols_loaded_at = time.monotonic()
+        logger.info(f"Matching shard {self.shard}/{self.shards} owns {len(self.queue_keys)} symbols")
+
+    def run(self):
+        self._running = True
+        try:
+            while self._running:
+                if time.monotonic() - self._symbols_loaded_at > self.SYMBOL_REFRESH_SECONDS:
+                    close_old_connections()
+                    self.refresh_symbols()
+                self.run_once()
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+                MatchingJournal.activate(None)
+
+    def stop(self):
+        self._running = False
+
+    def run_once(self):
+        if not self.queue_keys:
+            time.sleep(self.POLL_TIMEOUT)
+            return
+
+        item = self.redis.blpop(self.queue_keys, timeout=self.POLL_TIMEOUT)
+        if item is None:
+            return
+
+        # Rotate so a busy symbol cannot starve the others on this shard
+        queue_key = item[0].decode()
+        if queue_key in self.queue_keys:
+            self.queue_keys.remove(queue_key)
+            self.queue_keys.append(queue_key)
+
+        messages = [json.loads(item[1])]
+        for key in self.queue_keys:
+            while len(messages) < self.batch_size:
+                raw = self.redis.lpop(key)
+                if raw is None:
+                    break
+                messages.append(json.loads(raw))
+
+        margin = _config()['EXECUTION_MARGIN']
+        pending = []
+        for message in messages:
+            # Answer the commands executed so far before the next one could
+            # run a waiting caller past its deadline
+            deadlines = [m['deadline'] for m, _ in pending if m.get('deadline') is not None]
+            if deadlines and time.time() > min(deadlines) - 2 * margin:
+                self.reply(pending)
+                pending = []
+            pending.append((message, self.handle(message)))
+        self.reply(pending)
+
+        if self.journal is not None and self.journal.records_since_snapshot >= _config()['SNAPSHOT_EVERY']:
+            self.journal.snapshot(OrderBookRegistry.all())
+
+    def reply(self, handled):
+        """Make the journal durable, then send the replies of ``(message, reply)`` pairs"""
+        if not handled:
+            return
+        if self.journal is not None:
+            self.journal.sync()
+
+        pipe = self.redis.pipeline()
+        for message, reply in handled:
+            pipe.rpush(message['reply_to'], json.dumps(reply, cls=DjangoJSONEncoder))
+            pipe.expire(message['reply_to'], 60)
+        pipe.execute()
+
+    @staticmethod
+    def expired(message):
+        """Whether too little time is left to reply before the caller stops waiting"""
+        deadline = message.get('deadline')
+        return deadline is not None and time.time() > deadline - _config()['EXECUTION_MARGIN']
+
+    def handle(self, message):
+        """Execute one command in its own transaction and return its reply"""
+        expired = {'id': message['id'], 'error': 'Matching command expired'}
+        if self.expired(message):
+            logger.warning(f"Dropped expired matching command {message['command']} {message['id']}")
+            return expired
+        try:
+            with transaction.atomic():
+                result = MatchingCommands.execute(message['command'], message['payload'])
+                if self.expired(message):
+                    # Rolling back also discards the book changes (see _book_cycle)
+                    transaction.set_rollback(True)
+                    logger.warning(f"Rolled back matching command {message['command']} {message['id']} "
+                                   f"that finished past its deadline")
+                    return expired
+            return {'id': message['id'], 'result': result}
+        except (ValueError, Order.DoesNotExist, TradingPair.DoesNotExist) as e:
+            return {'id': message['id'], 'error': str(e)}
+        except Exception:
+            logger.exception(f"Matching command {message['command']} failed")
+            # Drop the connection if the failure left it unusable
+            close_old_connections()
+            return {'id': message['id'], 'error': 'Internal matching error'}
@@ -0,0 +1,230 @@
+"""
+Settlement
+==========
+Balance side of a matching cycle.
+
+Funds are reserved (moved from available to locked) when an order is
+accepted by the engine, and both legs of every trade in the cycle are
+settled together when the cycle flushes, as one ``LedgerService.post_batch``:
+each affected ``Balance`` row is locked once, in (user, currency) order,
+updated with one ``bulk_update``, and the ledger entries are written with
+one ``bulk_create``.
+
+Reservation per order:
+
+    sell            remaining quantity of the base currency
+    limit buy       remaining quantity * limit price of the quote currency
+    market buy      cost of walking the ask side for the quantity
+
+Fees are taken from the proceeds (base for the buyer, quote for the
+seller), so they never need to be reserved. The cycle's fees are credited
+to the sharded exchange fee account in one posting per currency, with a
+system ledger entry per fee referencing its trade.
+"""
+
+import logging
+from decimal import Decimal
+
+from apps.trading.models import Order
+from apps.wallets.models import Balance, Currency, SystemBalance, SystemLedgerEntry
+from apps.wallets.services import LedgerService, Posting, SystemAccountService
+
+logger = logging.getLogger('apps.trading')
+
+ZERO = Decimal('0')
+
+
+class InsufficientBalance(ValueError):
+    """An order cannot be accepted because its funds are not available."""
+
+
+class Settlement:
+    """Balance changes of one matching cycle, applied in a single pass."""
+
+    def __init__(self, trading_pair):
+        self.trading_pair = trading_pair
+        self._currencies = None
+        # (user_id, currency_id, kind, amount, entry_type, reference, description)
+        self.operations = []
+        # Reserve still held for takers matched in this cycle, by order id
+        self.reserved = {}
+        self._pending_available = {}
+        # Available balance read once per (user, currency) and cycle
+        self._available_read = {}
+        # Fees collected this cycle as (currency, amount, trade)
+        self.fees = []
+        # Balance rows as written by ``flush``
+        self.balances = []
+
+    @property
+    def currencies(self):
+        """(base, quote) ``Currency`` rows for the pair"""
+        if self._currencies is None:
+            symbols = [self.trading_pair.base_currency, self.trading_pair.quote_currency]
+            found = {c.symbol: c for c in Currency.objects.filter(symbol__in=symbols)}
+            missing = [s for s in symbols if s not in found]
+            if missing:
+                raise ValueError(f"Currency {', '.join(missing)} is not configured")
+            self._currencies = (found[symbols[0]], found[symbols[1]])
+        return self._currencies
+
+    def _add(self, user_id, currency, kind, amount, entry_type, reference, description):
+        self.operations.append((user_id, currency.pk, kind, amount, entry_type, reference, description))
+        if kind in ('lock', 'unlock', 'credit', 'debit'):
+            key = (user_id, currency.pk)
+            sign = -1 if kind in ('lock', 'debit') else 1
+            self._pending_available[key] = self._pending_available.get(key, ZERO) + sign * amount
+
+    # -------------------------------------------------------------------------
+    # Reservations
+    # -------------------------------------------------------------------------
+
+    def required(self, order, book):
+        """Currency and amount to reserve for the unfilled part of ``order``"""
+        base, quote = self.currencies
+        if order.side == Order.Side.SELL:
+            return base, order.remaining_quantity
+        if order.order_type == Order.OrderType.LIMIT:
+            return quote, order.remaining_quantity * order.price
+        return quote, book.opposite(order.side).cost(order.remaining_quantity)
+
+    def check(self, order, book):
+        """
+        Currency and amount ``reserve`` would lock for ``order``, which need
+        not be saved yet; raises ``InsufficientBalance`` if they are not
+        available.
+        """
+        currency, amount = self.required(order, book)
+        if amount > 0:
+            available = self._available(order.user_id, currency)
+            if available < amount:
+                raise InsufficientBalance(
+                    f"Insufficient {currency.symbol} balance. Available: {available}, Required: {amount}"
+                )
+        return currency, amount
+
+    def reserve(self, order, book):
+        """
+        Reserve the funds for a taker before it is matched.
+
+        Raises ``InsufficientBalance`` before anything in the book is touched.
+        """
+        currency, amount = self.check(order, book)
+        if amount > 0:
+            self._add(order.user_id, currency, 'lock', amount, 'order_lock', order, 'Locked for order')
+        self.reserved[order.pk] = amount
+
+    def amend(self, order, price, quantity):
+        """
+        Re-reserve a resting limit order for a new ``price`` and total
+        ``quantity``, locking or unlocking only the difference from what it
+        holds now. The order itself is left unchanged.
+
+        Raises ``InsufficientBalance`` before anything in the book is touched.
+        """
+        currency, held = self.required(order, None)
+        remaining = quantity - order.filled_quantity
+        needed = remaining if order.side == Order.Side.SELL else remaining * price
+        delta = needed - held
+        if delta > 0:
+            available = self._available(order.user_id, currency)
+            if available < delta:
+                raise InsufficientBalance(
+                    f"Insufficient {currency.symbol} balance. Available: {available}, Required: {delta}"
+                )
+            self._add(order.user_id, currency, 'lock', delta, 'order_lock', order, 'Locked for amended order')
+        elif delta < 0:
+            self._add(order.user_id, currency, 'unlock', -delta, 'order_unlock', order, 'Unlocked from amended order')
+        return needed
+
+    def fund(self, order):
+        """
+        Lock the reserve of a resting order that holds none; returns False,
+        locking nothing, if the funds are not available.
+        """
+        currency, amount = self.required(order, None)
+        if amount <= 0:
+            return True
+        if self._available(order.user_id, currency) < amount:
+            return False
+        self._add(order.user_id, currency, 'lock', amount, 'order_lock', order, 'Locked for resting order')
+        return True
+
+    def _available(self, user_id, currency):
+        key = (user_id, currency.pk)
+        if key not in self._available_read:
+            self._available_read[key] = Balance.objects.filter(
+                user_id=user_id, currency=currency
+            ).values_list('available', flat=True).first() or ZERO
+        return self._available_read[key] + self._pending_available.get(key, ZERO)
+
+    def finish(self, order, resting):
+        """Return whatever a taker reserved beyond what its resting remainder needs"""
+        reserved = self.reserved.pop(order.pk, ZERO)
+        keep = ZERO
+        if resting:
+            keep = self.required(order, None)[1]
+        excess = reserved - keep
+        if excess > 0:
+            currency = self.currencies[0] if order.side == Order.Side.SELL else self.currencies[1]
+            self._add(order.user_id, currency, 'unlock', excess, 'order_unlock', order, 'Unlocked unused reserve')
+
+    def release(self, order):
+        """Unlock the reserve of a resting order being cancelled"""
+        currency, amount = self.required(order, None)
+        if amount > 0:
+            self._add(order.user_id, currency, 'unlock', amount, 'order_unlock', order, 'Unlocked from cancelled order')
+
+    # -------------------------------------------------------------------------
+    # Trades
+    # -------------------------------------------------------------------------
+
+    def trade(self, trade, taker):
+        """Both legs of ``trade``: locked funds out, proceeds (net of fee) in"""
+        base, quote = self.currencies
+        notional = trade.quantity * trade.price
+
+        self._add(trade.buyer_id, quote, 'deduct', notional, 'trade_buy', trade, 'Paid for trade')
+        self._add(trade.buyer_id, base, 'credit', trade.quantity, 'trade_buy', trade, 'Bought in trade')
+        if trade.buyer_fee > 0:
+            self._add(trade.buyer_id, base, 'debit', trade.buyer_fee, 'fee', trade, 'Trading fee')
+            self.fees.append((base, trade.buyer_fee, trade))
+
+        self._add(trade.seller_id, base, 'deduct', trade.quantity, 'trade_sell', trade, 'Sold in trade')
+        self._add(trade.seller_id, quote, 'credit', notional, 'trade_sell', trade, 'Received for trade')
+        if trade.seller_fee > 0:
+            self._add(trade.seller_id, quote, 'debit', trade.seller_fee, 'fee', trade, 'Trading fee')
+            self.fees.append((quote, trade.seller_fee, trade))
+
+        if taker.pk in self.reserved:
+            self.reserved[taker.pk] -= notional if taker.side == Order.Side.BUY else trade.quantity
+
+    # -------------------------------------------------------------------------
+    # Flush
+    # -------------------------------------------------------------------------
+
+    def flush(self):
+        """Apply all operations as one ledger batch: each balance is locked once"""
+        if not self.operations:
+            return
+
+        postings = [
+            Posting(
+                user_id, currency_id, kind, amount, entry_type,
+                description=description,
+                reference_type='order' if entry_type in ('order_lock', 'order_unlock') else 'trade',
+                reference_id=str(reference.pk)
+            )
+            for user_id, currency_id, kind, amount, entry_type, reference, description in self.operations
+        ]
+        # Owners are notified with the cycle's other events
+        self.balances, entries = LedgerService.post_batch(postings, publish=False)
+        SystemAccountService.post([
+            SystemLedgerEntry(
+                account=SystemBalance.Account.FEE, currency=currency, entry_type='fee', amount=amount,
+                reference_type='trade', reference_id=str(trade.pk), description='Trading fee'
+            )
+            for currency, amount, trade in self.fees
+        ])
+
+        logger.debug(f"Settled {len(entries)} ledger entries on {len(self.balances)} balances")
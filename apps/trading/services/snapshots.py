@@ -0,0 +1,141 @@
+"""
+Connect-time Snapshots
+======================
+Snapshots sent to a WebSocket client when it subscribes (order book, recent
+trades, ticker), shared by every consumer in the process.
+
+A reconnect storm would otherwise run the same queries once per socket.
+``SnapshotCache.get`` builds each (kind, symbol) snapshot once: concurrent
+callers await the single in-flight build, and later callers reuse the result
+while it is current.
+
+Currency is tracked from the broadcast frames the process receives, so a
+cached snapshot is never older than the stream it precedes:
+
+    book     valid while its ``sequence`` >= the highest delta sequence seen
+    trades   invalid as soon as a trades frame arrives after the build began
+    ticker   likewise for ticker frames
+
+That only works while some consumer in the process is subscribed to the
+symbol's stream, so snapshots are cached only for watched (kind, symbol)
+pairs; consumers ``watch`` after joining the group and ``unwatch`` when
+they leave it.
+"""
+
+import asyncio
+
+from channels.db import database_sync_to_async
+
+
+def order_book_snapshot(symbol):
+    from apps.trading.models import TradingPair
+    from apps.trading.services.order_book import OrderBookService
+
+    try:
+        trading_pair = TradingPair.objects.get(symbol=symbol, is_active=True)
+        return OrderBookService.get_order_book(trading_pair)
+    except TradingPair.DoesNotExist:
+        return {'error': 'Trading pair not found'}
+
+
+def recent_trades(symbol):
+    from apps.trading.models import Trade
+
+    trades = Trade.objects.filter(
+        trading_pair__symbol=symbol
+    ).order_by('-created_at')[:50]
+
+    return [
+        {
+            'id': str(t.id),
+            'price': str(t.price),
+            'quantity': str(t.quantity),
+            'side': 'sell' if t.is_buyer_maker else 'buy',
+            'timestamp': t.created_at.isoformat()
+        }
+        for t in trades
+    ]
+
+
+def ticker_snapshot(symbol):
+    from apps.trading.models import TradingPair
+    from apps.trading.services.market_data import MarketDataPublisher
+
+    pair = TradingPair.objects.filter(symbol=symbol, is_active=True).first()
+    if pair is None:
+        return {'error': 'Trading pair not found'}
+    return MarketDataPublisher.ticker(pair)
+
+
+class SnapshotCache:
+    """Single-flight, frame-invalidated snapshot cache for the consumers of one process"""
+
+    BUILDERS = {
+        'book': order_book_snapshot,
+        'trades': recent_trades,
+        'ticker': ticker_snapshot,
+    }
+
+    # (kind, symbol) -> (version, snapshot)
+    _entries = {}
+    # (kind, symbol) -> task building the snapshot
+    _inflight = {}
+    # (kind, symbol) -> latest version seen in broadcast frames
+    _versions = {}
+    # (kind, symbol) -> subscribed consumers in this process
+    _watchers = {}
+
+    @classmethod
+    async def get(cls, kind, symbol):
+        key = (kind, symbol)
+        entry = cls._entries.get(key)
+        if entry is not None and entry[0] >= cls._versions.get(key, 0):
+            return entry[1]
+
+        task = cls._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(cls._build(key))
+            cls._inflight[key] = task
+        # A consumer disconnecting mid-build must not cancel it for the others
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _build(cls, key):
+        kind, symbol = key
+        version = cls._versions.get(key, 0)
+        try:
+            snapshot = await database_sync_to_async(cls.BUILDERS[kind])(symbol)
+        finally:
+            cls._inflight.pop(key, None)
+
+        if kind == 'book' and isinstance(snapshot, dict):
+            version = snapshot.get('sequence')
+        if cls._watchers.get(key) and version is not None and not (
+                isinstance(snapshot, dict) and 'error' in snapshot):
+            cls._entries[key] = (version, snapshot)
+        return snapshot
+
+    @classmethod
+    def observe(cls, kind, symbol, sequence=None):
+        """Record a broadcast frame; book frames carry their ``sequence``"""
+        key = (kind, symbol)
+        if sequence is None:
+            cls._versions[key] = cls._versions.get(key, 0) + 1
+        elif sequence > cls._versions.get(key, 0):
+            cls._versions[key] = sequence
+
+    @classmethod
+    def watch(cls, kind, symbol):
+        key = (kind, symbol)
+        cls._watchers[key] = cls._watchers.get(key, 0) + 1
+
+    @classmethod
+    def unwatch(cls, kind, symbol):
+        key = (kind, symbol)
+        count = cls._watchers.get(key, 0) - 1
+        if count > 0:
+            cls._watchers[key] = count
+            return
+        cls._watchers.pop(key, None)
+        cls._entries.pop(key, None)
+        cls._versions.pop(key, None)
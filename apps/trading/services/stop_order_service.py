@@ -1,27 +1,29 @@
 """
 Stop Order Service
 """
-from decimal import Decimal
-from typing import List, Optional
-from django.db import transaction
-from django.utils import timezone
-from apps.trading.models import Order, TradingPair
+from apps.trading.models import Order
+from apps.trading.services.sequencer import MatchingClient
 
 
 class StopOrderService:
-    """Service to manage stop-loss, take-profit, and trailing stop orders"""
+    """
+    Service to manage stop-loss, take-profit, and trailing stop orders
+
+    Pending stops are held in the matching engine's per-pair trigger index,
+    so they are created and cancelled through the engine and fire as soon as
+    a trade crosses them.
+    """
     
     @classmethod
     def create_stop_loss_order(cls, user, trading_pair, side, quantity, stop_price, limit_price=None):
         """Create a stop-loss order"""
         order_type = Order.OrderType.STOP_LIMIT if limit_price else Order.OrderType.STOP_LOSS
         
-        return Order.objects.create(
+        return MatchingClient.create_stop_order(
             user=user,
             trading_pair=trading_pair,
             order_type=order_type,
             side=side,
-            status=Order.Status.PENDING,
             quantity=quantity,
             price=limit_price,
             stop_price=stop_price,
@@ -32,12 +34,11 @@ class StopOrderService:
         """Create a take-profit order"""
         order_type = Order.OrderType.TAKE_PROFIT_LIMIT if limit_price else Order.OrderType.TAKE_PROFIT
         
-        return Order.objects.create(
+        return MatchingClient.create_stop_order(
             user=user,
             trading_pair=trading_pair,
             order_type=order_type,
             side=side,
-            status=Order.Status.PENDING,
             quantity=quantity,
             price=limit_price,
             take_profit_price=take_profit_price,
@@ -46,81 +47,48 @@ class StopOrderService:
     @classmethod
     def create_trailing_stop_order(cls, user, trading_pair, side, quantity, trailing_percent, current_price):
         """Create a trailing stop order"""
-        return Order.objects.create(
+        return MatchingClient.create_stop_order(
             user=user,
             trading_pair=trading_pair,
             order_type=Order.OrderType.TRAILING_STOP,
             side=side,
-            status=Order.Status.PENDING,
             quantity=quantity,
             trailing_stop_percent=trailing_percent,
-            highest_price_seen=current_price if side == Order.Side.SELL else None,
-            lowest_price_seen=current_price if side == Order.Side.BUY else None,
+            reference_price=current_price,
         )
     
     @classmethod
     def create_oco_order(cls, user, trading_pair, side, quantity, limit_price, stop_price, stop_limit_price=None):
         """Create OCO order pair"""
-        with transaction.atomic():
-            limit_order = Order.objects.create(
-                user=user,
-                trading_pair=trading_pair,
-                order_type=Order.OrderType.LIMIT,
-                side=side,
-                status=Order.Status.OPEN,
-                quantity=quantity,
-                price=limit_price,
-            )
-            
-            stop_type = Order.OrderType.STOP_LIMIT if stop_limit_price else Order.OrderType.STOP_LOSS
-            stop_order = Order.objects.create(
-                user=user,
-                trading_pair=trading_pair,
-                order_type=stop_type,
-                side=side,
-                status=Order.Status.PENDING,
-                quantity=quantity,
-                price=stop_limit_price,
-                stop_price=stop_price,
-                parent_order=limit_order,
-            )
-            
-            limit_order.parent_order = stop_order
-            limit_order.save(update_fields=['parent_order'])
-            
-            return limit_order, stop_order
+        return MatchingClient.create_oco_order(
+            user=user,
+            trading_pair=trading_pair,
+            side=side,
+            quantity=quantity,
+            limit_price=limit_price,
+            stop_price=stop_price,
+            stop_limit_price=stop_limit_price,
+        )
     
     @classmethod
-    def check_and_trigger_stops(cls, trading_pair, current_price):
-        """Check and trigger stop orders"""
-        triggered = []
-        pending_stops = Order.objects.filter(
-            trading_pair=trading_pair,
-            status=Order.Status.PENDING,
-            order_type__in=[
-                Order.OrderType.STOP_LOSS,
-                Order.OrderType.STOP_LIMIT,
-                Order.OrderType.TAKE_PROFIT,
-                Order.OrderType.TAKE_PROFIT_LIMIT,
-                Order.OrderType.TRAILING_STOP,
-            ]
-        ).select_for_update()
-        
-        with transaction.atomic():
-            for order in pending_stops:
-                if order.should_trigger(current_price):
-                    order.trigger()
-                    triggered.append(order)
-        
-        return triggered
+    def sweep_stops(cls, trading_pair):
+        """
+        Fallback for the trigger index: have the engine pick up stops it has
+        not indexed and fire those crossed by the last price.
+        Returns the ids of the triggered orders.
+        """
+        return MatchingClient.sweep_stops(trading_pair)
     
     @classmethod
     def cancel_stop_order(cls, order):
         """Cancel a stop order"""
         if order.status != Order.Status.PENDING:
             return False
-        order.status = Order.Status.CANCELLED
-        order.save(update_fields=['status'])
+        try:
+            MatchingClient.cancel_order(order)
+        except ValueError:
+            # Triggered in the meantime
+            return False
         return True
     
     @classmethod
@@ -0,0 +1,221 @@
+"""
+Rolling 24h Ticker
+==================
+Resident 24h statistics per trading pair, kept in one-minute buckets.
+
+A ring of ``WINDOW_MINUTES`` buckets (open, high, low, close, volume) covers
+the current minute and the 1439 before it. Each trade updates its minute's
+bucket and the running volume in O(1); when the window moves forward the
+buckets that fall out of it are subtracted from the volume. High, low and
+the window's opening price are cached and only recomputed from the ring
+(at most 1440 buckets, never the trades) when an expiring bucket held one
+of them.
+
+Like the resident order book, a ticker is only changed by ``MatchingEngine``
+while it holds the trading pair row lock, and ``sequence`` mirrors
+``TradingPair.book_sequence``. A ticker that does not match the pair (a new
+process, or another process traded the pair) is rebuilt once, then kept up
+to date from the engine's fills. The rebuild reads the window's 1m candles,
+which the engine writes in the same transaction as the trades, so it costs
+at most ``WINDOW_MINUTES`` rows however busy the pair is (trades from
+before candles existed need ``backfill_candles``).
+"""
+
+import threading
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.utils import timezone
+
+from apps.trading.models import Candle
+
+
+class MinuteBucket:
+    """Trades of one minute"""
+
+    __slots__ = ('minute', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, minute, price, quantity):
+        self.minute = minute
+        self.open = self.high = self.low = self.close = price
+        self.volume = quantity
+
+    def add(self, price, quantity):
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += quantity
+
+
+class RollingTicker:
+    """24h volume, high, low and opening price of one trading pair"""
+
+    WINDOW_MINUTES = 24 * 60
+
+    # TradingPair fields written by ``apply_to``
+    FIELDS = ['volume_24h', 'high_24h', 'low_24h', 'price_change_24h']
+
+    def __init__(self, trading_pair_id):
+        self.trading_pair_id = trading_pair_id
+        # book_sequence this ticker reflects; None while unknown or mid-cycle
+        self.sequence = None
+        self._clear()
+        self.minute = None
+
+    def _clear(self):
+        self.buckets = [None] * self.WINDOW_MINUTES
+        self.volume = Decimal('0')
+        # (high, low, oldest bucket) of the window; None when they must be recomputed
+        self._extremes = (None, None, None)
+
+    @staticmethod
+    def _minute(at):
+        return int(at.timestamp()) // 60
+
+    def begin(self, sequence):
+        """
+        Start a change to a ticker that should reflect ``sequence``.
+
+        Returns False if it does not and must be rebuilt. Until ``commit``
+        the ticker matches no sequence, so a rolled back cycle forces a
+        rebuild.
+        """
+        current = self.sequence == sequence
+        self.sequence = None
+        return current
+
+    def commit(self, sequence):
+        self.sequence = sequence
+
+    def reload(self, now=None):
+        """Rebuild from the 1m candles in the window (everything visible to this transaction)"""
+        now = now or timezone.now()
+        self._clear()
+        self.minute = self._minute(now)
+        since = datetime.fromtimestamp((self.minute - self.WINDOW_MINUTES + 1) * 60, tz=dt_timezone.utc)
+        candles = Candle.objects.filter(
+            trading_pair_id=self.trading_pair_id, interval=Candle.Interval.MINUTE_1, open_time__gte=since
+        ).values_list('open_time', 'open', 'high', 'low', 'close', 'volume')
+        for open_time, open_price, high, low, close, volume in candles:
+            minute = self._minute(open_time)
+            if minute > self.minute:
+                continue
+            bucket = MinuteBucket(minute, open_price, volume)
+            bucket.high, bucket.low, bucket.close = high, low, close
+            self.buckets[minute % self.WINDOW_MINUTES] = bucket
+            self.volume += volume
+        # Recomputed from the buckets on the next read
+        self._extremes = None
+
+    def add(self, price, quantity, at):
+        """Count a trade executed at ``at``"""
+        minute = self._minute(at)
+        self.rotate(minute)
+        if minute <= self.minute - self.WINDOW_MINUTES:
+            return
+
+        slot = minute % self.WINDOW_MINUTES
+        bucket = self.buckets[slot]
+        if bucket is None:
+            bucket = self.buckets[slot] = MinuteBucket(minute, price, quantity)
+        else:
+            bucket.add(price, quantity)
+        self.volume += quantity
+
+        if self._extremes is not None:
+            high, low, oldest = self._extremes
+            self._extremes = (
+                price if high is None or price > high else high,
+                price if low is None or price < low else low,
+                bucket if oldest is None or minute < oldest.minute else oldest,
+            )
+
+    def rotate(self, minute):
+        """Move the window forward to end at ``minute``, expiring the buckets it leaves"""
+        if self.minute is not None and minute <= self.minute:
+            return
+        if self.minute is None or minute - self.minute >= self.WINDOW_MINUTES:
+            self._clear()
+            self.minute = minute
+            return
+
+        for expired in range(self.minute - self.WINDOW_MINUTES + 1, minute - self.WINDOW_MINUTES + 1):
+            slot = expired % self.WINDOW_MINUTES
+            bucket = self.buckets[slot]
+            if bucket is None:
+                continue
+            self.buckets[slot] = None
+            self.volume -= bucket.volume
+            if self._extremes is not None:
+                high, low, oldest = self._extremes
+                if bucket.high == high or bucket.low == low or bucket is oldest:
+                    self._extremes = None
+        self.minute = minute
+
+    def stats(self, now=None):
+        """``{'volume', 'high', 'low', 'open'}`` of the window ending now; None prices when it is empty"""
+        self.rotate(self._minute(now or timezone.now()))
+        if self._extremes is None:
+            buckets = [bucket for bucket in self.buckets if bucket is not None]
+            if buckets:
+                self._extremes = (
+                    max(bucket.high for bucket in buckets),
+                    min(bucket.low for bucket in buckets),
+                    min(buckets, key=lambda bucket: bucket.minute),
+                )
+            else:
+                self._extremes = (None, None, None)
+
+        high, low, oldest = self._extremes
+        return {
+            'volume': self.volume,
+            'high': high,
+            'low': low,
+            'open': oldest.open if oldest is not None else None,
+        }
+
+    def apply_to(self, pair, now=None):
+        """
+        Copy the 24h figures onto ``pair`` (which must carry its latest
+        ``last_price``). Returns whether any of ``FIELDS`` changed.
+
+        With no trades in the window the volume and change are 0 and high
+        and low are the last price.
+        """
+        stats = self.stats(now)
+        if stats['open']:
+            change = ((pair.last_price - stats['open']) / stats['open'] * 100).quantize(Decimal('0.01'))
+        else:
+            change = Decimal('0')
+        values = {
+            'volume_24h': stats['volume'],
+            'high_24h': stats['high'] if stats['high'] is not None else pair.last_price,
+            'low_24h': stats['low'] if stats['low'] is not None else pair.last_price,
+            'price_change_24h': change,
+        }
+        changed = any(getattr(pair, field) != value for field, value in values.items())
+        for field, value in values.items():
+            setattr(pair, field, value)
+        return changed
+
+
+class TickerRegistry:
+    """Process-wide registry of rolling tickers, keyed by trading pair id"""
+
+    _tickers = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, trading_pair_id):
+        ticker = cls._tickers.get(trading_pair_id)
+        if ticker is None:
+            with cls._lock:
+                ticker = cls._tickers.setdefault(trading_pair_id, RollingTicker(trading_pair_id))
+        return ticker
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._tickers.clear()
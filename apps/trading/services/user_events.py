@@ -0,0 +1,121 @@
+"""
+User Events
+===========
+Order, trade and balance updates pushed to the ``user_{id}`` groups that
+``UserConsumer`` listens on.
+
+Events are collected while a transaction runs and published only after it
+commits, as one ``user_events`` message per user carrying all of that
+user's events in order:
+
+    {"type": "user_events", "data": {"events": [
+        {"type": "trade_notification", "data": {...}},
+        {"type": "order_update", "data": {...}},
+        {"type": "balance_update", "data": {...}}
+    ]}}
+
+An order or balance touched several times in one transaction is reported
+once, in its final state. Each message is encoded once when published.
+"""
+
+import logging
+from collections import defaultdict
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from apps.trading.services.market_data import encode_frame
+
+logger = logging.getLogger('apps.trading')
+
+
+def _decimal(value):
+    return str(value) if value is not None else None
+
+
+class UserEventBatch:
+    """User-scoped events of one transaction, grouped per user"""
+
+    def __init__(self):
+        # user_id -> [payload]
+        self.trades = defaultdict(list)
+        # user_id -> {order id / currency symbol: payload}, last state wins
+        self.orders = defaultdict(dict)
+        self.balances = defaultdict(dict)
+
+    def __bool__(self):
+        return bool(self.trades or self.orders or self.balances)
+
+    def trade(self, trade, symbol):
+        """One notification for each side of ``trade``"""
+        for user_id, side, is_maker, fee in (
+                (trade.buyer_id, 'buy', trade.is_buyer_maker, trade.buyer_fee),
+                (trade.seller_id, 'sell', not trade.is_buyer_maker, trade.seller_fee)):
+            self.trades[user_id].append({
+                'id': str(trade.pk),
+                'symbol': symbol,
+                'side': side,
+                'role': 'maker' if is_maker else 'taker',
+                'price': _decimal(trade.price),
+                'quantity': _decimal(trade.quantity),
+                'fee': _decimal(fee),
+                'timestamp': trade.created_at.isoformat() if trade.created_at else None,
+            })
+
+    def order(self, order, symbol):
+        self.orders[order.user_id][order.pk] = {
+            'id': str(order.pk),
+            'client_order_id': order.client_order_id,
+            'symbol': symbol,
+            'side': str(order.side),
+            'order_type': str(order.order_type),
+            'status': str(order.status),
+            'price': _decimal(order.price),
+            'stop_price': _decimal(order.stop_price),
+            'quantity': _decimal(order.quantity),
+            'filled_quantity': _decimal(order.filled_quantity),
+            'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+        }
+
+    def balance(self, balance, currency_symbol):
+        self.balances[balance.user_id][currency_symbol] = {
+            'currency': currency_symbol,
+            'available': _decimal(balance.available),
+            'locked': _decimal(balance.locked),
+            'version': balance.version,
+        }
+
+    def messages(self):
+        """``{user_id: [event, ...]}`` with trades first, then orders, then balances"""
+        users = set(self.trades) | set(self.orders) | set(self.balances)
+        return {
+            str(user_id): (
+                [{'type': 'trade_notification', 'data': data} for data in self.trades.get(user_id, ())]
+                + [{'type': 'order_update', 'data': data} for data in self.orders.get(user_id, {}).values()]
+                + [{'type': 'balance_update', 'data': data} for data in self.balances.get(user_id, {}).values()]
+            )
+            for user_id in users
+        }
+
+    def publish_on_commit(self):
+        """Publish after the current transaction commits (immediately outside one)"""
+        if self:
+            transaction.on_commit(partial(publish, self.messages()))
+
+
+def publish(messages):
+    """Send each user's events as one pre-encoded frame"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    send = async_to_sync(channel_layer.group_send)
+    for user_id, events in messages.items():
+        try:
+            message = encode_frame('user_events', {'events': events})
+            message['type'] = 'user_events'
+            send(f'user_{user_id}', message)
+        except Exception:
+            # Clients fall back to polling; a lost notification is not fatal
+            logger.exception(f"Failed to publish user events to user_{user_id}")
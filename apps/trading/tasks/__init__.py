@@ -1,3 +1,4 @@
+from .market_data_tasks import update_trading_pair_stats
 from .stop_order_tasks import check_stop_orders, process_triggered_orders
 
-__all__ = ['check_stop_orders', 'process_triggered_orders']
+__all__ = ['check_stop_orders', 'process_triggered_orders', 'update_trading_pair_stats']
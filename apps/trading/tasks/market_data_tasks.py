@@ -0,0 +1,33 @@
+"""
+Celery tasks for market data
+"""
+import logging
+
+from celery import shared_task
+
+from apps.trading.models import TradingPair
+
+logger = logging.getLogger('apps.trading')
+
+
+@shared_task(name='apps.trading.tasks.update_trading_pair_stats')
+def update_trading_pair_stats():
+    """
+    Update 24h statistics for all trading pairs.
+    Runs every minute.
+
+    The matching engine keeps each pair's 24h figures in a rolling ticker
+    and refreshes them whenever the pair trades; this only lets minutes
+    expire from the window of pairs that have gone quiet.
+    """
+    from apps.trading.services import MatchingClient
+
+    pairs = list(TradingPair.objects.filter(is_active=True))
+
+    for pair in pairs:
+        try:
+            MatchingClient.refresh_ticker(pair)
+        except Exception as e:
+            logger.error(f"Error updating stats for {pair.symbol}: {e}")
+
+    return {'status': 'completed', 'pairs_updated': len(pairs)}
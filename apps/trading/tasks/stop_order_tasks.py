@@ -2,8 +2,6 @@
 Celery tasks for stop order processing
 """
 from celery import shared_task
-from decimal import Decimal
-from django.utils import timezone
 
 from apps.trading.models import Order, TradingPair
 from apps.trading.services import StopOrderService
@@ -12,22 +10,20 @@ from apps.trading.services import StopOrderService
 @shared_task
 def check_stop_orders():
     """
-    Periodic task to check and trigger stop orders
+    Fallback sweep for stop orders
     
-    This should run frequently (e.g., every few seconds) to ensure
-    stop orders are triggered promptly when price conditions are met.
+    Stops normally fire inside the matching engine as soon as a trade
+    crosses them. This slower sweep only picks up stops the engine's
+    trigger index has not seen (e.g. created outside the engine).
     """
-    active_pairs = TradingPair.objects.filter(is_active=True, last_price__gt=0)
+    active_pairs = list(TradingPair.objects.filter(is_active=True, last_price__gt=0))
     
     triggered_count = 0
     for pair in active_pairs:
-        triggered = StopOrderService.check_and_trigger_stops(
-            trading_pair=pair,
-            current_price=pair.last_price
-        )
+        triggered = StopOrderService.sweep_stops(trading_pair=pair)
         triggered_count += len(triggered)
     
-    return f"Checked {active_pairs.count()} pairs, triggered {triggered_count} orders"
+    return f"Swept {len(active_pairs)} pairs, triggered {triggered_count} orders"
 
 
 @shared_task
@@ -35,17 +31,17 @@ def process_triggered_orders():
     """
     Process orders that have been triggered and are now ready to execute
     """
-    from apps.trading.services import MatchingEngine
+    from apps.trading.services import MatchingClient
     
     triggered_orders = Order.objects.filter(
         status=Order.Status.OPEN,
         triggered_at__isnull=False
-    ).order_by('triggered_at')
+    ).select_related('trading_pair').order_by('triggered_at')
     
     processed = 0
     for order in triggered_orders:
         try:
-            MatchingEngine.match_order(order)
+            MatchingClient.match_order(order)
             processed += 1
         except Exception as e:
             # Log error but continue processing other orders
@@ -55,20 +51,17 @@ def process_triggered_orders():
 
 
 @shared_task
-def update_trailing_stops(symbol: str, current_price: str):
+def update_trailing_stops(symbol: str, current_price: str = None):
     """
-    Update trailing stop orders when price changes
+    Update trailing stop orders for a pair
     
-    This should be called whenever a trade occurs
+    The matching engine moves trailing stops on every trade; this only
+    forces a sweep at the pair's last price.
     """
     try:
         trading_pair = TradingPair.objects.get(symbol=symbol)
-        price = Decimal(current_price)
         
-        triggered = StopOrderService.check_and_trigger_stops(
-            trading_pair=trading_pair,
-            current_price=price
-        )
+        triggered = StopOrderService.sweep_stops(trading_pair=trading_pair)
         
         return f"Updated trailing stops for {symbol}, triggered {len(triggered)} orders"
     except TradingPair.DoesNotExist:
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.test import TransactionTestCase
+
+from apps.accounts.models import User
+from apps.trading.models import Order, TradingPair
+from apps.trading.services.memory_book import OrderBookRegistry
+from apps.trading.services.ticker import TickerRegistry
+from apps.wallets.models import Balance, Currency
+from apps.wallets.services import LedgerService
+from apps.wallets.services.reconciliation import LedgerReconciliation
+
+
+class MatchingTestCase(TransactionTestCase):
+    """
+    Matching cycles update the resident book, ticker and journal on commit,
+    so these tests run in real transactions.
+    """
+
+    def setUp(self):
+        OrderBookRegistry.clear()
+        TickerRegistry.clear()
+        self.addCleanup(OrderBookRegistry.clear)
+        self.addCleanup(TickerRegistry.clear)
+        self.eth, _ = Currency.objects.get_or_create(symbol='ETH', defaults={'name': 'Ether'})
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.pair = TradingPair.objects.create(symbol='ETH_USDT', base_currency='ETH', quote_currency='USDT')
+        self.alice = self.user('alice@example.com')
+        self.bob = self.user('bob@example.com')
+
+    def user(self, email, eth='10', usdt='10000'):
+        user = User.objects.create_user(email=email, password='password')
+        if Decimal(eth):
+            LedgerService.credit_balance(user, self.eth, Decimal(eth), 'deposit')
+        if Decimal(usdt):
+            LedgerService.credit_balance(user, self.usdt, Decimal(usdt), 'deposit')
+        return user
+
+    def balance(self, user, currency):
+        balance = Balance.objects.get(user=user, currency=currency)
+        return balance.available, balance.locked
+
+    def book(self):
+        return OrderBookRegistry.get(self.pair.pk)
+
+    def assertLockedMatchesBook(self):
+        """Every user's locked funds equal what their resting orders need, and the ledger agrees"""
+        needed = {}
+        for order in self.book().orders.values():
+            if order.side == Order.Side.SELL:
+                key, amount = (order.user_id, self.eth.pk), order.remaining_quantity
+            else:
+                key, amount = (order.user_id, self.usdt.pk), order.remaining_quantity * order.price
+            needed[key] = needed.get(key, Decimal('0')) + amount
+        for balance in Balance.objects.all():
+            self.assertEqual(balance.locked, needed.get((balance.user_id, balance.currency_id), Decimal('0')))
+        self.assertEqual(LedgerReconciliation.reconcile(workers=1), [])
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from apps.trading.models import Order
+from apps.trading.services import MatchingEngine
+from apps.trading.services.matching_engine import OrderRejected
+from apps.trading.services.memory_book import OrderBookRegistry
+from apps.trading.services.settlement import InsufficientBalance
+
+from .base import MatchingTestCase
+
+
+class AmendOrderTests(MatchingTestCase):
+
+    def queue(self, price):
+        return [order.pk for order in self.book().bids.levels[Decimal(price)]]
+
+    def test_reducing_quantity_unlocks_the_difference_and_keeps_priority(self):
+        first, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('3'), Decimal('100'))
+        second, _ = MatchingEngine.create_order(self.bob, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+
+        MatchingEngine.replace_order(first, quantity=Decimal('1'))
+
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('9900'), Decimal('100')))
+        self.assertEqual(self.queue('100'), [first.pk, second.pk])
+        self.assertLockedMatchesBook()
+
+    def test_increasing_quantity_locks_the_difference(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('2'), Decimal('100'))
+
+        MatchingEngine.replace_order(order, quantity=Decimal('5'))
+
+        self.assertEqual(self.balance(self.alice, self.eth), (Decimal('5'), Decimal('5')))
+        self.assertLockedMatchesBook()
+
+    def test_unfunded_increase_is_rejected(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('2'), Decimal('100'))
+
+        with self.assertRaises(InsufficientBalance):
+            MatchingEngine.replace_order(order, quantity=Decimal('50'))
+
+        self.assertEqual(self.balance(self.alice, self.eth), (Decimal('8'), Decimal('2')))
+        self.assertEqual(self.book().orders[order.pk].quantity, Decimal('2'))
+        self.assertLockedMatchesBook()
+
+    def test_requeued_order_stays_behind_after_a_reload(self):
+        first, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+        second, _ = MatchingEngine.create_order(self.bob, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+
+        MatchingEngine.replace_order(first, quantity=Decimal('2'))
+        self.assertEqual(self.queue('100'), [second.pk, first.pk])
+
+        OrderBookRegistry.clear()
+        MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+
+        second.refresh_from_db()
+        self.assertEqual(second.status, Order.Status.FILLED)
+        self.assertEqual(self.queue('100'), [first.pk])
+        self.assertLockedMatchesBook()
+
+    def test_pair_limits_are_enforced(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+
+        with self.assertRaisesMessage(OrderRejected, 'Price must be a multiple of 0.01'):
+            MatchingEngine.replace_order(order, price=Decimal('100.005'))
+        with self.assertRaisesMessage(OrderRejected, 'Order value must be at least 10'):
+            MatchingEngine.replace_order(order, quantity=Decimal('0.05'))
+
+        self.assertEqual(self.book().orders[order.pk].price, Decimal('100'))
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('9900'), Decimal('100')))
+        self.assertLockedMatchesBook()
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class OrderAmendViewTests(MatchingTestCase):
+
+    def test_limit_violation_is_a_bad_request(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+        client = APIClient()
+        client.force_authenticate(self.alice)
+
+        response = client.post(f'/api/v1/trading/orders/{order.pk}/amend/', {'price': '100.005'}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('multiple of 0.01', response.json()['error'])
@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from apps.trading.models import Order
+from apps.trading.services import MatchingEngine
+
+from .base import MatchingTestCase
+
+
+def buy(quantity, price='100'):
+    return {'order_type': 'limit', 'side': 'buy', 'quantity': Decimal(quantity), 'price': Decimal(price)}
+
+
+class CreateOrdersTests(MatchingTestCase):
+
+    def test_unfunded_order_is_skipped(self):
+        results = MatchingEngine.create_orders(self.alice, self.pair, [buy('50'), buy('60'), buy('40')])
+
+        self.assertEqual([error is None for _, _, error in results], [True, False, True])
+        self.assertIsNone(results[1][0].pk)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('1000'), Decimal('9000')))
+        self.assertLockedMatchesBook()
+
+    def test_atomic_batch_places_nothing(self):
+        with self.assertRaisesMessage(ValueError, 'Order 1'):
+            MatchingEngine.create_orders(self.alice, self.pair, [buy('50'), buy('60')], atomic=True)
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('10000'), Decimal('0')))
+        # The rolled back cycle left the resident book stale, so it is reloaded
+        self.assertIsNone(self.book().sequence)
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('50'), Decimal('100'))
+        self.assertEqual(list(self.book().orders), [order.pk])
+        self.assertLockedMatchesBook()
+
+    def test_later_orders_match_earlier_ones(self):
+        MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+
+        results = MatchingEngine.create_orders(self.alice, self.pair, [
+            buy('1'), {'order_type': 'limit', 'side': 'sell', 'quantity': Decimal('1'), 'price': Decimal('90')},
+        ])
+
+        self.assertEqual([len(trades) for _, trades, _ in results], [1, 0])
+        self.assertEqual(results[1][0].status, Order.Status.OPEN)
+        self.assertLockedMatchesBook()
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class OrderBatchViewTests(MatchingTestCase):
+
+    url = '/api/v1/trading/orders/batch/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def post(self, orders, atomic=False):
+        return self.client.post(self.url, {'symbol': 'eth_usdt', 'atomic': atomic, 'orders': [
+            {key: str(value) for key, value in order.items()} for order in orders
+        ]}, format='json')
+
+    def test_status_reflects_what_was_placed(self):
+        self.assertEqual(self.post([buy('10'), buy('10')]).status_code, 201)
+
+        response = self.post([buy('10'), buy('500')])
+        self.assertEqual(response.status_code, 207)
+        self.assertIsNotNone(response.json()['results'][1]['error'])
+
+        self.assertEqual(self.post([buy('500')]).status_code, 400)
+        self.assertEqual(self.post([buy('10'), buy('500')], atomic=True).status_code, 400)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_pair_limits_reject_the_whole_batch(self):
+        response = self.post([buy('1'), buy('1', '100.001'), buy('0.01')])
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['orders']
+        self.assertEqual(errors[0], {})
+        self.assertIn('price', errors[1])
+        self.assertIn('non_field_errors', errors[2])
+        self.assertFalse(Order.objects.exists())
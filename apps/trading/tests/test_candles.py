@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from apps.trading.models import Candle, Trade
+from apps.trading.services import MatchingEngine
+from apps.trading.services.candles import CandleService
+from apps.trading.services.market_data import CANDLE_INTERVALS
+
+from .base import MatchingTestCase
+
+
+def candles(pair):
+    return {
+        (candle.interval, candle.open_time): (
+            candle.open, candle.high, candle.low, candle.close, candle.volume, candle.trade_count
+        )
+        for candle in Candle.objects.filter(trading_pair=pair)
+    }
+
+
+class CandleTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Mid-minute, so a test's trades cannot straddle a candle boundary
+        patcher = mock.patch('django.utils.timezone.now',
+                             return_value=datetime(2024, 1, 1, 12, 0, 30, tzinfo=dt_timezone.utc))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def trade(self, price, quantity='1'):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal(quantity), Decimal(price))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal(quantity))
+
+    def test_trades_update_every_interval(self):
+        self.trade('100')
+        self.trade('120', '2')
+        self.trade('90')
+
+        trade = Trade.objects.earliest('created_at')
+        for interval in CANDLE_INTERVALS:
+            candle = Candle.objects.get(
+                trading_pair=self.pair, interval=interval,
+                open_time=CandleService.open_time(trade.created_at, interval),
+            )
+            self.assertEqual(
+                (candle.open, candle.high, candle.low, candle.close, candle.volume, candle.trade_count),
+                (Decimal('100'), Decimal('120'), Decimal('90'), Decimal('90'), Decimal('4'), 3),
+            )
+
+    def test_backfill_rebuilds_the_recorded_candles(self):
+        self.trade('100')
+        self.trade('120', '2')
+        earlier = Trade.objects.earliest('created_at')
+        Trade.objects.filter(pk=earlier.pk).update(created_at=earlier.created_at - timedelta(minutes=7))
+        self.trade('90')
+
+        # Candles as if the first trade had happened 7 minutes earlier
+        Candle.objects.all().delete()
+        for trade in Trade.objects.order_by('created_at', 'id'):
+            CandleService.record(self.pair, [trade])
+        recorded = candles(self.pair)
+
+        Candle.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_candles', symbol='eth_usdt', stdout=out)
+
+        self.assertEqual(candles(self.pair), recorded)
+        self.assertEqual(Candle.objects.filter(interval='1m').count(), 2)
+        self.assertIn(f"Backfilled {len(recorded)} candles", out.getvalue())
+
+    def test_backfill_of_a_day_without_trades_clears_it(self):
+        self.trade('100')
+        day = Trade.objects.get().created_at.date()
+        Trade.objects.all().delete()
+
+        self.assertEqual(CandleService.backfill_day(self.pair, day), 0)
+        self.assertFalse(Candle.objects.exists())
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class KlineViewTests(MatchingTestCase):
+
+    url = '/api/v1/trading/klines/ETH_USDT/'
+
+    def setUp(self):
+        super().setUp()
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal('1'))
+
+    def test_candles_of_the_interval(self):
+        response = self.client.get(self.url, {'interval': '1h'})
+
+        self.assertEqual(response.status_code, 200)
+        [candle] = response.json()['candles']
+        self.assertEqual(Decimal(candle['close']), Decimal('100'))
+        self.assertEqual(candle['trade_count'], 1)
+
+    def test_range_excludes_later_candles(self):
+        open_time = Candle.objects.get(interval='1m').open_time
+        response = self.client.get(self.url, {'end': int((open_time - timedelta(minutes=1)).timestamp() * 1000)})
+
+        self.assertEqual(response.json()['candles'], [])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'interval': '2m'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/trading/klines/NOPE_USDT/').status_code, 404)
@@ -0,0 +1,91 @@
+from django.test import SimpleTestCase
+
+from apps.trading.services.market_data import (
+    Conflator, merge_candles, merge_depth, merge_latest, merge_trades,
+)
+
+
+def delta(sequence, bids=(), asks=()):
+    return {
+        'symbol': 'ETH_USDT', 'sequence': sequence, 'prev_sequence': sequence - 1, 'timestamp': str(sequence),
+        'bids': [{'price': price, 'quantity': quantity} for price, quantity in bids],
+        'asks': [{'price': price, 'quantity': quantity} for price, quantity in asks],
+    }
+
+
+class MergeTests(SimpleTestCase):
+
+    def merged(self, merge, *events):
+        accumulator = None
+        for event in events:
+            accumulator = merge(accumulator, event)
+        return merge(accumulator, None)
+
+    def test_depth_window_spans_its_deltas_and_latest_levels_win(self):
+        frame = self.merged(
+            merge_depth,
+            delta(11, bids=[('99', '1')]),
+            delta(12, bids=[('100', '2'), ('99', '0')], asks=[('102', '1')]),
+            delta(13, asks=[('101', '3')]),
+        )
+
+        self.assertEqual((frame['prev_sequence'], frame['sequence']), (10, 13))
+        self.assertEqual(frame['bids'], [{'price': '100', 'quantity': '2'}, {'price': '99', 'quantity': '0'}])
+        self.assertEqual(frame['asks'], [{'price': '101', 'quantity': '3'}, {'price': '102', 'quantity': '1'}])
+        self.assertEqual(frame['timestamp'], '13')
+
+    def test_depth_delta_that_skips_a_sequence_is_not_merged(self):
+        accumulator = merge_depth(None, delta(11))
+
+        self.assertIsNone(merge_depth(accumulator, delta(13)))
+
+    def test_trades_are_kept_in_order(self):
+        frame = self.merged(
+            merge_trades, {'symbol': 'ETH_USDT', 'trades': [1, 2]}, {'symbol': 'ETH_USDT', 'trades': [3]}
+        )
+        self.assertEqual(frame['trades'], [1, 2, 3])
+
+    def test_latest_ticker_wins(self):
+        self.assertEqual(self.merged(merge_latest, {'last_price': '1'}, {'last_price': '2'}), {'last_price': '2'})
+
+    def test_latest_state_of_each_candle_wins(self):
+        frame = self.merged(
+            merge_candles,
+            {'symbol': 'ETH_USDT', 'interval': '1m', 'candles': [{'open_time': 2, 'close': '5'}]},
+            {'symbol': 'ETH_USDT', 'interval': '1m', 'candles': [
+                {'open_time': 1, 'close': '4'}, {'open_time': 2, 'close': '6'},
+            ]},
+        )
+        self.assertEqual(frame['candles'], [{'open_time': 1, 'close': '4'}, {'open_time': 2, 'close': '6'}])
+
+
+class ConflatorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.conflator = Conflator(send=lambda stream, event_type, frame: self.sent.append((stream, frame)))
+
+    def test_one_frame_per_stream_and_window(self):
+        for sequence in (1, 2, 3):
+            self.conflator.add('book:ETH_USDT', 'orderbook_update', delta(sequence), 60, merge_depth)
+        self.conflator.add('ticker:ETH_USDT', 'ticker_update', {'last_price': '1'}, 60, merge_latest)
+        self.assertEqual(self.sent, [])
+
+        self.conflator.flush(force=True)
+
+        self.assertEqual([stream for stream, _ in self.sent], ['book:ETH_USDT', 'ticker:ETH_USDT'])
+        self.assertEqual((self.sent[0][1]['prev_sequence'], self.sent[0][1]['sequence']), (0, 3))
+
+    def test_gap_sends_the_window_and_opens_a_new_one(self):
+        self.conflator.add('book:ETH_USDT', 'orderbook_update', delta(1), 60, merge_depth)
+        self.conflator.add('book:ETH_USDT', 'orderbook_update', delta(5), 60, merge_depth)
+
+        self.assertEqual([(f['prev_sequence'], f['sequence']) for _, f in self.sent], [(0, 1)])
+        self.conflator.flush(force=True)
+        self.assertEqual([(f['prev_sequence'], f['sequence']) for _, f in self.sent], [(0, 1), (4, 5)])
+
+    def test_open_windows_are_not_sent_early(self):
+        self.conflator.add('book:ETH_USDT', 'orderbook_update', delta(1), 60, merge_depth)
+        self.conflator.flush()
+
+        self.assertEqual(self.sent, [])
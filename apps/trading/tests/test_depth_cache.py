@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from apps.trading.models import TradingPair
+from apps.trading.services import MatchingEngine, OrderBookService
+from apps.trading.services.depth_cache import DepthCache
+
+from .base import MatchingTestCase
+
+
+class DepthCacheTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        DepthCache._local.clear()
+        self.addCleanup(DepthCache._local.clear)
+        for price in ('99', '98', '98', '97'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1.5'), Decimal(price))
+        for price in ('101', '102'):
+            MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('2'), Decimal(price))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'sell', Decimal('2'))
+        self.pair.refresh_from_db()
+
+    @staticmethod
+    def levels(levels):
+        # Aggregates come back at the database's own scale
+        return [{name: Decimal(value) for name, value in level.items()} for level in levels]
+
+    def test_published_depth_matches_the_orders_table(self):
+        cached = OrderBookService.get_order_book(self.pair)
+        DepthCache._local.clear()
+        queried = OrderBookService.get_order_book(self.pair)
+
+        self.assertEqual(cached['sequence'], self.pair.book_sequence)
+        for side in ('bids', 'asks'):
+            self.assertEqual(self.levels(cached[side]), self.levels(queried[side]))
+        self.assertEqual([level['price'] for level in cached['bids']], ['98.00000000', '97.00000000'])
+        self.assertEqual(cached['bids'][0]['quantity'], '2.50000000')
+
+    def test_spread_is_read_from_the_cache(self):
+        self.assertEqual(OrderBookService.get_spread(self.pair), {
+            'best_bid': '98.00000000', 'best_ask': '101.00000000', 'spread': '3.00000000'
+        })
+
+    def test_snapshot_older_than_the_pair_is_ignored(self):
+        TradingPair.objects.filter(pk=self.pair.pk).update(book_sequence=self.pair.book_sequence + 1)
+        self.pair.refresh_from_db()
+
+        self.assertIsNone(DepthCache.get(self.pair))
+
+    def test_cancel_updates_the_published_levels(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+        self.pair.refresh_from_db()
+        self.assertEqual(DepthCache.get(self.pair)['bids'][0]['price'], '100.00000000')
+
+        MatchingEngine.cancel_order(order)
+        self.pair.refresh_from_db()
+        self.assertEqual(DepthCache.get(self.pair)['bids'][0]['price'], '98.00000000')
@@ -0,0 +1,57 @@
+import json
+
+import msgpack
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from apps.trading.consumers import StreamConsumer
+from apps.trading.routing import websocket_urlpatterns
+from apps.trading.services.market_data import encode_frame
+from apps.trading.services.outbound import OutboundQueue
+
+
+class EncodeFrameTests(SimpleTestCase):
+
+    def test_frame_is_encoded_as_json_and_msgpack(self):
+        encoded = encode_frame('trades', {'symbol': 'ETH_USDT', 'trades': [{'price': '1.5'}]}, 'trades:ETH_USDT')
+
+        expected = {'type': 'trades', 'data': {'symbol': 'ETH_USDT', 'trades': [{'price': '1.5'}]},
+                    'stream': 'trades:ETH_USDT'}
+        self.assertEqual(json.loads(encoded['text']), expected)
+        self.assertEqual(msgpack.unpackb(encoded['bytes']), expected)
+
+    @override_settings(MARKET_DATA_CONFIG={**settings.MARKET_DATA_CONFIG, 'MSGPACK_FRAMES': False})
+    def test_msgpack_can_be_turned_off(self):
+        self.assertNotIn('bytes', encode_frame('ticker', {'symbol': 'ETH_USDT'}))
+
+
+class ForwardTests(SimpleTestCase):
+
+    def consumer(self, query_string):
+        consumer = StreamConsumer()
+        consumer.scope = {'query_string': query_string}
+        consumer.outbound = OutboundQueue(size=10, hard_limit=10)
+        return consumer
+
+    async def test_broadcast_frames_are_forwarded_as_encoded(self):
+        event = dict(encode_frame('ticker', {'symbol': 'ETH_USDT'}, 'ticker:ETH_USDT'), type='ticker_update')
+
+        binary = self.consumer(b'format=msgpack')
+        await binary.forward(event, 'ticker')
+        text = self.consumer(b'')
+        await text.forward(event, 'ticker')
+
+        self.assertIs(binary.outbound.items[0][2]['bytes_data'], event['bytes'])
+        self.assertIs(text.outbound.items[0][2]['text_data'], event['text'])
+
+    async def test_msgpack_connection_gets_binary_replies(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/stream/?format=msgpack')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_to(text_data=json.dumps({'type': 'ping'}))
+        reply = await communicator.receive_output()
+        self.assertEqual(msgpack.unpackb(reply['bytes']), {'type': 'pong'})
+        await communicator.disconnect()
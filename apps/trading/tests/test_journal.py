@@ -0,0 +1,51 @@
+import tempfile
+from decimal import Decimal
+
+from apps.trading.services import MatchingEngine
+from apps.trading.services.journal import JournalReplayer, MatchingJournal
+from apps.trading.services.memory_book import OrderBookRegistry
+
+from .base import MatchingTestCase
+
+
+class JournalReplayTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.journal = MatchingJournal(self.directory)
+        MatchingJournal.activate(self.journal)
+        self.addCleanup(MatchingJournal.activate, None)
+        self.addCleanup(self.journal.close)
+
+    def trade(self):
+        for price in ('97', '98', '99'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal(price))
+        ask, _ = MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('2'), Decimal('101'))
+        cancelled, _ = MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('1'), Decimal('105'))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'sell', Decimal('1.5'))
+        MatchingEngine.cancel_order(cancelled)
+
+    def assertReplayMatchesLiveBook(self):
+        self.journal.sync()
+        live = self.book()
+        replayed = JournalReplayer(self.directory).rebuild()[self.pair.pk]
+
+        self.assertEqual(replayed.depth(), live.depth())
+        self.assertEqual(replayed.sequence, live.sequence)
+        self.assertEqual(
+            {pk: order.remaining_quantity for pk, order in replayed.orders.items()},
+            {pk: order.remaining_quantity for pk, order in live.orders.items()},
+        )
+
+    def test_replay_rebuilds_the_live_book(self):
+        self.trade()
+        self.assertReplayMatchesLiveBook()
+
+    def test_replay_starts_from_the_latest_snapshot(self):
+        self.trade()
+        self.journal.snapshot(OrderBookRegistry.all())
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('0.5'), Decimal('100'))
+        self.assertReplayMatchesLiveBook()
@@ -0,0 +1,105 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import override_settings
+
+from apps.trading.routing import websocket_urlpatterns
+from apps.trading.services import MatchingEngine
+
+from .base import MatchingTestCase
+
+UNCONFLATED = override_settings(MARKET_DATA_CONFIG={
+    **settings.MARKET_DATA_CONFIG,
+    'DEPTH_INTERVALS_MS': [0], 'TRADE_INTERVAL_MS': 0, 'TICKER_INTERVAL_MS': 0, 'CANDLE_INTERVAL_MS': 0,
+})
+
+
+class CaptureLayer:
+    """Channel layer that keeps what is sent to groups"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+    def frames(self, event_type):
+        return [message for _, message in self.sent if message['type'] == event_type]
+
+
+@UNCONFLATED
+class BookDeltaTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.layer = CaptureLayer()
+        patcher = mock.patch('apps.trading.services.market_data.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def deltas(self):
+        return [json.loads(message['text'])['data'] for message in self.layer.frames('orderbook_update')]
+
+    def test_each_cycle_publishes_the_levels_it_changed(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('99'))
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('2'), Decimal('98'))
+        MatchingEngine.cancel_order(order)
+
+        deltas = self.deltas()
+        self.assertEqual([(d['bids'], d['asks']) for d in deltas], [
+            ([{'price': '99.00000000', 'quantity': '1.00000000', 'total': '99.0000000000000000'}], []),
+            ([{'price': '98.00000000', 'quantity': '2.00000000', 'total': '196.0000000000000000'}], []),
+            ([{'price': '98.00000000', 'quantity': '0E-8', 'total': '0E-16'}], []),
+        ])
+        self.pair.refresh_from_db()
+        self.assertEqual(deltas[-1]['sequence'], self.pair.book_sequence)
+        for previous, delta in zip(deltas, deltas[1:]):
+            self.assertEqual(delta['prev_sequence'], previous['sequence'])
+
+    def test_trade_publishes_both_sides_and_the_trades(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('2'), Decimal('101'))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal('0.5'))
+
+        self.assertEqual(self.deltas()[-1]['asks'][0]['quantity'], '1.50000000')
+        groups = {group for group, _ in self.layer.sent}
+        self.assertTrue({'orderbook_ETH_USDT', 'trades_ETH_USDT', 'ticker_ETH_USDT'} <= groups)
+
+    def test_rejected_order_publishes_nothing(self):
+        with self.assertRaises(ValueError):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('500'), Decimal('100'))
+
+        self.assertEqual(self.layer.sent, [])
+
+
+@UNCONFLATED
+class OrderBookConsumerTests(MatchingTestCase):
+
+    async def test_deltas_continue_from_the_snapshot(self):
+        await database_sync_to_async(MatchingEngine.create_order)(
+            self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('99')
+        )
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/orderbook/ETH_USDT/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'orderbook_snapshot')
+        self.assertEqual(snapshot['data']['bids'][0]['price'], '99.00000000')
+
+        await database_sync_to_async(MatchingEngine.create_order)(
+            self.bob, self.pair, 'limit', 'sell', Decimal('1'), Decimal('105')
+        )
+        delta = await communicator.receive_json_from()
+        self.assertEqual(delta['type'], 'orderbook_update')
+        self.assertEqual(delta['data']['prev_sequence'], snapshot['data']['sequence'])
+        self.assertEqual(delta['data']['asks'][0]['price'], '105.00000000')
+
+        await communicator.send_json_to({'type': 'resync'})
+        resync = await communicator.receive_json_from()
+        self.assertEqual(resync['data']['sequence'], delta['data']['sequence'])
+        await communicator.disconnect()
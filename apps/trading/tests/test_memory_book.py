@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from apps.trading.models import Order
+from apps.trading.services.memory_book import MemoryOrderBook
+
+
+class MemoryOrderBookTests(SimpleTestCase):
+
+    def setUp(self):
+        self.book = MemoryOrderBook(1)
+        self.next_id = 0
+
+    def rest(self, side, price, quantity):
+        self.next_id += 1
+        order = Order(
+            pk=self.next_id, order_type=Order.OrderType.LIMIT, side=side,
+            price=Decimal(price), quantity=Decimal(quantity)
+        )
+        self.book.add(order)
+        return order
+
+    def test_levels_are_walked_best_first(self):
+        for price in ('105', '101', '103', '102', '104'):
+            self.rest(Order.Side.SELL, price, '1')
+        for price in ('97', '99', '98'):
+            self.rest(Order.Side.BUY, price, '1')
+
+        self.assertEqual([level.price for level in self.book.asks.iter_levels()],
+                         [Decimal(p) for p in ('101', '102', '103', '104', '105')])
+        self.assertEqual(self.book.depth(2), {
+            'bids': [(Decimal('99'), Decimal('1')), (Decimal('98'), Decimal('1'))],
+            'asks': [(Decimal('101'), Decimal('1')), (Decimal('102'), Decimal('1'))],
+        })
+
+    def test_emptied_levels_are_skipped(self):
+        orders = [self.rest(Order.Side.SELL, price, '1') for price in ('101', '102', '103')]
+        self.book.remove(orders[1].pk)
+
+        self.assertEqual([level.price for level in self.book.asks.iter_levels()], [Decimal('101'), Decimal('103')])
+
+    def test_cost_walks_only_the_levels_it_needs(self):
+        self.rest(Order.Side.SELL, '100', '1')
+        self.rest(Order.Side.SELL, '101', '2')
+        self.rest(Order.Side.SELL, '500', '10')
+
+        self.assertEqual(self.book.asks.cost(Decimal('2.5')), Decimal('100') + Decimal('1.5') * Decimal('101'))
+
+    def test_available_stops_at_the_limit_price_and_the_quantity(self):
+        self.rest(Order.Side.SELL, '100', '1')
+        self.rest(Order.Side.SELL, '101', '2')
+        self.rest(Order.Side.SELL, '102', '4')
+
+        self.assertEqual(self.book.asks.available(Decimal('101')), Decimal('3'))
+        self.assertEqual(self.book.asks.available(None, Decimal('2')), Decimal('3'))
+        self.assertEqual(self.book.asks.available(), Decimal('7'))
+
+    def test_cancel_keeps_the_rest_of_the_queue(self):
+        first, second, third = (self.rest(Order.Side.BUY, '99', '1') for _ in range(3))
+        self.book.remove(second.pk)
+
+        level = self.book.bids.best()
+        self.assertEqual(list(level), [first, third])
+        self.assertEqual(level.quantity, Decimal('2'))
+        self.assertNotIn(second.pk, self.book)
+
+    def test_heap_is_compacted_when_levels_empty_out(self):
+        for i in range(200):
+            order = self.rest(Order.Side.SELL, str(1000 + i), '1')
+            self.book.remove(order.pk)
+        self.rest(Order.Side.SELL, '1500', '1')
+
+        self.assertLess(len(self.book.asks._heap), 100)
+        self.assertEqual(self.book.best_ask(), Decimal('1500'))
@@ -0,0 +1,104 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.trading.consumers import StreamConsumer
+from apps.trading.services.market_data import Streams, _group_send
+from apps.trading.services.outbound import DEPTH, FRAME, SNAPSHOT, OutboundQueue
+
+
+class CaptureLayer:
+    """Channel layer that keeps what is sent to groups"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+def delta(symbol, sequence):
+    return {'symbol': symbol, 'sequence': sequence, 'prev_sequence': sequence - 1,
+            'bids': [], 'asks': [], 'timestamp': ''}
+
+
+class OutboundQueueTests(SimpleTestCase):
+
+    async def test_full_queue_collapses_only_the_overflowing_stream(self):
+        queue = OutboundQueue(size=3, hard_limit=10)
+        queue.put_depth('book:ETH_USDT', 'ETH_USDT', 'eth-1')
+        queue.put({'text_data': 'trade'})
+        queue.put_depth('book:BTC_USDT', 'BTC_USDT', 'btc-1')
+        queue.put_depth('book:ETH_USDT', 'ETH_USDT', 'eth-2')
+
+        self.assertEqual(list(queue.items), [
+            (FRAME, None, {'text_data': 'trade'}),
+            (DEPTH, 'book:BTC_USDT', 'btc-1'),
+            (SNAPSHOT, 'book:ETH_USDT', 'ETH_USDT'),
+        ])
+
+    async def test_hard_limit_refuses_frames(self):
+        queue = OutboundQueue(size=1, hard_limit=2)
+
+        self.assertTrue(queue.put({'text_data': '1'}))
+        self.assertTrue(queue.put({'text_data': '2'}))
+        self.assertFalse(queue.put({'text_data': '3'}))
+
+
+class SlowStreamConsumerTests(SimpleTestCase):
+
+    def published(self, *deltas):
+        layer = CaptureLayer()
+        with mock.patch('apps.trading.services.market_data.get_channel_layer', return_value=layer):
+            for item in deltas:
+                _group_send(Streams.book(item['symbol']), 'orderbook_update', item)
+        return [message for _, message in layer.sent]
+
+    async def test_each_backed_up_symbol_gets_its_own_snapshot(self):
+        messages = await asyncio.to_thread(self.published, *(
+            delta(symbol, sequence) for sequence in (1, 2, 3) for symbol in ('ETH_USDT', 'BTC_USDT')
+        ))
+        self.assertEqual({message['stream'] for message in messages}, {'book:ETH_USDT', 'book:BTC_USDT'})
+
+        consumer = StreamConsumer()
+        consumer.scope = {'query_string': b''}
+        consumer.streams = {'book:ETH_USDT': 'orderbook_ETH_USDT', 'book:BTC_USDT': 'orderbook_BTC_USDT'}
+        # No writer yet: the client is not reading
+        consumer.outbound = OutboundQueue(size=3, hard_limit=100)
+        for message in messages:
+            await consumer.forward(message, 'orderbook_update')
+
+        snapshots = []
+
+        async def send_snapshots(streams):
+            snapshots.extend(streams)
+
+        consumer.send_snapshots = send_snapshots
+        consumer.send = mock.AsyncMock()
+        writer = asyncio.ensure_future(consumer._write())
+        while consumer.outbound.items:
+            await asyncio.sleep(0)
+        writer.cancel()
+
+        self.assertEqual(sorted(snapshots), ['book:BTC_USDT', 'book:ETH_USDT'])
+        # Only the delta queued after its stream's snapshot marker is still sent
+        self.assertEqual(consumer.send.call_count, 1)
+        self.assertIn('"stream":"book:BTC_USDT"', consumer.send.call_args.kwargs['text_data'])
+
+    async def test_client_past_the_hard_limit_is_disconnected(self):
+        consumer = StreamConsumer()
+        consumer.scope = {'query_string': b''}
+        consumer.channel_name = 'test'
+        consumer.outbound = OutboundQueue(size=1, hard_limit=1)
+        consumer._writer = mock.Mock()
+        consumer.send_json = mock.AsyncMock()
+        consumer.close = mock.AsyncMock()
+
+        for _ in range(3):
+            await consumer.forward({'type': 'trades_update', 'text': '{}'}, 'trades')
+
+        consumer.send_json.assert_called_once()
+        self.assertEqual(consumer.send_json.call_args.args[0]['code'], 'slow_consumer')
+        consumer.close.assert_called_once_with(code=4008)
+        self.assertEqual(len(consumer.outbound), 0)
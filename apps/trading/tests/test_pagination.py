@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.trading.models import Order, Trade
+from apps.trading.services import MatchingEngine
+from apps.wallets.models import LedgerEntry
+
+from .base import MatchingTestCase
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class KeysetPaginationTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        for price in range(100, 105):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal(price))
+            MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal('1'))
+
+    def walk(self, url, link='next'):
+        """Ids of every page reached by following ``link`` from ``url``, and the last response"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([row['id'] for row in body['results']])
+            url = body[link]
+        return pages, body
+
+    def test_trade_pages_cover_the_history_once(self):
+        pages, last = self.walk('/api/v1/trading/trades/?page_size=2')
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        expected = list(Trade.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([row for page in pages for row in page], expected)
+        self.assertIsNotNone(last['previous'])
+
+    def test_previous_links_walk_back(self):
+        pages, last = self.walk('/api/v1/trading/trades/?page_size=2')
+        back, first = self.walk(last['previous'], link='previous')
+
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(first['previous'])
+
+    def test_rows_tied_on_created_at_are_not_skipped(self):
+        Order.objects.filter(user=self.alice).update(created_at=timezone.now())
+
+        pages, _ = self.walk('/api/v1/trading/orders/?page_size=2')
+
+        expected = list(Order.objects.filter(user=self.alice).order_by('-id').values_list('id', flat=True))
+        self.assertEqual([row for page in pages for row in page], expected)
+
+    def test_ledger_history(self):
+        pages, _ = self.walk('/api/v1/wallets/ledger/?page_size=3')
+
+        ids = [row for page in pages for row in page]
+        self.assertEqual(len(ids), LedgerEntry.objects.filter(user=self.alice).count())
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/v1/trading/trades/?cursor=bogus').status_code, 404)
@@ -0,0 +1,149 @@
+import json
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from apps.trading.models import Order, TradingPair
+from apps.trading.services.sequencer import MatchingWorker, QUEUE_KEY, shard_for
+
+from .base import MatchingTestCase
+
+
+class FakeRedis:
+    """The list commands the worker uses, on a dict of lists"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value.encode() if isinstance(value, str) else value)
+
+    def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    def blpop(self, keys, timeout=0):
+        for key in keys:
+            value = self.lpop(key)
+            if value is not None:
+                return key.encode(), value
+        return None
+
+    def expire(self, key, seconds):
+        pass
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+def config(**overrides):
+    return override_settings(MATCHING_ENGINE_CONFIG={
+        **settings.MATCHING_ENGINE_CONFIG, 'JOURNAL_DIR': '', 'MODE': 'sequencer', **overrides
+    })
+
+
+class ShardTests(SimpleTestCase):
+
+    def test_every_symbol_has_one_stable_shard(self):
+        for symbol in ('BTC_USDT', 'ETH_USDT', 'SOL_USDT'):
+            self.assertEqual(shard_for(symbol, 4), shard_for(symbol, 4))
+            self.assertIn(shard_for(symbol, 4), range(4))
+
+
+@config(EXECUTION_MARGIN=1)
+class MatchingWorkerTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.trading.services.sequencer._redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.worker = MatchingWorker()
+        self.next_id = 0
+
+    def submit(self, deadline_in=5, symbol='ETH_USDT'):
+        self.next_id += 1
+        message = {
+            'id': str(self.next_id),
+            'command': 'create_order',
+            'payload': {
+                'user_id': str(self.alice.pk), 'trading_pair_id': self.pair.pk, 'order_type': 'limit',
+                'side': 'buy', 'quantity': '1', 'price': '100',
+            },
+            'reply_to': f'reply:{self.next_id}',
+            'deadline': time.time() + deadline_in,
+        }
+        self.redis.rpush(QUEUE_KEY.format(symbol=symbol), json.dumps(message))
+        return message
+
+    def reply(self, message):
+        return json.loads(self.redis.lpop(message['reply_to']))
+
+    def test_command_is_executed_and_answered(self):
+        message = self.submit()
+        self.worker.refresh_symbols()
+        self.worker.run_once()
+
+        reply = self.reply(message)
+        self.assertEqual(Order.objects.get(pk=reply['result']['order_id']).price, Decimal('100'))
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('9900'), Decimal('100')))
+
+    def test_command_too_close_to_its_deadline_is_dropped(self):
+        message = self.submit(deadline_in=0.5)
+        self.worker.refresh_symbols()
+        self.worker.run_once()
+
+        self.assertEqual(self.reply(message)['error'], 'Matching command expired')
+        self.assertFalse(Order.objects.exists())
+
+    def test_command_finishing_past_its_deadline_is_rolled_back(self):
+        message = self.submit(deadline_in=5)
+        # Started in time, finished after the caller stopped waiting
+        with mock.patch.object(MatchingWorker, 'expired', side_effect=[False, True]):
+            reply = self.worker.handle(message)
+
+        self.assertEqual(reply['error'], 'Matching command expired')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('10000'), Decimal('0')))
+        # The resident book is marked stale and reloaded by the next command
+        self.assertIsNone(self.book().sequence)
+        self.assertIn('result', self.worker.handle(self.submit()))
+        self.assertEqual(len(self.book().orders), 1)
+
+    def test_batch_replies_early_when_a_caller_nears_its_deadline(self):
+        first = self.submit(deadline_in=2.5)
+        second = self.submit(deadline_in=60)
+        self.worker.refresh_symbols()
+
+        answered = []
+        handle = self.worker.handle
+
+        def slow_handle(message):
+            answered.append({m['id'] for m in (first, second) if self.redis.lists.get(m['reply_to'])})
+            reply = handle(message)
+            time.sleep(0.6)
+            return reply
+
+        with mock.patch.object(self.worker, 'handle', side_effect=slow_handle):
+            self.worker.run_once()
+
+        # The first reply went out before the second command ran
+        self.assertEqual(answered, [set(), {first['id']}])
+        self.assertIn('result', self.reply(first))
+        self.assertIn('result', self.reply(second))
+
+    def test_inactive_pairs_are_still_consumed(self):
+        TradingPair.objects.filter(pk=self.pair.pk).update(is_active=False)
+        message = self.submit()
+        self.worker.refresh_symbols()
+        self.worker.run_once()
+
+        self.assertIn('result', self.reply(message))
+        self.assertEqual(self.redis.lists[QUEUE_KEY.format(symbol='ETH_USDT')], [])
@@ -0,0 +1,109 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+
+from apps.trading.models import Order
+from apps.trading.services import MatchingEngine
+from apps.trading.services.matching_engine import OrderRejected
+from apps.trading.services.settlement import InsufficientBalance
+
+from .base import MatchingTestCase
+
+
+class SettlementTests(MatchingTestCase):
+
+    def test_resting_order_locks_its_reserve(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('2'), Decimal('100'))
+
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('9800'), Decimal('200')))
+        self.assertLockedMatchesBook()
+
+    def test_cancel_releases_the_reserve(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('3'), Decimal('100'))
+        MatchingEngine.cancel_order(order)
+
+        self.assertEqual(self.balance(self.alice, self.eth), (Decimal('10'), Decimal('0')))
+        self.assertNotIn(order.pk, self.book())
+        self.assertLockedMatchesBook()
+
+    def test_taker_unlocks_reserve_it_did_not_use(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('90'))
+        order, trades = MatchingEngine.create_order(
+            self.bob, self.pair, 'limit', 'buy', Decimal('2'), Decimal('100')
+        )
+
+        self.assertEqual([trade.price for trade in trades], [Decimal('90')])
+        # Paid 90 for the fill, keeps 100 locked for the resting remainder
+        self.assertEqual(self.balance(self.bob, self.usdt), (Decimal('9810'), Decimal('100')))
+        self.assertLockedMatchesBook()
+
+    def test_market_buy_reserves_the_book_cost_whatever_its_price(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('200'))
+        buyer = self.user('carol@example.com', eth='0', usdt='250')
+
+        with self.assertRaises(InsufficientBalance):
+            MatchingEngine.create_order(buyer, self.pair, 'market', 'buy', Decimal('2'), Decimal('1'))
+        self.assertEqual(self.balance(buyer, self.usdt), (Decimal('250'), Decimal('0')))
+
+    def test_insufficient_balance_leaves_everything_untouched(self):
+        with self.assertRaises(InsufficientBalance):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('200'), Decimal('100'))
+
+        self.assertEqual(self.balance(self.alice, self.usdt), (Decimal('10000'), Decimal('0')))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.book().orders, {})
+
+    def test_rejected_command_keeps_the_book_current(self):
+        order, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+        MatchingEngine.cancel_order(order)
+        sequence = self.book().sequence
+
+        with self.assertRaises(OrderRejected):
+            MatchingEngine.cancel_order(order)
+        with self.assertRaises(OrderRejected):
+            MatchingEngine.replace_order(order, quantity=Decimal('2'))
+
+        self.assertEqual(self.book().sequence, sequence)
+
+    def test_locked_funds_match_resting_orders_after_trading(self):
+        for price in ('95', '96', '97'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal(price))
+        for price in ('101', '102'):
+            MatchingEngine.create_order(self.bob, self.pair, 'limit', 'sell', Decimal('1.5'), Decimal(price))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'sell', Decimal('1.5'))
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('2'), Decimal('101.5'))
+
+        self.assertLockedMatchesBook()
+
+    def test_limit_order_needs_a_price(self):
+        with self.assertRaises(ValueError):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'))
+
+
+class FundRestingOrdersTests(MatchingTestCase):
+
+    def rest_unfunded(self, user, side, quantity, price):
+        # As placed before funds were reserved on acceptance
+        return Order.objects.create(
+            user=user, trading_pair=self.pair, order_type='limit', side=side, status=Order.Status.OPEN,
+            quantity=Decimal(quantity), price=Decimal(price)
+        )
+
+    def test_funds_resting_orders_and_cancels_the_unfunded(self):
+        funded = self.rest_unfunded(self.alice, 'sell', '6', '100')
+        unfunded = self.rest_unfunded(self.alice, 'sell', '6', '101')
+
+        call_command('fund_resting_orders', symbol='ETH_USDT', stdout=StringIO())
+
+        self.assertEqual(self.balance(self.alice, self.eth), (Decimal('4'), Decimal('6')))
+        self.assertEqual(Order.objects.get(pk=unfunded.pk).status, Order.Status.CANCELLED)
+        self.assertEqual(list(self.book().orders), [funded.pk])
+        self.assertLockedMatchesBook()
+
+    def test_orders_already_funded_are_left_alone(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('2'), Decimal('100'))
+
+        self.assertEqual(MatchingEngine.fund_resting_orders(self.pair), ([], []))
+        self.assertEqual(self.balance(self.alice, self.eth), (Decimal('8'), Decimal('2')))
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.trading.services.snapshots import SnapshotCache
+
+
+class SnapshotCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        for name in ('_entries', '_inflight', '_versions', '_watchers'):
+            patcher = mock.patch.object(SnapshotCache, name, {})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.builds = []
+        self.sequence = 5
+        self.release = threading.Event()
+        self.release.set()
+        builders = {'book': self.build_book, 'trades': self.build_trades}
+        patcher = mock.patch.object(SnapshotCache, 'BUILDERS', builders)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build_book(self, symbol):
+        self.release.wait(5)
+        self.builds.append(('book', symbol))
+        return {'symbol': symbol, 'sequence': self.sequence}
+
+    def build_trades(self, symbol):
+        self.builds.append(('trades', symbol))
+        return [len(self.builds)]
+
+    async def test_concurrent_requests_share_one_build(self):
+        SnapshotCache.watch('book', 'ETH_USDT')
+        self.release.clear()
+        waiting = [asyncio.ensure_future(SnapshotCache.get('book', 'ETH_USDT')) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        self.release.set()
+
+        snapshots = await asyncio.gather(*waiting)
+        self.assertEqual(self.builds, [('book', 'ETH_USDT')])
+        self.assertTrue(all(snapshot is snapshots[0] for snapshot in snapshots))
+
+    async def test_book_snapshot_is_reused_until_a_newer_delta_is_seen(self):
+        SnapshotCache.watch('book', 'ETH_USDT')
+        await SnapshotCache.get('book', 'ETH_USDT')
+        SnapshotCache.observe('book', 'ETH_USDT', 5)
+        await SnapshotCache.get('book', 'ETH_USDT')
+        self.assertEqual(len(self.builds), 1)
+
+        self.sequence = 6
+        SnapshotCache.observe('book', 'ETH_USDT', 6)
+        self.assertEqual((await SnapshotCache.get('book', 'ETH_USDT'))['sequence'], 6)
+        self.assertEqual(len(self.builds), 2)
+
+    async def test_trades_snapshot_is_rebuilt_after_a_trades_frame(self):
+        SnapshotCache.watch('trades', 'ETH_USDT')
+        self.assertEqual(await SnapshotCache.get('trades', 'ETH_USDT'), [1])
+        self.assertEqual(await SnapshotCache.get('trades', 'ETH_USDT'), [1])
+
+        SnapshotCache.observe('trades', 'ETH_USDT')
+        self.assertEqual(await SnapshotCache.get('trades', 'ETH_USDT'), [2])
+
+    async def test_unwatched_snapshots_are_not_kept(self):
+        await SnapshotCache.get('trades', 'ETH_USDT')
+        await SnapshotCache.get('trades', 'ETH_USDT')
+        self.assertEqual(len(self.builds), 2)
+
+        SnapshotCache.watch('trades', 'ETH_USDT')
+        await SnapshotCache.get('trades', 'ETH_USDT')
+        SnapshotCache.unwatch('trades', 'ETH_USDT')
+        self.assertEqual(SnapshotCache._entries, {})
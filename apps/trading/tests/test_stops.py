@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from apps.trading.models import Order, Trade
+from apps.trading.services import MatchingEngine, StopOrderService
+from apps.trading.services.memory_book import TriggerIndex
+
+from .base import MatchingTestCase
+
+
+class TriggerIndexTests(SimpleTestCase):
+
+    def stop(self, pk, order_type, side, **prices):
+        return Order(pk=pk, order_type=order_type, side=side, quantity=Decimal('1'),
+                     **{name: Decimal(value) for name, value in prices.items()})
+
+    def test_only_crossed_stops_fire(self):
+        index = TriggerIndex()
+        index.add(self.stop(1, Order.OrderType.STOP_LOSS, Order.Side.SELL, stop_price='95'))
+        index.add(self.stop(2, Order.OrderType.STOP_LOSS, Order.Side.SELL, stop_price='90'))
+        index.add(self.stop(3, Order.OrderType.TAKE_PROFIT, Order.Side.SELL, take_profit_price='110'))
+        index.add(self.stop(4, Order.OrderType.STOP_LOSS, Order.Side.BUY, stop_price='105'))
+
+        self.assertEqual([o.pk for o in index.crossed(Decimal('94'), Decimal('100'))], [1])
+        self.assertEqual(sorted(o.pk for o in index.crossed(Decimal('99'), Decimal('110'))), [3, 4])
+        self.assertEqual(list(index.orders), [2])
+
+    def test_removed_stops_never_fire(self):
+        index = TriggerIndex()
+        index.add(self.stop(1, Order.OrderType.STOP_LOSS, Order.Side.SELL, stop_price='95'))
+        index.remove(1)
+
+        self.assertEqual(index.crossed(Decimal('1'), Decimal('1000')), [])
+
+
+class StopOrderTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for price in ('99', '98', '97', '96'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal(price))
+
+    def test_stop_loss_fires_when_a_trade_crosses_it(self):
+        stop = StopOrderService.create_stop_loss_order(self.bob, self.pair, 'sell', Decimal('1'), Decimal('98.5'))
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('1'))
+        self.assertEqual(Order.objects.get(pk=stop.pk).status, Order.Status.PENDING)
+
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('1'))
+
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, Order.Status.FILLED)
+        self.assertIsNotNone(stop.triggered_at)
+        self.assertEqual(list(Trade.objects.filter(seller=self.bob).values_list('price', flat=True)), [Decimal('97')])
+        self.assertNotIn(stop.pk, self.book().triggers)
+
+    def test_take_profit_waits_for_its_price(self):
+        take_profit = StopOrderService.create_take_profit_order(
+            self.bob, self.pair, 'sell', Decimal('1'), Decimal('120')
+        )
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('2'))
+
+        self.assertEqual(Order.objects.get(pk=take_profit.pk).status, Order.Status.PENDING)
+        self.assertIn(take_profit.pk, self.book().triggers)
+
+    def test_oco_stop_leg_cancels_the_limit_leg(self):
+        limit, stop = StopOrderService.create_oco_order(
+            self.bob, self.pair, 'sell', Decimal('1'), Decimal('130'), Decimal('98.5')
+        )
+        self.assertEqual(self.balance(self.bob, self.eth), (Decimal('9'), Decimal('1')))
+
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('2'))
+
+        self.assertEqual(Order.objects.get(pk=limit.pk).status, Order.Status.CANCELLED)
+        self.assertEqual(Order.objects.get(pk=stop.pk).status, Order.Status.FILLED)
+        self.assertEqual(self.balance(self.bob, self.eth), (Decimal('9'), Decimal('0')))
+        self.assertLockedMatchesBook()
+
+    def test_cancelled_stop_leaves_the_index(self):
+        stop = StopOrderService.create_stop_loss_order(self.bob, self.pair, 'sell', Decimal('1'), Decimal('98.5'))
+
+        self.assertTrue(StopOrderService.cancel_stop_order(stop))
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('3'))
+
+        self.assertEqual(Order.objects.get(pk=stop.pk).status, Order.Status.CANCELLED)
+        self.assertEqual(len(self.book().triggers), 0)
+
+    def test_sweep_indexes_stops_created_outside_the_engine(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('1'))
+        stop = Order.objects.create(
+            user=self.bob, trading_pair=self.pair, order_type='stop_loss', side='sell',
+            status=Order.Status.PENDING, quantity=Decimal('0.5'), stop_price=Decimal('150')
+        )
+
+        self.assertEqual(StopOrderService.sweep_stops(self.pair), [stop.pk])
+        self.assertEqual(Order.objects.get(pk=stop.pk).status, Order.Status.FILLED)
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import override_settings
+
+from apps.trading.models import TradingPair
+from apps.trading.routing import websocket_urlpatterns
+from apps.trading.services import MatchingEngine
+from apps.trading.services.market_data import encode_frame
+
+from .base import MatchingTestCase
+
+
+@override_settings(MARKET_DATA_CONFIG={
+    **settings.MARKET_DATA_CONFIG,
+    'DEPTH_INTERVALS_MS': [0], 'TRADE_INTERVAL_MS': 0, 'TICKER_INTERVAL_MS': 0, 'CANDLE_INTERVAL_MS': 0,
+})
+class StreamConsumerTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        TradingPair.objects.create(symbol='BTC_USDT', base_currency='BTC', quote_currency='USDT')
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('99'))
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/stream/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_subscribe_answers_then_sends_snapshots(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({
+            'type': 'subscribe', 'id': 1,
+            'streams': ['book:eth_usdt', 'ticker:BTC_USDT', 'candles:ETH_USDT:1m', 'book:NOPE_USDT', 'bogus'],
+        })
+
+        subscribed = await communicator.receive_json_from()
+        self.assertEqual(subscribed['id'], 1)
+        self.assertEqual(subscribed['streams'], ['book:ETH_USDT', 'ticker:BTC_USDT', 'candles:ETH_USDT:1m'])
+        self.assertEqual(sorted(error['stream'] for error in subscribed['errors']), ['bogus', 'book:NOPE_USDT'])
+
+        book = await communicator.receive_json_from()
+        self.assertEqual((book['type'], book['stream']), ('orderbook_snapshot', 'book:ETH_USDT'))
+        self.assertEqual(book['data']['bids'][0]['price'], '99.00000000')
+        ticker = await communicator.receive_json_from()
+        self.assertEqual((ticker['type'], ticker['stream']), ('ticker_snapshot', 'ticker:BTC_USDT'))
+        # Candle streams have no snapshot
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_frames_carry_their_stream_until_unsubscribed(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'subscribe', 'id': 1, 'streams': ['trades:ETH_USDT', 'trades:BTC_USDT']})
+        await communicator.receive_json_from()
+        await communicator.receive_json_from()
+        await communicator.receive_json_from()
+
+        layer = get_channel_layer()
+        for symbol in ('ETH_USDT', 'BTC_USDT'):
+            frame = encode_frame('trades', {'symbol': symbol, 'trades': []}, f'trades:{symbol}')
+            await layer.group_send(f'trades_{symbol}', dict(frame, type='trades_update', symbol=symbol))
+        streams = {(await communicator.receive_json_from())['stream'] for _ in range(2)}
+        self.assertEqual(streams, {'trades:ETH_USDT', 'trades:BTC_USDT'})
+
+        await communicator.send_json_to({'type': 'unsubscribe', 'id': 2, 'streams': ['trades:BTC_USDT']})
+        self.assertEqual((await communicator.receive_json_from())['streams'], ['trades:BTC_USDT'])
+        frame = encode_frame('trades', {'symbol': 'BTC_USDT', 'trades': []}, 'trades:BTC_USDT')
+        await layer.group_send('trades_BTC_USDT', dict(frame, type='trades_update', symbol='BTC_USDT'))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(MARKET_DATA_CONFIG={**settings.MARKET_DATA_CONFIG, 'MAX_STREAMS_PER_CONNECTION': 1})
+    async def test_stream_limit_is_enforced(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'subscribe', 'id': 7, 'streams': ['trades:ETH_USDT', 'ticker:ETH_USDT']})
+
+        error = await communicator.receive_json_from()
+        self.assertEqual((error['type'], error['id']), ('error', 7))
+        await communicator.disconnect()
+
+    async def test_malformed_requests_get_errors(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'subscribe', 'id': 3, 'streams': 'book:ETH_USDT'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        await communicator.send_json_to({'type': 'publish', 'id': 4})
+        self.assertEqual((await communicator.receive_json_from())['id'], 4)
+        await communicator.disconnect()
+
+    async def test_resync_resends_the_snapshot(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({'type': 'subscribe', 'id': 1, 'streams': ['book:ETH_USDT']})
+        await communicator.receive_json_from()
+        first = await communicator.receive_json_from()
+
+        await database_sync_to_async(MatchingEngine.create_order)(
+            self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('98')
+        )
+        delta = await communicator.receive_json_from()
+        self.assertEqual(delta['type'], 'orderbook_update')
+        await communicator.send_json_to({'type': 'resync', 'streams': ['book:ETH_USDT']})
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'orderbook_snapshot')
+        self.assertGreater(snapshot['data']['sequence'], first['data']['sequence'])
+        await communicator.disconnect()
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.trading.models import Candle
+from apps.trading.services import MatchingEngine
+from apps.trading.services.ticker import RollingTicker, TickerRegistry
+
+from .base import MatchingTestCase
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def minutes(n):
+    return START + timedelta(minutes=n)
+
+
+class RollingTickerTests(SimpleTestCase):
+
+    def test_window_keeps_the_last_24_hours(self):
+        ticker = RollingTicker(1)
+        ticker.add(Decimal('100'), Decimal('1'), minutes(0))
+        ticker.add(Decimal('120'), Decimal('2'), minutes(0))
+        ticker.add(Decimal('90'), Decimal('3'), minutes(60))
+
+        self.assertEqual(ticker.stats(minutes(61)), {
+            'volume': Decimal('6'), 'high': Decimal('120'), 'low': Decimal('90'), 'open': Decimal('100'),
+        })
+        # The first minute (and with it the high) falls out of the window
+        self.assertEqual(ticker.stats(minutes(RollingTicker.WINDOW_MINUTES)), {
+            'volume': Decimal('3'), 'high': Decimal('90'), 'low': Decimal('90'), 'open': Decimal('90'),
+        })
+        self.assertEqual(ticker.stats(minutes(60 + RollingTicker.WINDOW_MINUTES)), {
+            'volume': Decimal('0'), 'high': None, 'low': None, 'open': None,
+        })
+
+    def test_trades_older_than_the_window_are_ignored(self):
+        ticker = RollingTicker(1)
+        ticker.add(Decimal('100'), Decimal('1'), minutes(RollingTicker.WINDOW_MINUTES))
+        ticker.add(Decimal('500'), Decimal('1'), minutes(0))
+
+        self.assertEqual(ticker.stats(minutes(RollingTicker.WINDOW_MINUTES))['high'], Decimal('100'))
+        self.assertEqual(ticker.volume, Decimal('1'))
+
+    def test_apply_to_falls_back_to_the_last_price(self):
+        ticker = RollingTicker(1)
+        pair = mock.Mock(last_price=Decimal('50'), volume_24h=None, high_24h=None, low_24h=None, price_change_24h=None)
+
+        self.assertTrue(ticker.apply_to(pair, minutes(0)))
+        self.assertEqual((pair.volume_24h, pair.high_24h, pair.low_24h, pair.price_change_24h),
+                         (Decimal('0'), Decimal('50'), Decimal('50'), Decimal('0')))
+        self.assertFalse(ticker.apply_to(pair, minutes(1)))
+
+
+class EngineTickerTests(MatchingTestCase):
+
+    def trade(self, price, quantity='1'):
+        MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal(quantity), Decimal(price))
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal(quantity))
+
+    def test_trades_update_the_pair(self):
+        self.trade('100')
+        self.trade('110', '2')
+
+        self.pair.refresh_from_db()
+        self.assertEqual(self.pair.volume_24h, Decimal('3'))
+        self.assertEqual(self.pair.high_24h, Decimal('110'))
+        self.assertEqual(self.pair.low_24h, Decimal('100'))
+        self.assertEqual(self.pair.price_change_24h, Decimal('10.00'))
+
+    def test_rebuild_from_candles_matches_the_resident_ticker(self):
+        self.trade('100')
+        self.trade('110', '2')
+        resident = TickerRegistry.get(self.pair.pk).stats()
+
+        TickerRegistry.clear()
+        self.trade('105')
+
+        rebuilt = TickerRegistry.get(self.pair.pk).stats()
+        self.assertEqual(rebuilt['volume'], resident['volume'] + 1)
+        self.assertEqual((rebuilt['high'], rebuilt['low'], rebuilt['open']),
+                         (resident['high'], resident['low'], resident['open']))
+        self.assertTrue(Candle.objects.filter(trading_pair=self.pair, interval='1m').exists())
+
+    def test_refresh_expires_a_quiet_pair(self):
+        self.trade('100')
+        later = timezone.now() + timedelta(days=1, minutes=1)
+
+        with mock.patch('apps.trading.services.ticker.timezone.now', return_value=later):
+            MatchingEngine.refresh_ticker(self.pair)
+
+        self.pair.refresh_from_db()
+        self.assertEqual(self.pair.volume_24h, Decimal('0'))
+        self.assertEqual(self.pair.high_24h, Decimal('100'))
+        self.assertEqual(self.pair.price_change_24h, Decimal('0'))
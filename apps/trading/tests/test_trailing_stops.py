@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from apps.trading.models import Order
+from apps.trading.services import MatchingEngine, StopOrderService
+from apps.trading.services.memory_book import TrailingStops
+
+from .base import MatchingTestCase
+
+
+class TrailingStopsTests(SimpleTestCase):
+
+    def trailing(self, pk, side, percent, watermark):
+        seen = {'highest_price_seen' if side == Order.Side.SELL else 'lowest_price_seen': Decimal(watermark)}
+        return Order(pk=pk, order_type=Order.OrderType.TRAILING_STOP, side=side, quantity=Decimal('1'),
+                     trailing_stop_percent=Decimal(percent), **seen)
+
+    def test_sell_fires_exactly_at_the_trail_below_its_high(self):
+        stops = TrailingStops(capacity=1)
+        sell = self.trailing(1, Order.Side.SELL, '10', '100')
+        stops.add(sell)
+        stops.add(self.trailing(2, Order.Side.SELL, '50', '100'))
+
+        self.assertEqual(stops.update(Decimal('100'), Decimal('120'), Decimal('120')), [])
+        # 120 * 0.9 = 108: one tick above does not fire, the trail itself does
+        self.assertEqual(stops.update(*[Decimal('108.00000001')] * 3), [])
+        self.assertEqual([o.pk for o in stops.update(*[Decimal('108')] * 3)], [1])
+        self.assertEqual(sell.highest_price_seen, Decimal('120'))
+        self.assertEqual(len(stops), 1)
+
+    def test_buy_fires_exactly_at_the_trail_above_its_low(self):
+        stops = TrailingStops()
+        buy = self.trailing(1, Order.Side.BUY, '10', '100')
+        stops.add(buy)
+
+        self.assertEqual(stops.update(Decimal('80'), Decimal('100'), Decimal('80')), [])
+        # 80 * 1.1 = 88
+        self.assertEqual(stops.update(*[Decimal('87.99999999')] * 3), [])
+        self.assertEqual([o.pk for o in stops.update(*[Decimal('88')] * 3)], [1])
+        self.assertEqual(buy.lowest_price_seen, Decimal('80'))
+
+    def test_orders_are_only_written_on_sync(self):
+        stops = TrailingStops()
+        sell = self.trailing(1, Order.Side.SELL, '5', '100')
+        stops.add(sell)
+
+        stops.update(Decimal('100'), Decimal('130'), Decimal('130'))
+        self.assertEqual(sell.highest_price_seen, Decimal('100'))
+
+        self.assertEqual([o.pk for o in stops.sync()], [1])
+        self.assertEqual(sell.highest_price_seen, Decimal('130'))
+        self.assertEqual(stops.sync(), [])
+
+
+class TrailingStopEngineTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for price in ('101', '102', '103'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal(price))
+        for price in ('99', '98', '97', '96'):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal(price))
+        self.stop = StopOrderService.create_trailing_stop_order(
+            self.bob, self.pair, 'sell', Decimal('1'), Decimal('5'), Decimal('100')
+        )
+
+    @override_settings(MATCHING_ENGINE_CONFIG={**settings.MATCHING_ENGINE_CONFIG, 'TRAILING_CHECKPOINT_SECONDS': 3600})
+    def test_new_highs_are_not_written_per_tick(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'buy', Decimal('3'))
+
+        self.assertEqual(Order.objects.get(pk=self.stop.pk).highest_price_seen, Decimal('100'))
+
+    @override_settings(MATCHING_ENGINE_CONFIG={**settings.MATCHING_ENGINE_CONFIG, 'TRAILING_CHECKPOINT_SECONDS': 0})
+    def test_watermarks_are_checkpointed(self):
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'buy', Decimal('3'))
+
+        self.assertEqual(Order.objects.get(pk=self.stop.pk).highest_price_seen, Decimal('103'))
+
+    def test_fires_once_the_price_falls_by_the_trail(self):
+        # High of 103: the stop fires at or below 97.85
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'buy', Decimal('3'))
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('2'))
+        self.assertEqual(Order.objects.get(pk=self.stop.pk).status, Order.Status.PENDING)
+
+        MatchingEngine.create_order(self.alice, self.pair, 'market', 'sell', Decimal('1'))
+
+        stop = Order.objects.get(pk=self.stop.pk)
+        self.assertEqual(stop.status, Order.Status.FILLED)
+        self.assertEqual(stop.highest_price_seen, Decimal('103'))
@@ -0,0 +1,103 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import transaction
+
+from apps.trading.routing import websocket_urlpatterns
+from apps.trading.services import MatchingEngine
+
+from .base import MatchingTestCase
+from .test_market_data import CaptureLayer
+
+
+class UserEventsTests(MatchingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.layer = CaptureLayer()
+        patcher = mock.patch('apps.trading.services.user_events.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def batches(self, user):
+        return [
+            json.loads(message['text'])['data']['events']
+            for group, message in self.layer.sent if group == f'user_{user.pk}'
+        ]
+
+    def test_cycle_sends_one_batch_per_user(self):
+        maker, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('2'), Decimal('100'))
+        self.layer.sent.clear()
+
+        MatchingEngine.create_order(self.bob, self.pair, 'market', 'buy', Decimal('0.5'))
+
+        [alice_events] = self.batches(self.alice)
+        [bob_events] = self.batches(self.bob)
+        self.assertEqual([event['type'] for event in alice_events],
+                         ['trade_notification', 'order_update', 'balance_update', 'balance_update'])
+        self.assertEqual(alice_events[0]['data']['role'], 'maker')
+        self.assertEqual(alice_events[1]['data']['id'], str(maker.pk))
+        self.assertEqual(Decimal(alice_events[1]['data']['filled_quantity']), Decimal('0.5'))
+        self.assertEqual(bob_events[0]['data']['side'], 'buy')
+        self.assertEqual(bob_events[0]['data']['role'], 'taker')
+
+    def test_order_touched_twice_is_reported_once_in_its_final_state(self):
+        maker, _ = MatchingEngine.create_order(self.alice, self.pair, 'limit', 'sell', Decimal('1'), Decimal('100'))
+        self.layer.sent.clear()
+
+        MatchingEngine.create_order(self.bob, self.pair, 'limit', 'buy', Decimal('1'), Decimal('100'))
+
+        [alice_events] = self.batches(self.alice)
+        updates = [event['data'] for event in alice_events if event['type'] == 'order_update']
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0]['status'], 'filled')
+
+    def test_nothing_is_sent_when_the_transaction_rolls_back(self):
+        self.layer.sent.clear()
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('99'))
+                self.assertEqual(self.layer.sent, [])
+                raise RuntimeError
+
+        self.assertEqual(self.layer.sent, [])
+
+    def test_rejected_order_sends_nothing(self):
+        self.layer.sent.clear()
+
+        with self.assertRaises(ValueError):
+            MatchingEngine.create_order(self.alice, self.pair, 'limit', 'buy', Decimal('500'), Decimal('100'))
+
+        self.assertEqual(self.layer.sent, [])
+
+
+class UserConsumerTests(MatchingTestCase):
+
+    async def test_batch_reaches_the_owner(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/user/')
+        communicator.scope['user'] = self.alice
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'connected')
+
+        order, _ = await database_sync_to_async(MatchingEngine.create_order)(
+            self.alice, self.pair, 'limit', 'buy', Decimal('1'), Decimal('99')
+        )
+        frame = await communicator.receive_json_from()
+        self.assertEqual(frame['type'], 'user_events')
+        events = frame['data']['events']
+        self.assertEqual(events[0], {'type': 'order_update', 'data': mock.ANY})
+        self.assertEqual(events[0]['data']['id'], str(order.pk))
+        self.assertEqual(events[1]['data']['currency'], 'USDT')
+        self.assertEqual(Decimal(events[1]['data']['locked']), Decimal('99'))
+        await communicator.disconnect()
+
+    async def test_anonymous_connection_is_closed(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/user/')
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
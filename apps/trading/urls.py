@@ -2,10 +2,13 @@ from django.urls import path
 from .views import (
     TradingPairListView, TradingPairDetailView,
     OrderBookView,
-    OrderListCreateView, OrderDetailView, OrderCancelView,
+    OrderListCreateView, OrderDetailView, OrderCancelView, OrderAmendView,
+    OrderBatchView, OrderCancelAllView,
     TradeListView, TradeDetailView,
     StopLossOrderView, TakeProfitOrderView, TrailingStopOrderView,
     OCOOrderView, StopOrderListView, CancelStopOrderView,
+    KlineView,
+    StreamMetricsView,
 )
 
 app_name = 'trading'
@@ -20,8 +23,11 @@ urlpatterns = [
     
     # Orders
     path('orders/', OrderListCreateView.as_view(), name='order-list'),
-    path('orders/<uuid:pk>/', OrderDetailView.as_view(), name='order-detail'),
-    path('orders/<uuid:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
+    path('orders/batch/', OrderBatchView.as_view(), name='order-batch'),
+    path('orders/cancel-all/', OrderCancelAllView.as_view(), name='order-cancel-all'),
+    path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('orders/<int:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
+    path('orders/<int:pk>/amend/', OrderAmendView.as_view(), name='order-amend'),
     
     # Stop Orders
     path('orders/stop-loss/', StopLossOrderView.as_view(), name='stop-loss'),
@@ -29,9 +35,15 @@ urlpatterns = [
     path('orders/trailing-stop/', TrailingStopOrderView.as_view(), name='trailing-stop'),
     path('orders/oco/', OCOOrderView.as_view(), name='oco'),
     path('orders/stops/', StopOrderListView.as_view(), name='stop-list'),
-    path('orders/stops/<uuid:order_id>/cancel/', CancelStopOrderView.as_view(), name='cancel-stop'),
+    path('orders/stops/<int:order_id>/cancel/', CancelStopOrderView.as_view(), name='cancel-stop'),
     
     # Trades
     path('trades/', TradeListView.as_view(), name='trade-list'),
-    path('trades/<uuid:pk>/', TradeDetailView.as_view(), name='trade-detail'),
+    path('trades/<int:pk>/', TradeDetailView.as_view(), name='trade-detail'),
+    
+    # Candles
+    path('klines/<str:symbol>/', KlineView.as_view(), name='klines'),
+    
+    # Metrics
+    path('metrics/streams/', StreamMetricsView.as_view(), name='stream-metrics'),
 ]
@@ -5,6 +5,9 @@ from .orders import (
     OrderListCreateView,
     OrderDetailView,
     OrderCancelView,
+    OrderAmendView,
+    OrderBatchView,
+    OrderCancelAllView,
     TradeListView,
     TradeDetailView,
 )
@@ -16,6 +19,8 @@ from .stop_orders import (
     StopOrderListView,
     CancelStopOrderView,
 )
+from .klines import KlineView
+from .metrics import StreamMetricsView
 
 __all__ = [
     'TradingPairListView',
@@ -24,6 +29,9 @@ __all__ = [
     'OrderListCreateView',
     'OrderDetailView',
     'OrderCancelView',
+    'OrderAmendView',
+    'OrderBatchView',
+    'OrderCancelAllView',
     'TradeListView',
     'TradeDetailView',
     'StopLossOrderView',
@@ -32,4 +40,6 @@ __all__ = [
     'OCOOrderView',
     'StopOrderListView',
     'CancelStopOrderView',
+    'KlineView',
+    'StreamMetricsView',
 ]
@@ -0,0 +1,71 @@
+"""
+Kline Views
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.trading.models import TradingPair
+from apps.trading.services.candles import CandleService
+from apps.trading.services.market_data import CANDLE_INTERVALS
+
+
+def _parse_time(value):
+    """Epoch milliseconds or an ISO 8601 datetime (UTC when naive)"""
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+class KlineView(APIView):
+    """
+    OHLCV candles for a trading pair.
+
+    GET /api/v1/trading/klines/ETH_USDT/?interval=1h&start=...&end=...&limit=500
+
+    ``start`` and ``end`` (epoch ms or ISO 8601) bound the candles' open
+    time, both inclusive. Without ``start`` the latest ``limit`` candles
+    are returned. Candles are oldest first.
+    """
+    permission_classes = [AllowAny]
+
+    MAX_LIMIT = 1000
+
+    def get(self, request, symbol):
+        try:
+            trading_pair = TradingPair.objects.get(symbol=symbol.upper(), is_active=True)
+        except TradingPair.DoesNotExist:
+            return Response({'error': 'Trading pair not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        interval = request.query_params.get('interval', '1m')
+        if interval not in CANDLE_INTERVALS:
+            return Response(
+                {'error': f"Unsupported interval. Use one of: {', '.join(CANDLE_INTERVALS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start = request.query_params.get('start')
+            end = request.query_params.get('end')
+            start = _parse_time(start) if start else None
+            end = _parse_time(end) if end else None
+            limit = min(int(request.query_params.get('limit', 500)), self.MAX_LIMIT)
+        except (ValueError, OverflowError):
+            return Response({'error': 'Invalid start, end or limit'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'Invalid start, end or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'symbol': trading_pair.symbol,
+            'interval': interval,
+            'candles': CandleService.klines(trading_pair, interval, start, end, limit),
+        })
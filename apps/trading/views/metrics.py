@@ -0,0 +1,16 @@
+"""
+Trading Metrics Views
+"""
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.trading.services.outbound import StreamMetrics
+
+
+class StreamMetricsView(APIView):
+    """WebSocket fan-out counters and queue depths of the serving process"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(StreamMetrics.snapshot())
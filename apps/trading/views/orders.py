@@ -8,15 +8,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Q
 
+from apps.core.pagination import KeysetPagination
 from apps.trading.models import TradingPair, Order, Trade
 from apps.trading.serializers import (
     TradingPairSerializer,
     OrderSerializer,
     OrderCreateSerializer,
+    OrderBatchSerializer,
+    OrderAmendSerializer,
     TradeSerializer,
     UserTradeSerializer,
 )
-from apps.trading.services import MatchingEngine, OrderBookService
+from apps.trading.services import MatchingClient, MatchingUnavailable, OrderBookService
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +58,7 @@ class OrderBookView(APIView):
 class OrderListCreateView(generics.ListCreateAPIView):
     """List and create orders"""
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -62,14 +66,14 @@ class OrderListCreateView(generics.ListCreateAPIView):
         return OrderSerializer
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.filter(user=self.request.user).select_related('trading_pair')
     
     def create(self, request, *args, **kwargs):
         serializer = OrderCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         try:
-            order, trades = MatchingEngine.create_order(
+            order, trades = MatchingClient.create_order(
                 user=request.user,
                 trading_pair=serializer.validated_data['trading_pair'],
                 order_type=serializer.validated_data['order_type'],
@@ -86,6 +90,104 @@ class OrderListCreateView(generics.ListCreateAPIView):
             }, status=status.HTTP_201_CREATED)
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class OrderBatchView(APIView):
+    """
+    POST /api/v1/trading/orders/batch/
+
+    Place up to ``MAX_BATCH_ORDERS`` market or limit orders on one pair in a
+    single matching cycle:
+
+        {"symbol": "ETH_USDT", "atomic": false, "orders": [
+            {"side": "buy", "price": "1999.5", "quantity": "0.5", "client_order_id": "b1"},
+            ...
+        ]}
+
+    Every order must meet the pair's quantity, price and notional limits,
+    or the whole batch is rejected. Orders are then matched in the given
+    order. By default each order stands alone and one without funds is
+    reported in its ``error`` and not placed; with ``"atomic": true`` such
+    an order rejects the whole batch. The response is 201 when every order
+    was placed, 207 when only some were and 400 when none were.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = OrderBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            results = MatchingClient.create_orders(
+                user=request.user,
+                trading_pair=serializer.validated_data['trading_pair'],
+                orders=serializer.validated_data['orders'],
+                atomic=serializer.validated_data['atomic']
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        rejected = sum(1 for _, _, error in results if error is not None)
+        if not rejected:
+            response_status = status.HTTP_201_CREATED
+        elif rejected < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'results': [
+                {'client_order_id': order.client_order_id, 'error': error} if error is not None
+                else {'order': OrderSerializer(order).data, 'trades': TradeSerializer(trades, many=True).data}
+                for order, trades, error in results
+            ],
+        }, status=response_status)
+
+
+class OrderCancelAllView(APIView):
+    """
+    POST /api/v1/trading/orders/cancel-all/?symbol=ETH_USDT&side=buy
+
+    Cancel all of the user's open and pending stop orders, on one pair or
+    (without ``symbol``) on every pair, optionally only one ``side``. Each
+    pair is cancelled in a single matching cycle.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        symbol = request.query_params.get('symbol') or request.data.get('symbol')
+        side = request.query_params.get('side') or request.data.get('side')
+        if side is not None and side not in Order.Side.values:
+            return Response({'error': 'Invalid side'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if symbol:
+            pairs = list(TradingPair.objects.filter(symbol=symbol.upper()))
+            if not pairs:
+                return Response({'error': 'Trading pair not found'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            pairs = list(TradingPair.objects.filter(
+                orders__user=request.user,
+                orders__status__in=[Order.Status.OPEN, Order.Status.PARTIALLY_FILLED, Order.Status.PENDING]
+            ).distinct())
+
+        cancelled = []
+        try:
+            for pair in pairs:
+                cancelled.extend(MatchingClient.cancel_all(request.user, pair, side=side))
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response({
+            'message': f'{len(cancelled)} orders cancelled',
+            'orders': OrderSerializer(cancelled, many=True).data,
+        })
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -102,21 +204,63 @@ class OrderCancelView(APIView):
     def post(self, request, pk):
         try:
             order = Order.objects.get(id=pk, user=request.user)
-            order = MatchingEngine.cancel_order(order)
+            order = MatchingClient.cancel_order(order)
             return Response({'message': 'Order cancelled', 'order': OrderSerializer(order).data})
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
         except ValueError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class OrderAmendView(APIView):
+    """
+    POST /api/v1/trading/orders/<id>/amend/
+
+    Change the limit price and/or total quantity of a resting order in one
+    step: {"price": "2001.5", "quantity": "0.8"}. Lowering only the
+    quantity keeps the order's queue priority; anything else requeues it,
+    and a new price may match immediately. Only the difference in reserved
+    funds is locked or unlocked.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        serializer = OrderAmendSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            order = Order.objects.select_related('trading_pair').get(id=pk, user=request.user)
+            order, trades = MatchingClient.replace_order(
+                order,
+                price=serializer.validated_data.get('price'),
+                quantity=serializer.validated_data.get('quantity')
+            )
+        except Order.DoesNotExist:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response({
+            'message': 'Order amended',
+            'order': OrderSerializer(order).data,
+            'trades': TradeSerializer(trades, many=True).data,
+        })
 
 
 class TradeListView(generics.ListAPIView):
     serializer_class = TradeSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         symbol = self.request.query_params.get('symbol')
-        queryset = Trade.objects.all().order_by('-created_at')[:100]
+        queryset = Trade.objects.select_related('trading_pair')
         if symbol:
             queryset = queryset.filter(trading_pair__symbol=symbol.upper())
         return queryset
@@ -1,6 +1,7 @@
 """
 Stop Order API Views
 """
+import logging
 from decimal import Decimal, InvalidOperation
 from rest_framework import status
 from rest_framework.views import APIView
@@ -9,9 +10,11 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 
 from apps.trading.models import Order, TradingPair
-from apps.trading.services import StopOrderService
+from apps.trading.services import MatchingUnavailable, StopOrderService
 from apps.trading.serializers import OrderSerializer
 
+logger = logging.getLogger(__name__)
+
 
 class StopLossOrderView(APIView):
     permission_classes = [IsAuthenticated]
@@ -44,6 +47,9 @@ class StopLossOrderView(APIView):
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         except (InvalidOperation, ValueError) as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 class TakeProfitOrderView(APIView):
@@ -77,6 +83,9 @@ class TakeProfitOrderView(APIView):
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         except (InvalidOperation, ValueError) as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 class TrailingStopOrderView(APIView):
@@ -113,6 +122,9 @@ class TrailingStopOrderView(APIView):
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         except (InvalidOperation, ValueError) as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 class OCOOrderView(APIView):
@@ -151,6 +163,9 @@ class OCOOrderView(APIView):
             }, status=status.HTTP_201_CREATED)
         except (InvalidOperation, ValueError) as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
 class StopOrderListView(APIView):
@@ -176,6 +191,10 @@ class CancelStopOrderView(APIView):
         if not order.is_stop_order:
             return Response({'error': 'Not a stop order'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if StopOrderService.cancel_stop_order(order):
-            return Response({'message': 'Order cancelled'})
+        try:
+            if StopOrderService.cancel_stop_order(order):
+                return Response({'message': 'Order cancelled'})
+        except MatchingUnavailable as e:
+            logger.error(str(e))
+            return Response({'error': 'Matching engine unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         return Response({'error': 'Cannot cancel order'}, status=status.HTTP_400_BAD_REQUEST)
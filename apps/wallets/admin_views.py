@@ -10,6 +10,7 @@ from django.contrib.auth import get_user_model
 
 from .models import Currency, Withdrawal
 from .services.ledger import LedgerService
+from .services.system_accounts import SystemAccountService
 from .serializers import WithdrawalSerializer
 
 User = get_user_model()
@@ -82,6 +83,21 @@ class AdminBalanceAdjustmentView(APIView):
             )
 
 
+class AdminSystemBalanceView(APIView):
+    """
+    GET /api/v1/wallets/admin/system-balances/
+
+    Fee and treasury balances per currency, summed over their shards.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            account: {symbol: str(total) for symbol, total in totals.items()}
+            for account, totals in SystemAccountService.balances().items()
+        })
+
+
 class AdminWithdrawalListView(APIView):
     """
     GET /api/v1/wallets/admin/withdrawals/
@@ -7,4 +7,5 @@ class WalletsConfig(AppConfig):
     verbose_name = 'Wallets & Balances'
 
     def ready(self):
-        pass
\ No newline at end of file
+        """Import signals when app is ready."""
+        from apps.wallets import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Management command to reconcile balances and system accounts against the ledger.
+
+Usage:
+    python manage.py reconcile_ledger
+    python manage.py reconcile_ledger --workers 8 --chunk-size 100000 --output discrepancies.csv
+"""
+
+import csv
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.wallets.models import Currency
+from apps.wallets.services.reconciliation import LedgerReconciliation
+
+
+class Command(BaseCommand):
+    help = 'Check that every balance, and every system account, equals the sum of its ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes reconciling user ranges in parallel (default: CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help='Ledger entries fetched and aggregated per chunk')
+        parser.add_argument('--output', help='Also write the discrepancies to this CSV file')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        discrepancies = LedgerReconciliation.reconcile(
+            workers=options['workers'], chunk_size=options['chunk_size']
+        )
+        system = LedgerReconciliation.reconcile_system()
+        elapsed = time.monotonic() - started
+
+        symbols = dict(Currency.objects.values_list('pk', 'symbol'))
+        emails = dict(get_user_model().objects.filter(
+            pk__in={item['user_id'] for item in discrepancies}
+        ).values_list('pk', 'email'))
+        rows = sorted(
+            (
+                emails.get(item['user_id'], item['user_id']), symbols.get(item['currency_id'], item['currency_id']),
+                item['balance'], item['ledger'], item['difference'],
+            )
+            for item in discrepancies
+        ) + sorted(
+            (
+                f"system:{item['account']}", symbols.get(item['currency_id'], item['currency_id']),
+                item['balance'], item['ledger'], item['difference'],
+            )
+            for item in system
+        )
+
+        for email, symbol, balance, ledger, difference in rows:
+            self.stdout.write(f"{email} {symbol}: balance {balance}, ledger {ledger}, difference {difference}")
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['user', 'currency', 'balance', 'ledger', 'difference'])
+                writer.writerows(rows)
+
+        if rows:
+            raise CommandError(f"{len(rows)} balances do not match the ledger ({elapsed:.1f}s)")
+        self.stdout.write(self.style.SUCCESS(f"All balances match the ledger ({elapsed:.1f}s)"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0002_p2ptransfer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='reference_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
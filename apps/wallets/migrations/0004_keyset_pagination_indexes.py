@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_ledgerentry_reference_id_char'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ledgerentry',
+            name='wallets_led_user_id_345d8e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='wallets_dep_user_id_868d7b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='wallets_led_user_id_fa6961_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['user', 'currency', '-created_at', '-id'], name='wallets_led_user_id_e7dc0b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='wallets_wit_user_id_b81a60_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:40
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemBalance',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account', models.CharField(choices=[('fee', 'Fees'), ('treasury', 'Treasury')], max_length=20)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=18, default=Decimal('0'), max_digits=36)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='system_balances', to='wallets.currency')),
+            ],
+            options={
+                'verbose_name': 'System Balance',
+                'verbose_name_plural': 'System Balances',
+                'unique_together': {('account', 'currency', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def open_system_ledger(apps, schema_editor):
+    """One opening entry per system account and currency, so entries match the shards"""
+    SystemBalance = apps.get_model('wallets', 'SystemBalance')
+    SystemLedgerEntry = apps.get_model('wallets', 'SystemLedgerEntry')
+    totals = SystemBalance.objects.values('account', 'currency_id').annotate(total=Sum('amount'))
+    SystemLedgerEntry.objects.bulk_create([
+        SystemLedgerEntry(
+            account=row['account'], currency_id=row['currency_id'], entry_type='opening',
+            amount=row['total'], description='Balance before the system ledger'
+        )
+        for row in totals if row['total']
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0006_balancecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('account', models.CharField(choices=[('fee', 'Fees'), ('treasury', 'Treasury')], max_length=20)),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening Balance'), ('fee', 'Trading Fee'), ('admin_credit', 'Admin Credit'), ('admin_debit', 'Admin Debit')], max_length=30)),
+                ('amount', models.DecimalField(decimal_places=18, max_digits=36)),
+                ('reference_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('reference_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('currency', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='system_ledger_entries', to='wallets.currency')),
+            ],
+            options={
+                'verbose_name': 'System Ledger Entry',
+                'verbose_name_plural': 'System Ledger Entries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['account', 'currency', '-created_at'], name='wallets_sys_account_38cd96_idx'), models.Index(fields=['reference_type', 'reference_id'], name='wallets_sys_referen_028445_idx')],
+            },
+        ),
+        migrations.RunPython(open_system_ledger, migrations.RunPython.noop),
+    ]
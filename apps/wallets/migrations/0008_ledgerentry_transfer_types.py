@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0007_systemledgerentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='entry_type',
+            field=models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('trade_buy', 'Trade Buy'), ('trade_sell', 'Trade Sell'), ('fee', 'Trading Fee'), ('order_lock', 'Order Lock'), ('order_unlock', 'Order Unlock'), ('admin_credit', 'Admin Credit'), ('admin_debit', 'Admin Debit'), ('p2p_send', 'Transfer Sent'), ('p2p_receive', 'Transfer Received')], max_length=30),
+        ),
+    ]
@@ -180,6 +180,8 @@ class LedgerEntry(models.Model):
         ('order_unlock', 'Order Unlock'),
         ('admin_credit', 'Admin Credit'),
         ('admin_debit', 'Admin Debit'),
+        ('p2p_send', 'Transfer Sent'),
+        ('p2p_receive', 'Transfer Received'),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -205,7 +207,7 @@ class LedgerEntry(models.Model):
 
     # Reference to related object
     reference_type = models.CharField(max_length=50, blank=True, null=True)
-    reference_id = models.UUIDField(blank=True, null=True)
+    reference_id = models.CharField(max_length=64, blank=True, null=True)
 
     description = models.TextField(blank=True, null=True)
 
@@ -225,14 +227,137 @@ class LedgerEntry(models.Model):
         verbose_name_plural = 'Ledger Entries'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'currency']),
+            # Keyset-paginated history, optionally per currency
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', 'currency', '-created_at', '-id']),
             models.Index(fields=['reference_type', 'reference_id']),
+            # Day-range scans of the balance checkpoint job
+            models.Index(fields=['created_at']),
         ]
 
     def __str__(self):
         return f"{self.user.email} - {self.entry_type} - {self.amount} {self.currency.symbol}"
 
 
+class BalanceCheckpoint(models.Model):
+    """
+    Balance (available + locked) of a user in a currency at the end of a
+    UTC day, written for days the user had ledger activity in that currency.
+
+    The balance at any time is the latest checkpoint before it plus the
+    ledger entries since, so history queries never scan from the first entry.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='balance_checkpoints'
+    )
+    currency = models.ForeignKey(
+        Currency,
+        on_delete=models.PROTECT,
+        related_name='balance_checkpoints'
+    )
+    day = models.DateField()
+    balance = models.DecimalField(max_digits=36, decimal_places=18)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Balance Checkpoint'
+        verbose_name_plural = 'Balance Checkpoints'
+        unique_together = ['user', 'currency', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.currency.symbol} on {self.day}: {self.balance}"
+
+
+class SystemBalance(models.Model):
+    """
+    One shard of an exchange-owned balance (collected fees, treasury).
+
+    Postings add to a randomly picked shard so that concurrent transactions
+    rarely wait on the same row; consolidation periodically folds the shards
+    into the canonical row (shard 0). The balance of an account is the sum
+    of all its rows.
+    """
+
+    class Account(models.TextChoices):
+        FEE = 'fee', 'Fees'
+        TREASURY = 'treasury', 'Treasury'
+
+    CANONICAL_SHARD = 0
+
+    id = models.BigAutoField(primary_key=True)
+    account = models.CharField(max_length=20, choices=Account.choices)
+    currency = models.ForeignKey(
+        Currency,
+        on_delete=models.PROTECT,
+        related_name='system_balances'
+    )
+    shard = models.PositiveSmallIntegerField(default=CANONICAL_SHARD)
+    # Signed: the treasury funds admin credits and may run negative
+    amount = models.DecimalField(max_digits=36, decimal_places=18, default=Decimal('0'))
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'System Balance'
+        verbose_name_plural = 'System Balances'
+        unique_together = ['account', 'currency', 'shard']
+
+    def __str__(self):
+        return f"{self.account} #{self.shard} - {self.currency.symbol}: {self.amount}"
+
+
+class SystemLedgerEntry(models.Model):
+    """
+    Immutable ledger of the system accounts: one entry per fee or treasury
+    posting, referencing the trade or user ledger entry behind it. The
+    entries of an account add up to the sum of its ``SystemBalance`` shards.
+    """
+
+    ENTRY_TYPES = [
+        ('opening', 'Opening Balance'),
+        ('fee', 'Trading Fee'),
+        ('admin_credit', 'Admin Credit'),
+        ('admin_debit', 'Admin Debit'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    account = models.CharField(max_length=20, choices=SystemBalance.Account.choices)
+    currency = models.ForeignKey(
+        Currency,
+        on_delete=models.PROTECT,
+        related_name='system_ledger_entries'
+    )
+    entry_type = models.CharField(max_length=30, choices=ENTRY_TYPES)
+    # Signed, like the account it is posted to
+    amount = models.DecimalField(max_digits=36, decimal_places=18)
+
+    reference_type = models.CharField(max_length=50, blank=True, null=True)
+    reference_id = models.CharField(max_length=64, blank=True, null=True)
+    description = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'System Ledger Entry'
+        verbose_name_plural = 'System Ledger Entries'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['account', 'currency', '-created_at']),
+            models.Index(fields=['reference_type', 'reference_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.account} - {self.entry_type} - {self.amount} {self.currency.symbol}"
+
+
 class Deposit(models.Model):
     """
     Incoming deposit records.
@@ -285,6 +410,9 @@ class Deposit(models.Model):
         verbose_name_plural = 'Deposits'
         unique_together = ['tx_hash', 'chain_id']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.amount} {self.currency.symbol} - {self.status}"
@@ -353,6 +481,9 @@ class Withdrawal(models.Model):
         verbose_name = 'Withdrawal'
         verbose_name_plural = 'Withdrawals'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.amount} {self.currency.symbol} to {self.to_address[:10]}... - {self.status}"
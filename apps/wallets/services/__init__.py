@@ -1,2 +1,4 @@
 """Wallet services."""
-from .ledger import LedgerService
\ No newline at end of file
+from .balance_cache import BalanceCache
+from .ledger import LedgerService, Posting
+from .system_accounts import SystemAccountService
\ No newline at end of file
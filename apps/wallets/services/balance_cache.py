@@ -0,0 +1,164 @@
+"""
+Balance Cache
+=============
+Read-through cache of user balances, so wallet pages and pollers are
+served without queries or row locks.
+
+Each (user, currency) balance is one cache entry holding its available and
+locked amounts and ``Balance.version``. Whoever changes a balance refreshes
+its entry once the transaction commits: the ledger for its bulk postings,
+and the ``post_save`` signal for everything else. An entry is only replaced
+by one with the same or a higher version, so a late refresh from an older
+transaction cannot overwrite a newer balance; entries also expire after
+``LEDGER_CONFIG['BALANCE_CACHE_TIMEOUT']`` seconds as a backstop. Misses
+are filled with one query, and currencies without a balance row are
+cached as zero (version 0). The currency list is cached alongside and
+dropped whenever a currency is saved.
+
+Entries live in the default Django cache, and only when it is
+django-redis: each entry is a Redis hash replaced in a WATCH/MULTI
+transaction that is retried if a concurrent refresh touched the same keys,
+so the version check and the write are one atomic step across processes.
+Any other backend bypasses the cache and every read goes to the database.
+The matching engine, Celery workers and web processes all settle balances,
+so a per-process cache (locmem) would serve balances other processes have
+changed, and backends without a compare-and-set could let an older
+refresh win.
+"""
+
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+try:
+    from django_redis import get_redis_connection
+    from django_redis.cache import RedisCache
+    from redis.exceptions import WatchError
+except ImportError:  # optional; the production cache backend
+    RedisCache = None
+
+from apps.wallets.models import Balance, Currency
+
+KEY = 'wallets:balance:{user_id}:{currency_id}'
+CURRENCIES_KEY = 'wallets:currencies'
+
+ZERO = Decimal('0')
+
+
+class BalanceCache:
+    """Version-checked per-user balance cache"""
+
+    @staticmethod
+    def _shared():
+        """Whether the default cache is django-redis, the one backend the cache is used with"""
+        return RedisCache is not None and isinstance(caches['default'], RedisCache)
+
+    @staticmethod
+    def _timeout():
+        return settings.LEDGER_CONFIG['BALANCE_CACHE_TIMEOUT']
+
+    @staticmethod
+    def _key(user_id, currency_id):
+        return KEY.format(user_id=user_id, currency_id=currency_id)
+
+    @staticmethod
+    def _entry(available, locked, version):
+        return {'available': str(available), 'locked': str(locked), 'version': version}
+
+    @classmethod
+    def currencies(cls):
+        """Every currency as ``[{'id', 'symbol', 'name', 'is_active'}]``, ordered by symbol"""
+        currencies = cache.get(CURRENCIES_KEY) if cls._shared() else None
+        if currencies is None:
+            currencies = list(Currency.objects.order_by('symbol').values('id', 'symbol', 'name', 'is_active'))
+            if cls._shared():
+                cache.set(CURRENCIES_KEY, currencies, cls._timeout())
+        return currencies
+
+    @classmethod
+    def get_many(cls, user_id, currency_ids):
+        """``{currency_id: {'available', 'locked', 'version'}}`` for ``user_id``"""
+        keys = {cls._key(user_id, currency_id): currency_id for currency_id in currency_ids}
+        found = cls._read(list(keys)) if cls._shared() else {}
+        result = {keys[key]: entry for key, entry in found.items()}
+
+        missing = [currency_id for currency_id in currency_ids if currency_id not in result]
+        if missing:
+            rows = Balance.objects.filter(user_id=user_id, currency_id__in=missing).values_list(
+                'currency_id', 'available', 'locked', 'version'
+            )
+            loaded = {currency_id: cls._entry(ZERO, ZERO, 0) for currency_id in missing}
+            for currency_id, available, locked, version in rows:
+                loaded[currency_id] = cls._entry(available, locked, version)
+            # Never overwrites an entry refreshed since the read
+            cls.refresh({(user_id, currency_id): entry for currency_id, entry in loaded.items()})
+            result.update(loaded)
+
+        return {
+            currency_id: {
+                'available': Decimal(entry['available']),
+                'locked': Decimal(entry['locked']),
+                'version': entry['version'],
+            }
+            for currency_id, entry in result.items()
+        }
+
+    @classmethod
+    def get(cls, user_id, currency_id):
+        return cls.get_many(user_id, [currency_id])[currency_id]
+
+    @classmethod
+    def _read(cls, keys):
+        """Cached entries among ``keys``, by key"""
+        pipe = get_redis_connection('default').pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return {
+            key: {
+                'available': fields[b'available'].decode(),
+                'locked': fields[b'locked'].decode(),
+                'version': int(fields[b'version']),
+            }
+            for key, fields in zip(keys, pipe.execute()) if fields
+        }
+
+    @classmethod
+    def refresh(cls, entries):
+        """Store ``{(user_id, currency_id): entry}`` unless a newer version is cached"""
+        if not cls._shared() or not entries:
+            return
+        keys = {cls._key(*key): entry for key, entry in entries.items()}
+        with get_redis_connection('default').pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(*keys)
+                    versions = [pipe.hget(key, 'version') for key in keys]
+                    pipe.multi()
+                    for (key, entry), version in zip(keys.items(), versions):
+                        if version is None or int(version) <= entry['version']:
+                            pipe.hset(key, mapping=entry)
+                            pipe.expire(key, cls._timeout())
+                    pipe.execute()
+                    return
+                except WatchError:
+                    # Another refresh wrote one of the keys: compare again
+                    continue
+
+    @classmethod
+    def refresh_on_commit(cls, balances):
+        """Refresh the entries of ``balances`` as they are now, once the transaction commits"""
+        if not cls._shared():
+            return
+        entries = {
+            (balance.user_id, balance.currency_id): cls._entry(balance.available, balance.locked, balance.version)
+            for balance in balances
+        }
+        transaction.on_commit(partial(cls.refresh, entries))
+
+    @classmethod
+    def invalidate_currencies(cls):
+        if cls._shared():
+            transaction.on_commit(partial(cache.delete, CURRENCIES_KEY))
@@ -0,0 +1,157 @@
+"""
+Balance Checkpoints
+===================
+End-of-day balances per (user, currency), so "balance as of T" and daily
+statements start from the nearest checkpoint instead of the first ledger
+entry.
+
+A balance here is available + locked: the running sum of ledger entries
+other than order locks and unlocks, which only move funds within a balance
+(the same rule ``reconcile_ledger`` checks).
+
+``checkpoint_day`` reads only the entries of one UTC day, grouped by
+(user, currency) in SQL, and adds each group to the latest checkpoint
+before that day; pairs without activity that day keep their older
+checkpoint. ``checkpoint_pending`` runs it for every day with entries since
+the last one checkpointed, so the periodic task is incremental, and only
+days that ended ``LEDGER_CONFIG['CHECKPOINT_DELAY_SECONDS']`` ago are checkpointed.
+"""
+
+import logging
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.wallets.models import BalanceCheckpoint, LedgerEntry
+from apps.wallets.services.reconciliation import TRANSFER_TYPES
+
+logger = logging.getLogger('apps.wallets')
+
+ZERO = Decimal('0')
+
+
+def _midnight(day):
+    """Start of UTC date ``day``"""
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _entries():
+    return LedgerEntry.objects.exclude(entry_type__in=TRANSFER_TYPES)
+
+
+class BalanceCheckpointService:
+    """Daily balance checkpoints and the history queries built on them"""
+
+    @staticmethod
+    def last_day():
+        """Latest checkpointed day, or None before the first run"""
+        return BalanceCheckpoint.objects.aggregate(day=Max('day'))['day']
+
+    @staticmethod
+    def checkpoint_day(day):
+        """Write the checkpoints of UTC date ``day``; returns how many"""
+        previous = BalanceCheckpoint.objects.filter(
+            user_id=OuterRef('user_id'), currency_id=OuterRef('currency_id'), day__lt=day
+        ).order_by('-day').values('balance')[:1]
+
+        groups = _entries().filter(
+            created_at__gte=_midnight(day), created_at__lt=_midnight(day + timedelta(days=1))
+        ).values('user_id', 'currency_id').annotate(delta=Sum('amount'), previous=Subquery(previous))
+
+        checkpoints = [
+            BalanceCheckpoint(
+                user_id=group['user_id'],
+                currency_id=group['currency_id'],
+                day=day,
+                balance=(group['previous'] or ZERO) + group['delta'],
+            )
+            for group in groups
+        ]
+
+        with transaction.atomic():
+            BalanceCheckpoint.objects.filter(day=day).delete()
+            BalanceCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+        return len(checkpoints)
+
+    @classmethod
+    def checkpoint_pending(cls):
+        """Checkpoint every finished day with entries since the last checkpoint; returns the days done"""
+        delay = timedelta(seconds=settings.LEDGER_CONFIG['CHECKPOINT_DELAY_SECONDS'])
+        # Last day whose end is at least ``delay`` ago
+        last = (timezone.now() - delay).astimezone(dt_timezone.utc).date() - timedelta(days=1)
+
+        # Only days with entries get checkpoints, so quiet days are skipped
+        # rather than left as a gap the next run would scan again
+        entries = _entries().filter(created_at__lt=_midnight(last + timedelta(days=1)))
+        previous = cls.last_day()
+        if previous is not None:
+            entries = entries.filter(created_at__gte=_midnight(previous + timedelta(days=1)))
+        days = entries.annotate(
+            day=TruncDate('created_at', tzinfo=dt_timezone.utc)
+        ).values_list('day', flat=True).distinct().order_by('day')
+
+        done = 0
+        for day in days:
+            count = cls.checkpoint_day(day)
+            logger.info(f"Wrote {count} balance checkpoints for {day}")
+            done += 1
+        return done
+
+    @classmethod
+    def balance_at(cls, user, currency, at):
+        """Balance (available + locked) of ``user`` in ``currency`` at time ``at``, inclusive"""
+        return cls._balance(user, currency, at, 'lte')
+
+    @staticmethod
+    def _balance(user, currency, moment, lookup):
+        # Checkpoints of days ending at or before ``moment``
+        checkpoint = BalanceCheckpoint.objects.filter(
+            user=user, currency=currency, day__lt=moment.astimezone(dt_timezone.utc).date()
+        ).order_by('-day').values_list('day', 'balance').first()
+
+        entries = _entries().filter(user=user, currency=currency, **{f'created_at__{lookup}': moment})
+        balance = ZERO
+        if checkpoint is not None:
+            entries = entries.filter(created_at__gte=_midnight(checkpoint[0] + timedelta(days=1)))
+            balance = checkpoint[1]
+        return balance + (entries.aggregate(total=Sum('amount'))['total'] or ZERO)
+
+    @classmethod
+    def daily_balances(cls, user, currency, start, end):
+        """
+        Closing balance of every UTC day from ``start`` to ``end`` inclusive,
+        as ``(opening balance, [(day, closing balance), ...])``
+        """
+        opening = cls._balance(user, currency, _midnight(start), 'lt')
+
+        # Checkpointed days carry the last checkpoint forward; later days add up their entries
+        last = cls.last_day() or start - timedelta(days=1)
+        closes = dict(BalanceCheckpoint.objects.filter(
+            user=user, currency=currency, day__gte=start, day__lte=min(end, last)
+        ).values_list('day', 'balance'))
+        deltas = {}
+        if end > last:
+            deltas = dict(_entries().filter(
+                user=user, currency=currency,
+                created_at__gte=_midnight(max(start, last + timedelta(days=1))),
+                created_at__lt=_midnight(end + timedelta(days=1)),
+            ).annotate(day=TruncDate('created_at', tzinfo=dt_timezone.utc)).values('day').annotate(
+                total=Sum('amount')
+            ).values_list('day', 'total'))
+
+        days = []
+        balance = opening
+        day = start
+        while day <= end:
+            if day <= last:
+                balance = closes.get(day, balance)
+            else:
+                balance += deltas.get(day, ZERO)
+            days.append((day, balance))
+            day += timedelta(days=1)
+        return opening, days
@@ -6,6 +6,12 @@ All balance changes go through this service to ensure:
 1. Atomic transactions
 2. Complete audit trail
 3. Proper balance validation
+
+Multi-leg operations (trade settlement, user-to-user transfers via
+``transfer``) post all their legs with ``post_batch``: the affected
+balances are locked in one query, in (user, currency) order, every leg is
+validated in memory and the result is written with one bulk update and
+one bulk insert, instead of one lock-and-insert round-trip per leg.
 """
 
 import logging
@@ -13,12 +19,67 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 
-from apps.wallets.models import Currency, Balance, LedgerEntry, Deposit, Withdrawal
+from apps.wallets.models import Currency, Balance, LedgerEntry, Deposit, Withdrawal, SystemBalance, SystemLedgerEntry
+from apps.wallets.services.balance_cache import BalanceCache
+from apps.wallets.services.system_accounts import SystemAccountService
 from apps.accounts.models import User
 
 logger = logging.getLogger('apps.wallets')
 
 
+def _publish_balance(balance, currency):
+    """Push the new balance to its owner once the transaction commits"""
+    from apps.trading.services.user_events import UserEventBatch
+
+    events = UserEventBatch()
+    events.balance(balance, currency.symbol)
+    events.publish_on_commit()
+
+
+class Posting:
+    """
+    One leg of a ``LedgerService.post_batch`` call.
+
+    ``kind`` is what the leg does to the balance:
+
+        credit      available += amount
+        debit       available -= amount
+        lock        available -> locked
+        unlock      locked -> available
+        deduct      locked -= amount
+
+    ``user`` and ``currency`` may be model instances or primary keys.
+    """
+
+    KINDS = ('credit', 'debit', 'lock', 'unlock', 'deduct')
+    DEFAULT_ENTRY_TYPES = {'lock': 'order_lock', 'unlock': 'order_unlock'}
+
+    __slots__ = (
+        'user_id', 'currency_id', 'kind', 'amount', 'entry_type',
+        'description', 'reference_type', 'reference_id', 'created_by',
+    )
+
+    def __init__(self, user, currency, kind, amount, entry_type=None, description=None,
+                 reference_type=None, reference_id=None, created_by=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown posting kind {kind}")
+        self.user_id = getattr(user, 'pk', user)
+        self.currency_id = getattr(currency, 'pk', currency)
+        self.kind = kind
+        self.amount = Decimal(str(amount))
+        self.entry_type = entry_type or self.DEFAULT_ENTRY_TYPES.get(kind)
+        if self.entry_type is None:
+            raise ValueError(f"A {kind} posting needs an entry type")
+        self.description = description
+        self.reference_type = reference_type
+        self.reference_id = reference_id
+        self.created_by = created_by
+
+    @property
+    def key(self):
+        return self.user_id, self.currency_id
+
+
 class LedgerService:
     """
     Service for managing internal ledger operations.
@@ -94,6 +155,7 @@ class LedgerService:
         balance.available += amount
         balance.version += 1
         balance.save()
+        _publish_balance(balance, currency)
 
         # Create ledger entry
         ledger_entry = LedgerEntry.objects.create(
@@ -168,6 +230,7 @@ class LedgerService:
         balance.available -= amount
         balance.version += 1
         balance.save()
+        _publish_balance(balance, currency)
 
         # Create ledger entry (negative amount for debit)
         ledger_entry = LedgerEntry.objects.create(
@@ -231,6 +294,7 @@ class LedgerService:
         balance.locked += amount
         balance.version += 1
         balance.save()
+        _publish_balance(balance, currency)
 
         ledger_entry = LedgerEntry.objects.create(
             user=user,
@@ -293,6 +357,7 @@ class LedgerService:
         balance.available += amount
         balance.version += 1
         balance.save()
+        _publish_balance(balance, currency)
 
         ledger_entry = LedgerEntry.objects.create(
             user=user,
@@ -355,6 +420,7 @@ class LedgerService:
         balance.locked -= amount
         balance.version += 1
         balance.save()
+        _publish_balance(balance, currency)
 
         ledger_entry = LedgerEntry.objects.create(
             user=user,
@@ -375,6 +441,154 @@ class LedgerService:
 
         return balance, ledger_entry
 
+    @staticmethod
+    @transaction.atomic
+    def post_batch(postings, publish=True) -> tuple[list[Balance], list[LedgerEntry]]:
+        """
+        Apply several postings atomically, in order.
+
+        Every affected balance is locked once, in (user, currency) order so
+        concurrent batches cannot deadlock, and each leg is checked against
+        the balance as left by the legs before it. Nothing is written unless
+        all legs are valid.
+
+        Args:
+            postings: ``Posting`` legs
+            publish: Push the new balances to their owners after commit
+
+        Returns:
+            Tuple of (changed Balances, LedgerEntries in posting order)
+
+        Raises:
+            ValueError: If a leg has a non-positive amount or would overdraw
+        """
+        if not postings:
+            return [], []
+
+        for posting in postings:
+            if posting.amount <= 0:
+                raise ValueError(f"{posting.kind.capitalize()} amount must be positive")
+
+        balances = LedgerService._lock_balances({posting.key for posting in postings})
+        entries = []
+
+        for posting in postings:
+            balance = balances[posting.key]
+            amount = posting.amount
+
+            if posting.kind in ('debit', 'lock') and balance.available < amount:
+                raise ValueError(
+                    f"Insufficient balance. Available: {balance.available}, "
+                    f"Required: {amount}"
+                )
+            if posting.kind in ('unlock', 'deduct') and balance.locked < amount:
+                raise ValueError(
+                    f"Insufficient locked balance. Locked: {balance.locked}, "
+                    f"Required: {amount}"
+                )
+
+            before = balance.total if posting.kind == 'deduct' else balance.available
+            if posting.kind == 'credit':
+                balance.available += amount
+            elif posting.kind == 'debit':
+                balance.available -= amount
+            elif posting.kind == 'lock':
+                balance.available -= amount
+                balance.locked += amount
+            elif posting.kind == 'unlock':
+                balance.locked -= amount
+                balance.available += amount
+            else:
+                balance.locked -= amount
+            after = balance.total if posting.kind == 'deduct' else balance.available
+
+            entries.append(LedgerEntry(
+                user_id=posting.user_id,
+                currency_id=posting.currency_id,
+                entry_type=posting.entry_type,
+                amount=amount if posting.kind in ('credit', 'unlock') else -amount,
+                balance_before=before,
+                balance_after=after,
+                description=posting.description,
+                reference_type=posting.reference_type,
+                reference_id=posting.reference_id,
+                created_by=posting.created_by
+            ))
+
+        now = timezone.now()
+        changed = list(balances.values())
+        for balance in changed:
+            balance.version += 1
+            balance.updated_at = now
+        Balance.objects.bulk_update(changed, ['available', 'locked', 'version', 'updated_at'])
+        LedgerEntry.objects.bulk_create(entries)
+        BalanceCache.refresh_on_commit(changed)
+
+        if publish:
+            from apps.trading.services.user_events import UserEventBatch
+
+            symbols = dict(Currency.objects.filter(
+                pk__in={balance.currency_id for balance in changed}
+            ).values_list('pk', 'symbol'))
+            events = UserEventBatch()
+            for balance in changed:
+                events.balance(balance, symbols[balance.currency_id])
+            events.publish_on_commit()
+
+        logger.debug(f"Posted {len(entries)} ledger entries on {len(changed)} balances")
+
+        return changed, entries
+
+    @staticmethod
+    def transfer(
+            sender: User,
+            recipient: User,
+            currency: Currency,
+            amount: Decimal,
+            reference_type: str = None,
+            reference_id: str = None
+    ) -> tuple[list[Balance], list[LedgerEntry]]:
+        """
+        Move ``amount`` of available balance from ``sender`` to ``recipient``
+        as one ``post_batch``: a ``p2p_send`` and a ``p2p_receive`` entry.
+
+        Returns:
+            Tuple of (changed Balances, [send entry, receive entry])
+
+        Raises:
+            ValueError: If the amount is not positive or the sender lacks it
+        """
+        return LedgerService.post_batch([
+            Posting(sender, currency, 'debit', amount, entry_type='p2p_send',
+                    description=f'P2P transfer to {recipient.email or recipient.username}',
+                    reference_type=reference_type, reference_id=reference_id),
+            Posting(recipient, currency, 'credit', amount, entry_type='p2p_receive',
+                    description=f'P2P transfer from {sender.email or sender.username}',
+                    reference_type=reference_type, reference_id=reference_id),
+        ])
+
+    @staticmethod
+    def _lock_balances(keys):
+        """Lock the (user_id, currency_id) balances in ``keys``, creating missing ones"""
+        user_ids = sorted({user_id for user_id, _ in keys})
+        currency_ids = sorted({currency_id for _, currency_id in keys})
+
+        def select():
+            rows = Balance.objects.select_for_update().filter(
+                user_id__in=user_ids, currency_id__in=currency_ids
+            ).order_by('user_id', 'currency_id')
+            return {(b.user_id, b.currency_id): b for b in rows if (b.user_id, b.currency_id) in keys}
+
+        balances = select()
+        missing = keys - balances.keys()
+        if missing:
+            Balance.objects.bulk_create(
+                [Balance(user_id=user_id, currency_id=currency_id) for user_id, currency_id in missing],
+                ignore_conflicts=True
+            )
+            balances = select()
+        return balances
+
     @staticmethod
     @transaction.atomic
     def process_deposit(deposit: Deposit) -> tuple[Balance, LedgerEntry]:
@@ -526,6 +740,17 @@ class LedgerService:
                 created_by=admin_user
             )
 
+        # Adjustments are funded by (or returned to) the treasury
+        SystemAccountService.post([SystemLedgerEntry(
+            account=SystemBalance.Account.TREASURY,
+            currency=currency,
+            entry_type=ledger_entry.entry_type,
+            amount=-amount if adjustment_type == 'credit' else amount,
+            reference_type='ledger_entry',
+            reference_id=str(ledger_entry.pk),
+            description=f"{ledger_entry.description} ({target_user.email})"
+        )])
+
         logger.warning(
             f"ADMIN BALANCE ADJUSTMENT: {admin_user.email} {adjustment_type}ed "
             f"{amount} {currency.symbol} for {target_user.email}. Reason: {reason}"
@@ -0,0 +1,193 @@
+"""
+Ledger Reconciliation
+=====================
+Check that every balance equals the sum of its ledger entries:
+
+    Balance.available + Balance.locked == SUM(LedgerEntry.amount)
+
+per (user, currency), where order locks and unlocks are left out of the
+sum because they only move funds between available and locked.
+
+Users are split into contiguous id ranges that are reconciled in parallel
+worker processes. Each range is read in one transaction (REPEATABLE READ
+on PostgreSQL), so its balance snapshot and its ledger entries are
+consistent with each other while the exchange keeps trading. Entries are
+streamed through a server-side cursor in chunks; each chunk is grouped by
+(user, currency) with a stable sort and ``np.add.reduceat`` over
+fixed-point amounts (18 decimal places, the precision of the ledger) held
+as Python integers, so sums are exact and cannot overflow.
+
+The exchange's system accounts are checked the same way, against the
+system ledger: the shards of each (account, currency) must add up to its
+``SystemLedgerEntry`` amounts. Both sides are summed in SQL.
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+
+from apps.wallets.models import Balance, LedgerEntry, SystemBalance, SystemLedgerEntry
+
+logger = logging.getLogger('apps.wallets')
+
+# Fixed-point scale of ``LedgerEntry.amount`` and ``Balance`` amounts
+SCALE = 18
+
+# Entry types that move funds between available and locked
+TRANSFER_TYPES = ('order_lock', 'order_unlock')
+
+
+def _fixed(value):
+    return int(value.scaleb(SCALE))
+
+
+def _decimal(value):
+    return Decimal(int(value)).scaleb(-SCALE)
+
+
+def _reconcile_range(bounds, chunk_size):
+    # Runs in a worker process; connections inherited from the parent are unusable
+    connections.close_all()
+    return LedgerReconciliation.reconcile_range(*bounds, chunk_size=chunk_size)
+
+
+class LedgerReconciliation:
+    """Balance vs. ledger comparison over user-id ranges"""
+
+    @staticmethod
+    def user_ranges(count):
+        """Split the user ids into ``count`` contiguous ``(first, last)`` ranges, inclusive"""
+        users = get_user_model().objects.order_by('pk')
+        total = users.count()
+        if not total:
+            return []
+        step = -(-total // max(count, 1))
+        ranges, first, previous = [], None, None
+        for index, pk in enumerate(users.values_list('pk', flat=True).iterator(chunk_size=10000)):
+            if index % step == 0:
+                if first is not None:
+                    ranges.append((first, previous))
+                first = pk
+            previous = pk
+        ranges.append((first, previous))
+        return ranges
+
+    @classmethod
+    def reconcile_range(cls, first, last, chunk_size=50000):
+        """
+        Discrepancies of users ``first`` to ``last`` (inclusive) as
+        ``[{'user_id', 'currency_id', 'balance', 'ledger', 'difference'}]``
+        """
+        users = {'user_id__gte': first, 'user_id__lte': last}
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+            balances = {
+                (user_id, currency_id): _fixed(available) + _fixed(locked)
+                for user_id, currency_id, available, locked in Balance.objects.filter(**users).values_list(
+                    'user_id', 'currency_id', 'available', 'locked'
+                ).iterator(chunk_size=chunk_size)
+            }
+
+            ledger = {}
+            rows = LedgerEntry.objects.filter(**users).exclude(entry_type__in=TRANSFER_TYPES).values_list(
+                'user_id', 'currency_id', 'amount'
+            ).iterator(chunk_size=chunk_size)
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    cls._accumulate(ledger, chunk)
+                    chunk = []
+            cls._accumulate(ledger, chunk)
+
+        discrepancies = []
+        for key in balances.keys() | ledger.keys():
+            balance, total = balances.get(key, 0), ledger.get(key, 0)
+            if balance != total:
+                discrepancies.append({
+                    'user_id': key[0],
+                    'currency_id': key[1],
+                    'balance': _decimal(balance),
+                    'ledger': _decimal(total),
+                    'difference': _decimal(balance - total),
+                })
+        return discrepancies
+
+    @staticmethod
+    def _accumulate(ledger, chunk):
+        """Add one chunk of (user_id, currency_id, amount) rows to the running sums"""
+        if not chunk:
+            return
+        groups = {}
+        codes = np.array([groups.setdefault((user_id, currency_id), len(groups)) for user_id, currency_id, _ in chunk])
+        amounts = np.array([_fixed(amount) for _, _, amount in chunk], dtype=object)
+
+        order = np.argsort(codes, kind='stable')
+        codes, amounts = codes[order], amounts[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        sums = np.add.reduceat(amounts, starts)
+
+        keys = list(groups)
+        for code, total in zip(codes[starts], sums):
+            key = keys[code]
+            ledger[key] = ledger.get(key, 0) + total
+
+    @classmethod
+    def reconcile(cls, workers=4, chunk_size=50000):
+        """Reconcile every user, ``workers`` ranges at a time; returns the discrepancies"""
+        ranges = cls.user_ranges(workers * 4)
+        if workers <= 1 or len(ranges) <= 1:
+            return [item for bounds in ranges for item in cls.reconcile_range(*bounds, chunk_size=chunk_size)]
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        discrepancies = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = [pool.submit(_reconcile_range, bounds, chunk_size) for bounds in ranges]
+            for future in futures:
+                discrepancies.extend(future.result())
+
+        logger.info(f"Reconciled {len(ranges)} user ranges: {len(discrepancies)} discrepancies")
+        return discrepancies
+
+    @staticmethod
+    def reconcile_system():
+        """
+        Discrepancies of the system accounts as
+        ``[{'account', 'currency_id', 'balance', 'ledger', 'difference'}]``
+        """
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            balances = {
+                (row['account'], row['currency_id']): row['total']
+                for row in SystemBalance.objects.values('account', 'currency_id').annotate(total=Sum('amount'))
+            }
+            ledger = {
+                (row['account'], row['currency_id']): row['total']
+                for row in SystemLedgerEntry.objects.values('account', 'currency_id').annotate(total=Sum('amount'))
+            }
+
+        discrepancies = []
+        for key in balances.keys() | ledger.keys():
+            balance, total = balances.get(key) or Decimal('0'), ledger.get(key) or Decimal('0')
+            if balance != total:
+                discrepancies.append({
+                    'account': key[0],
+                    'currency_id': key[1],
+                    'balance': balance,
+                    'ledger': total,
+                    'difference': balance - total,
+                })
+        return discrepancies
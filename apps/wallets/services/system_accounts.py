@@ -0,0 +1,125 @@
+"""
+System Accounts
+===============
+Exchange-owned balances: trading fees collected and the treasury that
+funds admin adjustments.
+
+Every trade pays fees, so a single fee row per currency would serialize
+all settlement in the system on its row lock. Each account is therefore
+split into ``LEDGER_CONFIG['SYSTEM_ACCOUNT_SHARDS']`` shard rows per
+currency (``SystemBalance``). A posting is one ``UPDATE ... SET amount =
+amount + x`` on a randomly picked shard: it locks only that row and never
+reads it first. ``consolidate`` folds the shards into the canonical row
+(shard 0) so the table stays small, and reads sum all rows of an account.
+
+Every posting is also recorded as ``SystemLedgerEntry`` rows naming the
+trade or user ledger entry behind it, written with one bulk insert, so an
+account's entries add up to its balance and ``reconcile_ledger`` checks
+both.
+"""
+
+import logging
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.wallets.models import SystemBalance, SystemLedgerEntry
+
+logger = logging.getLogger('apps.wallets')
+
+ZERO = Decimal('0')
+
+
+class SystemAccountService:
+    """Postings to and reads of the sharded exchange accounts"""
+
+    @staticmethod
+    def _shards():
+        return max(settings.LEDGER_CONFIG['SYSTEM_ACCOUNT_SHARDS'], 1)
+
+    @classmethod
+    def post(cls, entries):
+        """
+        Record ``entries`` (unsaved ``SystemLedgerEntry`` rows, signed) and
+        add them to their accounts: one update per account and currency,
+        on a randomly picked shard.
+        """
+        amounts = {}
+        for entry in entries:
+            key = (entry.account, entry.currency_id)
+            amounts[key] = amounts.get(key, ZERO) + entry.amount
+
+        now = timezone.now()
+        for (account, currency_id), amount in amounts.items():
+            if not amount:
+                continue
+            shard = random.randint(1, cls._shards())
+            rows = SystemBalance.objects.filter(account=account, currency_id=currency_id, shard=shard)
+            if not rows.update(amount=F('amount') + amount, updated_at=now):
+                cls._create_shards(account, currency_id)
+                rows.update(amount=F('amount') + amount, updated_at=now)
+        SystemLedgerEntry.objects.bulk_create(entries)
+
+    @classmethod
+    def _create_shards(cls, account, currency_id):
+        SystemBalance.objects.bulk_create(
+            [
+                SystemBalance(account=account, currency_id=currency_id, shard=shard)
+                for shard in range(SystemBalance.CANONICAL_SHARD, cls._shards() + 1)
+            ],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def balance(account, currency):
+        """Current balance of ``account`` in ``currency``: the sum of its shards"""
+        total = SystemBalance.objects.filter(
+            account=account, currency=currency
+        ).aggregate(total=Sum('amount'))['total']
+        return total or ZERO
+
+    @staticmethod
+    def balances():
+        """``{account: {currency symbol: balance}}`` for every system account"""
+        result = {}
+        rows = SystemBalance.objects.values('account', 'currency__symbol').annotate(total=Sum('amount'))
+        for row in rows.order_by('account', 'currency__symbol'):
+            result.setdefault(row['account'], {})[row['currency__symbol']] = row['total']
+        return result
+
+    @classmethod
+    def consolidate(cls):
+        """
+        Fold every shard into its canonical row; returns the number of shards
+        folded. Shards locked by an in-flight posting are skipped and picked
+        up by the next run, so consolidation never waits on settlement.
+        """
+        folded = 0
+        groups = SystemBalance.objects.filter(
+            shard__gt=SystemBalance.CANONICAL_SHARD
+        ).exclude(amount=0).values_list('account', 'currency_id').distinct()
+
+        for account, currency_id in list(groups):
+            with transaction.atomic():
+                shards = list(SystemBalance.objects.select_for_update(skip_locked=True).filter(
+                    account=account, currency_id=currency_id, shard__gt=SystemBalance.CANONICAL_SHARD
+                ).exclude(amount=0))
+                if not shards:
+                    continue
+                total = sum((shard.amount for shard in shards), ZERO)
+
+                SystemBalance.objects.filter(pk__in=[shard.pk for shard in shards]).update(
+                    amount=ZERO, updated_at=timezone.now()
+                )
+                SystemBalance.objects.filter(
+                    account=account, currency_id=currency_id, shard=SystemBalance.CANONICAL_SHARD
+                ).update(amount=F('amount') + total, updated_at=timezone.now())
+                folded += len(shards)
+
+        if folded:
+            logger.info(f"Consolidated {folded} system account shards")
+        return folded
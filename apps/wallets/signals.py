@@ -0,0 +1,23 @@
+"""
+Wallets Signals
+===============
+Keep the balance cache in step with balances saved outside the ledger's
+bulk postings.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.wallets.models import Balance, Currency
+from apps.wallets.services.balance_cache import BalanceCache
+
+
+@receiver(post_save, sender=Balance)
+def refresh_cached_balance(sender, instance, **kwargs):
+    BalanceCache.refresh_on_commit([instance])
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def invalidate_cached_currencies(sender, **kwargs):
+    BalanceCache.invalidate_currencies()
@@ -0,0 +1,35 @@
+"""
+Wallets Celery Tasks
+====================
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger('apps.wallets')
+
+
+@shared_task(name='apps.wallets.tasks.consolidate_system_accounts')
+def consolidate_system_accounts():
+    """
+    Fold the fee and treasury shards into their canonical rows.
+    Runs every minute.
+    """
+    from apps.wallets.services import SystemAccountService
+
+    folded = SystemAccountService.consolidate()
+
+    return {'status': 'completed', 'folded': folded}
+
+
+@shared_task(name='apps.wallets.tasks.create_balance_checkpoints')
+def create_balance_checkpoints():
+    """
+    Checkpoint balances for every UTC day finished since the last run.
+    Runs every hour.
+    """
+    from apps.wallets.services.checkpoints import BalanceCheckpointService
+
+    days = BalanceCheckpointService.checkpoint_pending()
+
+    return {'status': 'completed', 'days': days}
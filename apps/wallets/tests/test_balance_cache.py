@@ -0,0 +1,94 @@
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.test import TestCase, override_settings
+
+from apps.accounts.models import User
+from apps.wallets.models import Balance, Currency
+from apps.wallets.services import BalanceCache, LedgerService
+from apps.wallets.services.balance_cache import KEY
+
+try:
+    import fakeredis
+except ImportError:  # only needed to exercise the Redis path
+    fakeredis = None
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {
+    'BACKEND': 'django_redis.cache.RedisCache',
+    'LOCATION': 'redis://localhost:6379/15',
+    'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+}}
+
+
+class BalanceCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.user = User.objects.create_user(email='alice@example.com', password='password')
+        LedgerService.credit_balance(self.user, self.usdt, Decimal('100'), 'deposit')
+
+    def change_behind_the_cache(self, available):
+        """Update the row the way another process's settlement would appear here"""
+        Balance.objects.filter(user=self.user, currency=self.usdt).update(available=available, version=99)
+
+    def available(self):
+        return BalanceCache.get(self.user.pk, self.usdt.pk)['available']
+
+
+class PerProcessCacheTests(BalanceCacheTestCase):
+
+    @override_settings(CACHES=LOCMEM)
+    def test_locmem_cache_is_bypassed(self):
+        self.assertFalse(BalanceCache._shared())
+        self.assertEqual(self.available(), Decimal('100'))
+
+        self.change_behind_the_cache(Decimal('5'))
+
+        self.assertEqual(self.available(), Decimal('5'))
+
+    def test_dummy_cache_is_bypassed(self):
+        self.assertFalse(BalanceCache._shared())
+        self.change_behind_the_cache(Decimal('5'))
+
+        self.assertEqual(self.available(), Decimal('5'))
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+@override_settings(CACHES=REDIS)
+class RedisCacheTests(BalanceCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('apps.wallets.services.balance_cache.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_are_served_from_redis(self):
+        self.assertTrue(BalanceCache._shared())
+        self.assertEqual(self.available(), Decimal('100'))
+        key = KEY.format(user_id=self.user.pk, currency_id=self.usdt.pk)
+        self.assertEqual(self.redis.hget(key, 'available'), b'100.000000000000000000')
+
+        self.change_behind_the_cache(Decimal('5'))
+
+        self.assertEqual(self.available(), Decimal('100'))
+
+    def test_older_versions_never_replace_newer_ones(self):
+        version = BalanceCache.get(self.user.pk, self.usdt.pk)['version']
+        key = (self.user.pk, self.usdt.pk)
+
+        BalanceCache.refresh({key: BalanceCache._entry(Decimal('1'), Decimal('0'), version - 1)})
+        self.assertEqual(self.available(), Decimal('100'))
+
+        BalanceCache.refresh({key: BalanceCache._entry(Decimal('7'), Decimal('3'), version + 1)})
+        self.assertEqual(BalanceCache.get(*key), {
+            'available': Decimal('7'), 'locked': Decimal('3'), 'version': version + 1,
+        })
+
+    def test_missing_balance_is_cached_as_zero(self):
+        btc, _ = Currency.objects.get_or_create(symbol='BTC', defaults={'name': 'Bitcoin'})
+
+        self.assertEqual(BalanceCache.get(self.user.pk, btc.pk),
+                         {'available': Decimal('0'), 'locked': Decimal('0'), 'version': 0})
@@ -0,0 +1,103 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.wallets.models import BalanceCheckpoint, Currency, LedgerEntry
+from apps.wallets.services import LedgerService
+from apps.wallets.services.checkpoints import BalanceCheckpointService
+
+DAY = date(2024, 1, 10)
+
+
+def at(day, hour=12):
+    return datetime(day.year, day.month, day.day, hour, tzinfo=dt_timezone.utc)
+
+
+class CheckpointTestCase(TestCase):
+
+    def setUp(self):
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.user = User.objects.create_user(email='alice@example.com', password='password')
+        # Day 1: +100, day 2: -30 and 40 locked, day 4: +5
+        self.post(DAY, LedgerService.credit_balance, Decimal('100'), 'deposit')
+        self.post(DAY + timedelta(days=1), LedgerService.debit_balance, Decimal('30'), 'withdrawal')
+        self.post(DAY + timedelta(days=1), LedgerService.lock_balance, Decimal('40'))
+        self.post(DAY + timedelta(days=3), LedgerService.credit_balance, Decimal('5'), 'deposit')
+
+    def post(self, day, method, *args):
+        _, entry = method(self.user, self.usdt, *args)
+        LedgerEntry.objects.filter(pk=entry.pk).update(created_at=at(day))
+
+    def checkpoint_until(self, now):
+        with mock.patch('apps.wallets.services.checkpoints.timezone.now', return_value=now):
+            return BalanceCheckpointService.checkpoint_pending()
+
+
+class BalanceCheckpointTests(CheckpointTestCase):
+
+    def test_pending_days_are_checkpointed_once(self):
+        # Day 3 had no entries; day 4 has not ended
+        self.assertEqual(self.checkpoint_until(at(DAY + timedelta(days=3))), 2)
+        self.assertEqual(self.checkpoint_until(at(DAY + timedelta(days=3))), 0)
+
+        self.assertEqual(
+            list(BalanceCheckpoint.objects.order_by('day').values_list('day', 'balance')),
+            [(DAY, Decimal('100')), (DAY + timedelta(days=1), Decimal('70'))],
+        )
+
+    def test_history_is_the_same_with_and_without_checkpoints(self):
+        moments = [at(DAY, 0), at(DAY), at(DAY + timedelta(days=2)), at(DAY + timedelta(days=3), 13)]
+        window = (DAY - timedelta(days=1), DAY + timedelta(days=4))
+        before = (
+            [BalanceCheckpointService.balance_at(self.user, self.usdt, moment) for moment in moments],
+            BalanceCheckpointService.daily_balances(self.user, self.usdt, *window),
+        )
+
+        self.checkpoint_until(at(DAY + timedelta(days=3)))
+
+        after = (
+            [BalanceCheckpointService.balance_at(self.user, self.usdt, moment) for moment in moments],
+            BalanceCheckpointService.daily_balances(self.user, self.usdt, *window),
+        )
+        self.assertEqual(after, before)
+        self.assertEqual(before[0], [Decimal('0'), Decimal('100'), Decimal('70'), Decimal('75')])
+        self.assertEqual([balance for _, balance in before[1][1]],
+                         [Decimal('0'), Decimal('100'), Decimal('70'), Decimal('70'), Decimal('75'), Decimal('75')])
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class BalanceHistoryViewTests(CheckpointTestCase):
+
+    url = '/api/v1/wallets/balances/USDT/history/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_daily_balances(self):
+        response = self.client.get(self.url, {'start': '2024-01-10', 'end': '2024-01-11'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['opening_balance']), Decimal('0'))
+        self.assertEqual([Decimal(day['balance']) for day in response.json()['days']],
+                         [Decimal('100'), Decimal('70')])
+
+    def test_balance_at_a_moment(self):
+        response = self.client.get(self.url, {'at': '2024-01-11T13:00:00'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['balance']), Decimal('70'))
+
+    def test_invalid_dates_are_bad_requests(self):
+        for params in ({'end': 'soon'}, {'start': '2024-02-30'}, {'start': '2024-01-12', 'end': '2024-01-10'},
+                       {'at': 'noon'}, {'at': '2024-13-01T00:00:00'}, {'start': '2023-01-01', 'end': '2024-12-31'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_unknown_currency(self):
+        self.assertEqual(self.client.get('/api/v1/wallets/balances/NOPE/history/').status_code, 404)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.accounts.models import User
+from apps.wallets.models import Balance, Currency, LedgerEntry
+from apps.wallets.services import LedgerService, Posting
+from apps.wallets.services.reconciliation import LedgerReconciliation
+
+
+class PostBatchTests(TestCase):
+
+    def setUp(self):
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.alice = User.objects.create_user(email='alice@example.com', password='password')
+        self.bob = User.objects.create_user(email='bob@example.com', password='password')
+        LedgerService.credit_balance(self.alice, self.usdt, Decimal('100'), 'deposit')
+
+    def balance(self, user):
+        balance = Balance.objects.get(user=user, currency=self.usdt)
+        return balance.available, balance.locked
+
+    def test_legs_see_the_balance_left_by_earlier_legs(self):
+        _, entries = LedgerService.post_batch([
+            Posting(self.alice, self.usdt, 'lock', '60'),
+            Posting(self.alice, self.usdt, 'deduct', '60', entry_type='trade_buy'),
+            Posting(self.bob, self.usdt, 'credit', '60', entry_type='trade_sell'),
+        ])
+
+        self.assertEqual(self.balance(self.alice), (Decimal('40'), Decimal('0')))
+        self.assertEqual(self.balance(self.bob), (Decimal('60'), Decimal('0')))
+        self.assertEqual([(e.balance_before, e.balance_after) for e in entries],
+                         [(Decimal('100'), Decimal('40')), (Decimal('100'), Decimal('40')),
+                          (Decimal('0'), Decimal('60'))])
+        self.assertEqual(LedgerReconciliation.reconcile(workers=1), [])
+
+    def test_invalid_leg_writes_nothing(self):
+        with self.assertRaisesMessage(ValueError, 'Insufficient balance'):
+            LedgerService.post_batch([
+                Posting(self.bob, self.usdt, 'credit', '10', entry_type='deposit'),
+                Posting(self.alice, self.usdt, 'debit', '101', entry_type='withdrawal'),
+            ])
+
+        self.assertEqual(self.balance(self.alice), (Decimal('100'), Decimal('0')))
+        self.assertFalse(LedgerEntry.objects.filter(user=self.bob).exists())
+
+    def test_each_changed_balance_gets_one_new_version(self):
+        version = Balance.objects.get(user=self.alice, currency=self.usdt).version
+
+        LedgerService.post_batch([
+            Posting(self.alice, self.usdt, 'lock', '10'),
+            Posting(self.alice, self.usdt, 'unlock', '10'),
+        ])
+
+        self.assertEqual(Balance.objects.get(user=self.alice, currency=self.usdt).version, version + 1)
+
+    def test_transfer_posts_both_legs(self):
+        _, (sent, received) = LedgerService.transfer(self.alice, self.bob, self.usdt, Decimal('30'),
+                                                     reference_type='transfer', reference_id='t1')
+
+        self.assertEqual((sent.entry_type, sent.amount), ('p2p_send', Decimal('-30')))
+        self.assertEqual((received.entry_type, received.amount), ('p2p_receive', Decimal('30')))
+        self.assertEqual(self.balance(self.bob), (Decimal('30'), Decimal('0')))
+        self.assertEqual(LedgerReconciliation.reconcile(workers=1), [])
+
+        with self.assertRaises(ValueError):
+            LedgerService.transfer(self.bob, self.alice, self.usdt, Decimal('31'))
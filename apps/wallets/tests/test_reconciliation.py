@@ -0,0 +1,63 @@
+import csv
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from apps.accounts.models import User
+from apps.wallets.models import Balance, Currency, SystemBalance
+from apps.wallets.services import LedgerService
+
+
+class ReconcileLedgerCommandTests(TestCase):
+
+    def setUp(self):
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.user = User.objects.create_user(email='alice@example.com', password='password')
+        LedgerService.credit_balance(self.user, self.usdt, Decimal('100'), 'deposit')
+
+    def reconcile(self):
+        out = StringIO()
+        call_command('reconcile_ledger', workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_balances_matching_the_ledger_pass(self):
+        self.assertIn('All balances match the ledger', self.reconcile())
+
+    def test_balance_changed_outside_the_ledger_is_reported(self):
+        Balance.objects.filter(user=self.user, currency=self.usdt).update(available=Decimal('150'))
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_ledger', workers=1, stdout=out)
+        self.assertIn('alice@example.com USDT', out.getvalue())
+        self.assertIn('difference 50', out.getvalue())
+
+    def test_system_account_changed_outside_the_ledger_is_reported(self):
+        SystemBalance.objects.create(account=SystemBalance.Account.FEE, currency=self.usdt, amount=Decimal('5'))
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('reconcile_ledger', workers=1, stdout=out)
+        self.assertIn('system:fee USDT', out.getvalue())
+
+    def test_order_locks_do_not_count_as_changes(self):
+        LedgerService.lock_balance(self.user, self.usdt, Decimal('40'))
+
+        self.assertIn('All balances match the ledger', self.reconcile())
+
+    def test_discrepancies_are_written_to_csv(self):
+        Balance.objects.filter(user=self.user, currency=self.usdt).update(available=Decimal('90'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'discrepancies.csv')
+            with self.assertRaises(CommandError):
+                call_command('reconcile_ledger', workers=1, output=path, stdout=StringIO())
+            with open(path, newline='') as f:
+                rows = list(csv.reader(f))
+
+        self.assertEqual(rows[1][:2], ['alice@example.com', 'USDT'])
+        self.assertEqual(Decimal(rows[1][4]), Decimal('-10'))
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from apps.accounts.models import User
+from apps.wallets.models import Balance, Currency, LedgerEntry, P2PTransfer
+from apps.wallets.services import LedgerService
+from apps.wallets.services.reconciliation import LedgerReconciliation
+from apps.wallets.views import p2p_transfer
+
+
+class TransferTestCase(TestCase):
+
+    def setUp(self):
+        self.usdt, _ = Currency.objects.get_or_create(symbol='USDT', defaults={'name': 'Tether'})
+        self.alice = User.objects.create_user(email='alice@example.com', password='password')
+        self.bob = User.objects.create_user(email='bob@example.com', password='password')
+        LedgerService.credit_balance(self.alice, self.usdt, Decimal('100'), 'deposit')
+
+    def available(self, user):
+        return Balance.objects.filter(user=user, currency=self.usdt).values_list('available', flat=True).first()
+
+    def assertTransferred(self, amount, reference_id):
+        self.assertEqual(self.available(self.alice), Decimal('100') - amount)
+        self.assertEqual(self.available(self.bob), amount)
+        entries = LedgerEntry.objects.filter(reference_id=reference_id).order_by('amount')
+        self.assertEqual([(e.user_id, e.entry_type, e.amount) for e in entries], [
+            (self.alice.pk, 'p2p_send', -amount), (self.bob.pk, 'p2p_receive', amount),
+        ])
+        self.assertEqual(LedgerReconciliation.reconcile(workers=1), [])
+
+
+@override_settings(ALLOWED_HOSTS=['*'])
+class TransferCryptoTests(TransferTestCase):
+
+    def post(self, sender, recipient, amount):
+        client = APIClient()
+        client.force_authenticate(sender)
+        return client.post('/api/v1/wallets/transfer/', {
+            'recipient_email': recipient.email, 'currency': 'usdt', 'amount': amount,
+        }, format='json')
+
+    def test_transfer_is_posted_to_the_ledger(self):
+        response = self.post(self.alice, self.bob, '30')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTransferred(Decimal('30'), response.json()['transaction']['id'])
+
+    def test_transfer_back_uses_the_same_path(self):
+        self.post(self.alice, self.bob, '30')
+
+        response = self.post(self.bob, self.alice, '10')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.available(self.alice), Decimal('80'))
+        self.assertEqual(LedgerReconciliation.reconcile(workers=1), [])
+
+    def test_insufficient_balance_changes_nothing(self):
+        response = self.post(self.alice, self.bob, '101')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('You have 100', response.json()['error'])
+        self.assertEqual(self.available(self.alice), Decimal('100'))
+        self.assertFalse(LedgerEntry.objects.filter(user=self.bob).exists())
+
+
+class P2PTransferTests(TransferTestCase):
+
+    def post(self, sender, recipient, amount):
+        request = APIRequestFactory().post('/', {
+            'currency_symbol': 'USDT', 'recipient_email': recipient.email, 'amount': amount,
+        }, format='json')
+        force_authenticate(request, sender)
+        return p2p_transfer(request)
+
+    def test_transfer_is_recorded_and_posted_to_the_ledger(self):
+        response = self.post(self.alice, self.bob, '25')
+
+        self.assertEqual(response.status_code, 200)
+        transfer = P2PTransfer.objects.get()
+        self.assertEqual(transfer.amount, Decimal('25'))
+        self.assertTransferred(Decimal('25'), str(transfer.id))
+
+    def test_insufficient_balance_records_nothing(self):
+        response = self.post(self.alice, self.bob, '101')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(P2PTransfer.objects.exists())
+        self.assertEqual(self.available(self.alice), Decimal('100'))
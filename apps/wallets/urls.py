@@ -6,6 +6,7 @@ from .views import (
     CurrencyListView,
     BalanceListView,
     BalanceDetailView,
+    BalanceHistoryView,
     LedgerHistoryView,
     DepositAddressView,
     DepositHistoryView,
@@ -16,6 +17,7 @@ from .views import (
 )
 from .admin_views import (
     AdminBalanceAdjustmentView as AdminBalanceAdjustView,
+    AdminSystemBalanceView,
     AdminWithdrawalListView,
     AdminWithdrawalApproveView,
     AdminWithdrawalRejectView,
@@ -31,6 +33,7 @@ urlpatterns = [
     # Balances
     path('balances/', BalanceListView.as_view(), name='balance_list'),
     path('balances/<str:currency_symbol>/', BalanceDetailView.as_view(), name='balance_detail'),
+    path('balances/<str:currency_symbol>/history/', BalanceHistoryView.as_view(), name='balance_history'),
     
     # Ledger
     path('ledger/', LedgerHistoryView.as_view(), name='ledger_history'),
@@ -51,6 +54,7 @@ urlpatterns = [
     
     # Admin endpoints
     path('admin/adjust-balance/', AdminBalanceAdjustView.as_view(), name='admin_adjust_balance'),
+    path('admin/system-balances/', AdminSystemBalanceView.as_view(), name='admin_system_balances'),
     path('admin/withdrawals/', AdminWithdrawalListView.as_view(), name='admin_withdrawal_list'),
     path('admin/withdrawals/<uuid:withdrawal_id>/approve/', AdminWithdrawalApproveView.as_view(), name='admin_withdrawal_approve'),
     path('admin/withdrawals/<uuid:withdrawal_id>/reject/', AdminWithdrawalRejectView.as_view(), name='admin_withdrawal_reject'),
@@ -5,11 +5,15 @@ API endpoints for balance management, deposits, and withdrawals.
 """
 
 import logging
+from datetime import timedelta, timezone as dt_timezone
+
 from rest_framework import status, generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -18,7 +22,7 @@ from django.contrib.auth import get_user_model
 from decimal import Decimal
 from .models import Balance, Currency, LedgerEntry
 
-from .models import Currency, Balance, LedgerEntry, Deposit, Withdrawal
+from .models import Currency, Balance, LedgerEntry, Deposit, Withdrawal, P2PTransfer
 from .serializers import (
     CurrencySerializer,
     BalanceSerializer,
@@ -29,7 +33,10 @@ from .serializers import (
     WithdrawalRequestSerializer,
     AdminBalanceAdjustmentSerializer,
 )
+from .services.balance_cache import BalanceCache
+from .services.checkpoints import BalanceCheckpointService
 from .services.ledger import LedgerService
+from apps.core.pagination import KeysetPagination
 
 logger = logging.getLogger(__name__)
 
@@ -60,40 +67,29 @@ class BalanceListView(APIView):
     GET /api/v1/wallets/balances/
 
     Get all balances for the current user.
+    Served from the balance cache; a warm cache needs no queries.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        balances = Balance.objects.filter(
-            user=request.user
-        ).select_related('currency')
-
-        existing_currencies = set(b.currency_id for b in balances)
-        active_currencies = Currency.objects.filter(is_active=True)
+        currencies = BalanceCache.currencies()
+        balances = BalanceCache.get_many(request.user.pk, [currency['id'] for currency in currencies])
 
         result = []
 
-        for balance in balances:
+        for currency in currencies:
+            balance = balances[currency['id']]
+            # Inactive currencies are only listed where the user has a balance row
+            if not currency['is_active'] and not balance['version']:
+                continue
             result.append({
-                'currency_symbol': balance.currency.symbol,
-                'currency_name': balance.currency.name,
-                'available': balance.available,
-                'locked': balance.locked,
-                'total': balance.total,
+                'currency_symbol': currency['symbol'],
+                'currency_name': currency['name'],
+                'available': balance['available'],
+                'locked': balance['locked'],
+                'total': balance['available'] + balance['locked'],
             })
 
-        for currency in active_currencies:
-            if currency.id not in existing_currencies:
-                result.append({
-                    'currency_symbol': currency.symbol,
-                    'currency_name': currency.name,
-                    'available': '0',
-                    'locked': '0',
-                    'total': '0',
-                })
-
-        result.sort(key=lambda x: x['currency_symbol'])
-
         serializer = BalanceSummarySerializer(result, many=True)
         return Response(serializer.data)
 
@@ -103,29 +99,94 @@ class BalanceDetailView(APIView):
     GET /api/v1/wallets/balances/<currency_symbol>/
 
     Get balance for a specific currency.
+    Served from the balance cache without locking the balance row.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, currency_symbol):
-        try:
-            currency = Currency.objects.get(
-                symbol=currency_symbol.upper(),
-                is_active=True
+        symbol = currency_symbol.upper()
+        currency = next(
+            (c for c in BalanceCache.currencies() if c['symbol'] == symbol and c['is_active']),
+            None
+        )
+        if currency is None:
+            return Response(
+                {'error': 'Currency not found'},
+                status=status.HTTP_404_NOT_FOUND
             )
+
+        balance = BalanceCache.get(request.user.pk, currency['id'])
+
+        return Response({
+            'currency_symbol': currency['symbol'],
+            'currency_name': currency['name'],
+            'available': str(balance['available']),
+            'locked': str(balance['locked']),
+            'total': str(balance['available'] + balance['locked']),
+        })
+
+
+class BalanceHistoryView(APIView):
+    """
+    GET /api/v1/wallets/balances/<currency_symbol>/history/?start=2024-01-01&end=2024-01-31
+    GET /api/v1/wallets/balances/<currency_symbol>/history/?at=2024-01-15T12:00:00Z
+
+    Daily closing balances (available + locked) over UTC days ``start`` to
+    ``end`` inclusive (default: the last 30 days), or the balance at one
+    moment ``at`` (ISO 8601, UTC when naive). Computed from the nearest
+    daily checkpoint, so the cost depends on the range, not the account's age.
+    """
+    permission_classes = [IsAuthenticated]
+
+    MAX_DAYS = 366
+
+    def get(self, request, currency_symbol):
+        try:
+            currency = Currency.objects.get(symbol=currency_symbol.upper())
         except Currency.DoesNotExist:
             return Response(
                 {'error': 'Currency not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        balance = LedgerService.get_or_create_balance(request.user, currency)
+        at = request.query_params.get('at')
+        if at:
+            try:
+                moment = parse_datetime(at)
+            except ValueError:
+                moment = None
+            if moment is None:
+                return Response({'error': 'Invalid at'}, status=status.HTTP_400_BAD_REQUEST)
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=dt_timezone.utc)
+            balance = BalanceCheckpointService.balance_at(request.user, currency, moment)
+            return Response({
+                'currency_symbol': currency.symbol,
+                'at': moment.isoformat(),
+                'balance': str(balance),
+            })
 
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+        try:
+            end = parse_date(request.query_params.get('end') or today.isoformat())
+            start = request.query_params.get('start')
+            if end is not None:
+                start = parse_date(start) if start else end - timedelta(days=29)
+        except ValueError:
+            start = end = None
+        if start is None or end is None or start > end:
+            return Response({'error': 'Invalid start or end'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= self.MAX_DAYS:
+            return Response(
+                {'error': f'At most {self.MAX_DAYS} days per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        opening, days = BalanceCheckpointService.daily_balances(request.user, currency, start, end)
         return Response({
             'currency_symbol': currency.symbol,
-            'currency_name': currency.name,
-            'available': str(balance.available),
-            'locked': str(balance.locked),
-            'total': str(balance.total),
+            'opening_balance': str(opening),
+            'days': [{'date': day.isoformat(), 'balance': str(balance)} for day, balance in days],
         })
 
 
@@ -141,6 +202,7 @@ class LedgerHistoryView(generics.ListAPIView):
     """
     serializer_class = LedgerEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = LedgerEntry.objects.filter(
@@ -155,7 +217,7 @@ class LedgerHistoryView(generics.ListAPIView):
         if entry_type:
             queryset = queryset.filter(entry_type=entry_type)
 
-        return queryset.order_by('-created_at')
+        return queryset
 
 
 # =============================================================================
@@ -218,11 +280,12 @@ class DepositHistoryView(generics.ListAPIView):
     """
     serializer_class = DepositSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Deposit.objects.filter(
             user=self.request.user
-        ).select_related('currency').order_by('-created_at')
+        ).select_related('currency')
 
 
 # =============================================================================
@@ -237,11 +300,12 @@ class WithdrawalListView(generics.ListAPIView):
     """
     serializer_class = WithdrawalSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Withdrawal.objects.filter(
             user=self.request.user
-        ).select_related('currency').order_by('-created_at')
+        ).select_related('currency')
 
 
 class WithdrawalCreateView(APIView):
@@ -454,68 +518,28 @@ def p2p_transfer(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get or create sender's balance
-        sender_balance, _ = Balance.objects.get_or_create(
-            user=request.user,
-            currency=currency,
-            defaults={'available': Decimal('0'), 'locked': Decimal('0')}
-        )
-
-        # Check sender has sufficient balance
-        if sender_balance.available < amount:
+        # Both legs in one batch: balances are locked in (user, currency)
+        # order, so opposite transfers between two users cannot deadlock
+        try:
+            with transaction.atomic():
+                transfer = P2PTransfer.objects.create(
+                    sender=request.user,
+                    recipient=recipient,
+                    currency=currency,
+                    amount=amount,
+                    note=note,
+                    status='completed'
+                )
+                LedgerService.transfer(
+                    request.user, recipient, currency, amount,
+                    reference_type='p2p_transfer', reference_id=str(transfer.id)
+                )
+        except ValueError:
             return Response(
                 {'error': 'Insufficient balance'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get or create recipient's balance
-        recipient_balance, _ = Balance.objects.get_or_create(
-            user=recipient,
-            currency=currency,
-            defaults={'available': Decimal('0'), 'locked': Decimal('0')}
-        )
-
-        # Perform transfer atomically
-        with transaction.atomic():
-            # Deduct from sender
-            sender_balance.available -= amount
-            sender_balance.save()
-
-            # Add to recipient
-            recipient_balance.available += amount
-            recipient_balance.save()
-
-            # Create transfer record
-            transfer = P2PTransfer.objects.create(
-                sender=request.user,
-                recipient=recipient,
-                currency=currency,
-                amount=amount,
-                note=note,
-                status='completed'
-            )
-
-            # Create ledger entries for audit trail
-            LedgerEntry.objects.create(
-                user=request.user,
-                currency=currency,
-                entry_type='p2p_send',
-                amount=-amount,
-                balance_after=sender_balance.available,
-                reference_id=str(transfer.id),
-                description=f'P2P transfer to {recipient.email or recipient.username}'
-            )
-
-            LedgerEntry.objects.create(
-                user=recipient,
-                currency=currency,
-                entry_type='p2p_receive',
-                amount=amount,
-                balance_after=recipient_balance.available,
-                reference_id=str(transfer.id),
-                description=f'P2P transfer from {request.user.email or request.user.username}'
-            )
-
         return Response({
             'success': True,
             'message': f'Successfully sent {amount} {currency_symbol} to {recipient.email or recipient.username}',
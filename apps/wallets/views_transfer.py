@@ -5,12 +5,12 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db import transaction
 from django.contrib.auth import get_user_model
 from decimal import Decimal, InvalidOperation
 import uuid
 
 from .models import Balance, Currency
+from .services.ledger import LedgerService
 
 User = get_user_model()
 
@@ -57,41 +57,27 @@ def transfer_crypto(request):
     except Currency.DoesNotExist:
         return Response({'error': f'Currency {currency_symbol} not found'}, status=404)
 
-    # Perform transfer atomically
-    with transaction.atomic():
-        # Get or create sender balance
-        sender_balance, _ = Balance.objects.get_or_create(
-            user=sender,
-            currency=currency,
-            defaults={'available': Decimal('0'), 'locked': Decimal('0')}
-        )
-
-        # Check sufficient balance
-        if sender_balance.available < amount:
-            return Response({
-                'error': f'Insufficient balance. You have {sender_balance.available} {currency_symbol}'
-            }, status=400)
-
-        # Get or create recipient balance
-        recipient_balance, _ = Balance.objects.get_or_create(
-            user=recipient,
-            currency=currency,
-            defaults={'available': Decimal('0'), 'locked': Decimal('0')}
+    # Both legs in one batch: balances are locked in (user, currency) order,
+    # so opposite transfers between two users cannot deadlock
+    transaction_id = str(uuid.uuid4())
+    try:
+        LedgerService.transfer(
+            sender, recipient, currency, amount,
+            reference_type='transfer', reference_id=transaction_id
         )
-
-        # Deduct from sender
-        sender_balance.available -= amount
-        sender_balance.save()
-
-        # Add to recipient
-        recipient_balance.available += amount
-        recipient_balance.save()
+    except ValueError:
+        available = Balance.objects.filter(user=sender, currency=currency).values_list(
+            'available', flat=True
+        ).first() or Decimal('0')
+        return Response({
+            'error': f'Insufficient balance. You have {available} {currency_symbol}'
+        }, status=400)
 
     return Response({
         'success': True,
         'message': f'Successfully transferred {amount} {currency_symbol} to {recipient.email}',
         'transaction': {
-            'id': str(uuid.uuid4()),
+            'id': transaction_id,
             'from': sender.email,
             'to': recipient.email,
             'amount': str(amount),
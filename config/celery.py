@@ -21,27 +21,23 @@ app.conf.beat_schedule = {
         'task': 'apps.trading.tasks.update_trading_pair_stats',
         'schedule': 60.0,
     },
-}
-# Add periodic task for stop order checking
-app.conf.beat_schedule.update({
-    'check-stop-orders': {
-        'task': 'apps.trading.tasks.check_stop_orders',
-        'schedule': 5.0,  # Every 5 seconds
+    'consolidate-system-accounts-every-minute': {
+        'task': 'apps.wallets.tasks.consolidate_system_accounts',
+        'schedule': 60.0,
     },
-    'process-triggered-orders': {
-        'task': 'apps.trading.tasks.process_triggered_orders',
-        'schedule': 3.0,  # Every 3 seconds
+    'create-balance-checkpoints-every-hour': {
+        'task': 'apps.wallets.tasks.create_balance_checkpoints',
+        'schedule': 3600.0,
     },
-})
-
-# Add periodic task for stop order checking
+}
+# Stops fire inside the matching engine; these are fallback sweeps
 app.conf.beat_schedule.update({
     'check-stop-orders': {
         'task': 'apps.trading.tasks.check_stop_orders',
-        'schedule': 5.0,  # Every 5 seconds
+        'schedule': 60.0,  # Every minute
     },
     'process-triggered-orders': {
         'task': 'apps.trading.tasks.process_triggered_orders',
-        'schedule': 3.0,  # Every 3 seconds
+        'schedule': 60.0,  # Every minute
     },
 })
@@ -321,6 +321,71 @@ EXCHANGE_CONFIG = {
     'WITHDRAWAL_AUTO_APPROVE_LIMIT': float(os.getenv('WITHDRAWAL_AUTO_APPROVE_LIMIT', '100')),
 }
 
+# =============================================================================
+# LEDGER
+# =============================================================================
+LEDGER_CONFIG = {
+    # Rows per currency that fee and treasury postings are spread over
+    'SYSTEM_ACCOUNT_SHARDS': int(os.getenv('LEDGER_SYSTEM_ACCOUNT_SHARDS', '16')),
+    # Backstop expiry of cached balances; entries are refreshed on every change
+    'BALANCE_CACHE_TIMEOUT': int(os.getenv('LEDGER_BALANCE_CACHE_TIMEOUT', '300')),
+    # A UTC day is checkpointed this long after it ends, once its last entries have committed
+    'CHECKPOINT_DELAY_SECONDS': int(os.getenv('LEDGER_CHECKPOINT_DELAY_SECONDS', '300')),
+}
+
+# =============================================================================
+# MATCHING ENGINE
+# =============================================================================
+MATCHING_ENGINE_CONFIG = {
+    # 'inline' matches inside the web worker, 'sequencer' routes every order to
+    # the run_matching_engine process that owns the symbol's shard
+    'MODE': os.getenv('MATCHING_ENGINE_MODE', 'inline'),
+    'REDIS_URL': os.getenv('MATCHING_ENGINE_REDIS_URL', REDIS_URL),
+    'SHARDS': int(os.getenv('MATCHING_ENGINE_SHARDS', '1')),
+    'REPLY_TIMEOUT': float(os.getenv('MATCHING_ENGINE_REPLY_TIMEOUT', '5')),
+    # Time kept before a caller stops waiting to fsync the journal and reply:
+    # later commands are dropped, or rolled back if they finish later
+    'EXECUTION_MARGIN': float(os.getenv('MATCHING_ENGINE_EXECUTION_MARGIN', '1')),
+    # Max commands handled per journal fsync (group commit)
+    'BATCH_SIZE': int(os.getenv('MATCHING_ENGINE_BATCH_SIZE', '64')),
+    # Orders accepted by one POST trading/orders/batch/ request
+    'MAX_BATCH_ORDERS': int(os.getenv('MATCHING_ENGINE_MAX_BATCH_ORDERS', '100')),
+    # Journal directory; empty disables journaling and snapshots
+    'JOURNAL_DIR': os.getenv('MATCHING_ENGINE_JOURNAL_DIR', ''),
+    'SNAPSHOT_EVERY': int(os.getenv('MATCHING_ENGINE_SNAPSHOT_EVERY', '50000')),
+    # Price levels per side published to the depth cache after each cycle
+    'DEPTH_CACHE_LEVELS': int(os.getenv('MATCHING_ENGINE_DEPTH_CACHE_LEVELS', '100')),
+    # How often moved trailing-stop watermarks are written back to the orders
+    'TRAILING_CHECKPOINT_SECONDS': float(os.getenv('MATCHING_ENGINE_TRAILING_CHECKPOINT_SECONDS', '30')),
+}
+
+# =============================================================================
+# MARKET DATA (WebSocket fan-out)
+# =============================================================================
+MARKET_DATA_CONFIG = {
+    # Conflation windows for order book deltas; the first interval is served on
+    # orderbook_{symbol}, the others on orderbook_{symbol}_{ms}ms. 0 = no conflation
+    'DEPTH_INTERVALS_MS': [
+        int(ms) for ms in os.getenv('MARKET_DATA_DEPTH_INTERVALS_MS', '100,1000').split(',')
+    ],
+    # Per-symbol overrides, e.g. {'DOGE_USDT': [1000]}
+    'SYMBOL_DEPTH_INTERVALS_MS': {},
+    # Trades are batched per window on trades_{symbol}
+    'TRADE_INTERVAL_MS': int(os.getenv('MARKET_DATA_TRADE_INTERVAL_MS', '100')),
+    # The 24h ticker is sent at most once per window on ticker_{symbol}
+    'TICKER_INTERVAL_MS': int(os.getenv('MARKET_DATA_TICKER_INTERVAL_MS', '1000')),
+    # Candle updates are sent per window on candles_{symbol}_{interval}
+    'CANDLE_INTERVAL_MS': int(os.getenv('MARKET_DATA_CANDLE_INTERVAL_MS', '1000')),
+    # Subscriptions allowed on one multiplexed ws/stream/ connection
+    'MAX_STREAMS_PER_CONNECTION': int(os.getenv('MARKET_DATA_MAX_STREAMS_PER_CONNECTION', '200')),
+    # Per-connection outbound queue: past SIZE a depth stream's queued deltas
+    # collapse into a fresh snapshot; past HARD_LIMIT the client is disconnected
+    'OUTBOUND_QUEUE_SIZE': int(os.getenv('MARKET_DATA_OUTBOUND_QUEUE_SIZE', '128')),
+    'OUTBOUND_QUEUE_HARD_LIMIT': int(os.getenv('MARKET_DATA_OUTBOUND_QUEUE_HARD_LIMIT', '1024')),
+    # Also encode frames as msgpack for connections that ask for ?format=msgpack
+    'MSGPACK_FRAMES': os.getenv('MARKET_DATA_MSGPACK_FRAMES', 'True').lower() in ('true', '1', 'yes'),
+}
+
 # =============================================================================
 # SECURITY
 # =============================================================================
@@ -2,9 +2,26 @@ import { useEffect, useRef } from 'react';
 import { wsService } from '../services/websocket';
 import { useTradingStore } from '../stores/tradingStore';
 
+const byPrice = (descending) => (a, b) =>
+  descending ? parseFloat(b.price) - parseFloat(a.price) : parseFloat(a.price) - parseFloat(b.price);
+
+// Apply changed levels (absolute quantities, 0 = level removed) to one side
+const applyLevels = (levels, changes, descending) => {
+  const merged = new Map(levels.map(level => [level.price, level]));
+  changes.forEach(level => {
+    if (parseFloat(level.quantity) === 0) {
+      merged.delete(level.price);
+    } else {
+      merged.set(level.price, level);
+    }
+  });
+  return Array.from(merged.values()).sort(byPrice(descending));
+};
+
 export const useOrderBookWebSocket = (symbol) => {
   const { orderBook } = useTradingStore();
   const unsubscribesRef = useRef([]);
+  const sequenceRef = useRef(null);
 
   useEffect(() => {
     if (!symbol) return;
@@ -12,17 +29,37 @@ export const useOrderBookWebSocket = (symbol) => {
     // Connect to order book channel
     wsService.connect('orderbook', { symbol });
 
-    // Subscribe to order book updates
-    const unsubUpdate = wsService.subscribe('orderbook', { symbol }, 'orderbook_update', (data) => {
-      useTradingStore.setState({ orderBook: data.orderbook || data });
+    // Snapshot on connect and after every resync
+    const unsubSnapshot = wsService.subscribe('orderbook', { symbol }, 'orderbook_snapshot', (message) => {
+      sequenceRef.current = message.data.sequence;
+      useTradingStore.setState({ orderBook: message.data });
     });
-    if (unsubUpdate) unsubscribesRef.current.push(unsubUpdate);
+    if (unsubSnapshot) unsubscribesRef.current.push(unsubSnapshot);
 
-    // Subscribe to initial snapshot
-    const unsubSnapshot = wsService.subscribe('orderbook', { symbol }, 'snapshot', (data) => {
-      useTradingStore.setState({ orderBook: data.orderbook || data });
+    // Sequenced (conflated) deltas: apply only the one continuing the book,
+    // resync on a gap or on frames from several publishers interleaving
+    const unsubUpdate = wsService.subscribe('orderbook', { symbol }, 'orderbook_update', (message) => {
+      const delta = message.data;
+      if (sequenceRef.current === null || delta.sequence <= sequenceRef.current) {
+        return;
+      }
+      if (delta.prev_sequence !== sequenceRef.current) {
+        sequenceRef.current = null;
+        wsService.send('orderbook', { symbol }, { type: 'resync' });
+        return;
+      }
+      sequenceRef.current = delta.sequence;
+      const book = useTradingStore.getState().orderBook;
+      useTradingStore.setState({
+        orderBook: {
+          ...book,
+          sequence: delta.sequence,
+          bids: applyLevels(book.bids || [], delta.bids, true),
+          asks: applyLevels(book.asks || [], delta.asks, false),
+        },
+      });
     });
-    if (unsubSnapshot) unsubscribesRef.current.push(unsubSnapshot);
+    if (unsubUpdate) unsubscribesRef.current.push(unsubUpdate);
 
     return () => {
       unsubscribesRef.current.forEach(unsub => {
@@ -31,9 +68,10 @@ export const useOrderBookWebSocket = (symbol) => {
         }
       });
       unsubscribesRef.current = [];
+      sequenceRef.current = null;
       wsService.disconnect('orderbook', { symbol });
     };
   }, [symbol]);
 
   return orderBook;
-};
\ No newline at end of file
+};
@@ -22,6 +22,16 @@ export const useTradesWebSocket = (symbol) => {
     });
     if (unsubNew) unsubscribesRef.current.push(unsubNew);
 
+    // Trades batched per conflation window, oldest first
+    const unsubBatch = wsService.subscribe('trades', { symbol }, 'trades', (message) => {
+      const trades = [...message.data.trades].reverse();
+
+      useTradingStore.setState((state) => ({
+        recentTrades: [...trades, ...(state.recentTrades || [])].slice(0, 100)
+      }));
+    });
+    if (unsubBatch) unsubscribesRef.current.push(unsubBatch);
+
     // Subscribe to initial trades
     const unsubInitial = wsService.subscribe('trades', { symbol }, 'recent_trades', (data) => {
       useTradingStore.setState({ recentTrades: data.trades || [] });
@@ -15,34 +15,53 @@ export const useUserWebSocket = () => {
     // Connect to user channel
     wsService.connect('user', {});
 
-    // Subscribe to balance updates
-    const unsubBalance = wsService.subscribe('user', {}, 'balance_update', (data) => {
+    const onBalance = (data) => {
       console.log('Balance update:', data);
       fetchBalances();
-    });
-    if (unsubBalance) unsubscribesRef.current.push(unsubBalance);
+    };
 
-    // Subscribe to order updates
-    const unsubOrder = wsService.subscribe('user', {}, 'order_update', (data) => {
+    const onOrder = (data) => {
       const order = data.order || data;
 
       if (order.status === 'filled') {
         toast.success(`Order filled: ${order.side?.toUpperCase()} ${order.quantity}`);
-      } else if (order.status === 'partial') {
+      } else if (order.status === 'partially_filled') {
         toast.success(`Order partially filled`);
       } else if (order.status === 'cancelled') {
         toast.info('Order cancelled');
       }
-    });
-    if (unsubOrder) unsubscribesRef.current.push(unsubOrder);
+    };
 
-    // Subscribe to trade notifications
-    const unsubTrade = wsService.subscribe('user', {}, 'trade_notification', (data) => {
+    const onTrade = (data) => {
       const trade = data.trade || data;
       toast.success(`Trade executed: ${trade.quantity} @ ${trade.price}`);
-      fetchBalances();
+    };
+
+    const handlers = {
+      balance_update: onBalance,
+      order_update: onOrder,
+      trade_notification: onTrade,
+    };
+
+    // Single events (legacy publishers)
+    Object.entries(handlers).forEach(([type, handler]) => {
+      const unsub = wsService.subscribe('user', {}, type, (message) => handler(message.data || message));
+      if (unsub) unsubscribesRef.current.push(unsub);
+    });
+
+    // Everything one matching cycle did for this user, in one frame
+    const unsubBatch = wsService.subscribe('user', {}, 'user_events', (message) => {
+      const events = message.data.events || [];
+      events.forEach(event => {
+        if (event.type !== 'balance_update' && handlers[event.type]) {
+          handlers[event.type](event.data);
+        }
+      });
+      if (events.some(event => event.type === 'balance_update')) {
+        fetchBalances();
+      }
     });
-    if (unsubTrade) unsubscribesRef.current.push(unsubTrade);
+    if (unsubBatch) unsubscribesRef.current.push(unsubBatch);
 
     return () => {
       // Safely unsubscribe
@@ -55,4 +74,4 @@ export const useUserWebSocket = () => {
       wsService.disconnect('user', {});
     };
   }, [isAuthenticated, fetchBalances]);
-};
\ No newline at end of file
+};
@@ -113,9 +113,11 @@ export const tradingAPI = {
   getRecentTrades: (symbol) => api.get(`/trading/trades/${symbol}/`),
   getTicker: (symbol) => api.get(`/trading/ticker/${symbol}/`),
   getAllTickers: () => api.get('/trading/ticker/'),
+  getKlines: (symbol, params) => api.get(`/trading/klines/${symbol}/`, { params }),
 
   createOrder: (data) => api.post('/trading/orders/create/', data),
   cancelOrder: (orderId) => api.post(`/trading/orders/${orderId}/cancel/`),
+  amendOrder: (orderId, data) => api.post(`/trading/orders/${orderId}/amend/`, data),
   getOrders: (params) => api.get('/trading/orders/', { params }),
   getOpenOrders: () => api.get('/trading/orders/open/'),
 